@@ -1,25 +1,39 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
-from io import BytesIO
-from typing import Dict, List, Set, Optional
+from typing import Callable, Dict, Iterable, List, Optional
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 from typing import Optional
 from dotenv import load_dotenv
 
-from .services.whois_lookup import whois_lookup
+from .services.whois_client import WHOIS_CLIENT
+from .services.whois_lookup import whois_lookup_async
 from .services.subdomain_enum import enumerate_subdomains, tooling_status
-from .services.dns_utils import resolve_records
+from .services.dns_utils import DEFAULT_RECORD_TYPES, resolve_records_async
+from .services.dns_cache import DNS_CACHE
+from .services.analysis_cache import make_analysis_cache
+from .services.http_client import HTTP_CLIENTS
+from .services.tor_health import TOR_HEALTH, TOR_SOCKS_URL
+from .services.rdap_index import RDAP_INDEX
+from .services import rate_limit, stage_cache, sublist3r_engines
 from .services.reverse_ip import reverse_lookup_many
-from .services.ip_info import ip_rdap_many
+from .services.ct_monitor import CT_MONITOR
+from .services.ip_info import asn_table, ip_rdap_many
 from .services.nmap_probe import probe_nmap_many
-from .services.report import generate_pdf_report
+from .services.port_scan import PORTSCAN_CONCURRENCY, PORTSCAN_HOST_RATE, PORTSCAN_PER_HOST, ports_spec_supported, scan_ports_many
+from .services.pipeline import BatchStage
+from .services.jobs import JobManager
+from .services.record_store import RecordStore, compact_payload, encode_compact, expand_payload
+from .services.report import REPORT_LARGE_HOSTS, iter_appendix
+from .services.report_render import REPORT_RENDERER
 from .services.providers.securitytrails import subdomains as st_subdomains
 from .services.providers.shodan_enrich import reverse_enrich as shodan_reverse_enrich
 from .services.providers.censys_enrich import reverse_enrich as censys_reverse_enrich
@@ -45,11 +59,33 @@ class AnalyzeOptions(BaseModel):
         "timeout_per_host": 60,
         "concurrency": 3,
     })
+    dns: Dict[str, Optional[object]] = Field(default_factory=lambda: {
+        "record_types": list(DEFAULT_RECORD_TYPES),
+        "max_in_flight": 200,
+        "per_nameserver": 50,
+    })
     proxy: Optional[ProxyOptions] = None
 
 class AnalyzeRequest(BaseModel):
     domain: str = Field(..., description="The root domain to analyze, e.g., example.com")
     options: Optional[AnalyzeOptions] = None
+    background: bool = Field(False, description="Queue as a background job and return its id instead of waiting")
+    format: str = Field("full", description="'full' (AnalyzeResponse) or 'compact' (columnar DNS records, msgpack/gzip negotiated)")
+
+
+class BatchAnalyzeRequest(BaseModel):
+    domains: List[str] = Field(..., description="Root domains to analyze together")
+    options: Optional[AnalyzeOptions] = None
+    concurrency: int = Field(4, ge=1, le=32, description="Domains enumerated at the same time")
+    background: bool = Field(False, description="Queue as a background job and return its id instead of waiting")
+
+
+class CtMonitorRequest(BaseModel):
+    domains: List[str] = Field(..., description="Root domains to poll crt.sh for")
+    full: bool = Field(False, description="Re-fetch the full certificate history instead of a delta")
+    concurrency: int = Field(4, ge=1, le=16, description="Domains polled at the same time")
+    timeout: int = Field(60, ge=5, le=600, description="crt.sh timeout per domain (seconds)")
+    proxy: Optional[ProxyOptions] = None
 
 
 class ProbeIpRequest(BaseModel):
@@ -79,47 +115,65 @@ class AnalyzeResponse(BaseModel):
     dns_ns_records: Dict[str, List[str]]
     dns_txt_records: Dict[str, List[str]]
     reverse_ip: Dict[str, List[str]]
+    # IPs whose reverse IP lookup failed (quota used up, HTTP error, ...) -> reason
+    reverse_ip_errors: Dict[str, str] = {}
     ip_info: Dict[str, dict]
     ip_ports: Dict[str, Dict]
 
 
+class ReportRequest(AnalyzeResponse):
+    # Added by the UI when creating a report
+    tor_status: Optional[dict] = None
+    graph_png: Optional[str] = None
+    layout: Optional[str] = Field(None, description="'standard' or 'large'; by default large above REPORT_LARGE_HOSTS hosts")
+
+
 load_dotenv()
-app = FastAPI(title="Web Recon Visualizer", version="0.2.2")
 
-# Simple in-memory cache for recent analyses
-_ANALYSIS_CACHE: Dict[str, dict] = {}
 
-# TOR helpers
-_ENV_TOR_SOCKS = os.getenv("TOR_SOCKS_URL")
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    # Outbound HTTP clients live as long as the app so keep-alive, TLS sessions and SOCKS tunnels are reused
+    HTTP_CLIENTS.open()
+    # Map (and compile, if given a TSV) the local ASN table before the first analysis needs it
+    await asyncio.to_thread(asn_table)
+    # Tor reachability and exit IP are probed in the background; handlers read the cached state
+    TOR_HEALTH.start()
+    # New RDAP ranges are flushed periodically and on shutdown rather than after every batch
+    RDAP_INDEX.start()
+    try:
+        yield
+    finally:
+        await TOR_HEALTH.stop()
+        await RDAP_INDEX.stop()
+        await HTTP_CLIENTS.aclose()
+        REPORT_RENDERER.close()
+
 
-_DEF_ORDER = [
-    lambda: _ENV_TOR_SOCKS,
-    lambda: "socks5://tor:9050",           # docker-compose service name
-    lambda: "socks5://tor:9150",           # alternate Tor port (Tor Browser style)
-    lambda: "socks5://127.0.0.1:9050",     # local default
-    lambda: "socks5://127.0.0.1:9150",     # local alternate
-]
+app = FastAPI(title="Web Recon Visualizer", version="0.2.2", lifespan=_lifespan)
 
+# Cache for recent analyses (memory LRU or shared SQLite, see ANALYSIS_CACHE_BACKEND)
+_ANALYSIS_CACHE = make_analysis_cache()
+
+# Background analysis jobs (see /api/jobs)
+_JOBS = JobManager()
+
+# Seconds between SSE keepalive comments on /api/analyze/stream
+_SSE_KEEPALIVE = 15.0
+
+# Analysis pipeline sizing: parallel DNS batches, per-IP stage batch size and queue bound
+_DNS_STAGE_WORKERS = 4
+_IP_STAGE_BATCH = 32
+_IP_STAGE_QUEUE = 256
+
+# TOR helpers
 def _choose_tor_socks() -> Optional[str]:
-    import socket
-    from urllib.parse import urlparse
-    for getter in _DEF_ORDER:
-        url = getter()
-        if not url:
-            continue
-        try:
-            u = urlparse(url)
-            host = u.hostname or "127.0.0.1"
-            port = u.port or 9050
-            with socket.create_connection((host, port), timeout=2.0):
-                return url
-        except Exception:
-            continue
-    return None
+    # Reachable SOCKS endpoint as last seen by the background Tor monitor (no probing here)
+    return TOR_HEALTH.socks_url
 
 def _default_tor_socks() -> str:
     # fallback to env or docker hostname even if not reachable
-    return _ENV_TOR_SOCKS or "socks5://tor:9050"
+    return TOR_SOCKS_URL or "socks5://tor:9050"
 
 
 def _cache_key(domain: str, options: Optional[AnalyzeOptions]) -> str:
@@ -134,7 +188,9 @@ def _cache_key(domain: str, options: Optional[AnalyzeOptions]) -> str:
     mode = o.get('mode', 'passive')
     # Include nmap enabled flag to differentiate analyses with/without port data
     nmap = o.get('nmap', {}) or {}
-    parts = [domain.strip().lower(), str(mode), str(sorted(prov.items())), str(sorted(timeouts.items())), 'nmap=' + str(bool(nmap.get('enabled')))]
+    # Record types change the DNS data returned; concurrency knobs do not
+    rdtypes = sorted(str(t).upper() for t in ((o.get('dns', {}) or {}).get('record_types') or DEFAULT_RECORD_TYPES))
+    parts = [domain.strip().lower(), str(mode), str(sorted(prov.items())), str(sorted(timeouts.items())), 'nmap=' + str(bool(nmap.get('enabled'))), 'dns=' + ','.join(rdtypes)]
     return '|'.join(parts)
 
 # Serve frontend
@@ -143,55 +199,73 @@ app.mount("/static", StaticFiles(directory=str(FRONTEND_DIR)), name="static")
 
 
 @app.get("/api/status")
-async def status():
+async def status(refresh: bool = False):
     import shutil as _sh
-    import httpx
-    socks = _choose_tor_socks()
-    tor_available = bool(socks)
+    if refresh:
+        await TOR_HEALTH.probe()
+    tor = TOR_HEALTH.snapshot()
+    tor["socks_url"] = tor["socks_url"] or _default_tor_socks()
     proxychains_available = bool(_sh.which('proxychains4') or _sh.which('proxychains'))
 
-    # Try to get exit IP and country via check.torproject.org (best-effort)
-    exit_ip = None
-    exit_country = None
-    if tor_available:
-        try:
-            transport = httpx.AsyncHTTPTransport(proxy=socks)
-            async with httpx.AsyncClient(transport=transport, timeout=8.0, headers={"User-Agent": "WebReconVisualizer/0.2"}) as client:
-                # use ipinfo.io/json or check.torproject.org/api/ip?ip= (ipinfo is simpler for country)
-                r = await client.get("https://ipinfo.io/json")
-                if r.status_code == 200:
-                    j = r.json()
-                    exit_ip = j.get("ip")
-                    exit_country = j.get("country")
-        except Exception:
-            pass
-
+    table = asn_table()
     return {
         "status": "ok",
         "tooling": tooling_status(),
         "version": "0.2.2",
-        "tor": {"available": tor_available, "socks_url": socks or _default_tor_socks(), "exit_ip": exit_ip, "exit_country": exit_country},
+        "tor": tor,
         "proxychains": proxychains_available,
+        "dns_cache": DNS_CACHE.stats(),
+        "jobs": _JOBS.stats(),
+        "http_clients": HTTP_CLIENTS.stats(),
+        "rate_limits": rate_limit.all_stats(),
+        "sublist3r_engines": sublist3r_engines.stats(),
+        "whois": WHOIS_CLIENT.stats(),
+        "reports": {**REPORT_RENDERER.stats(), "large_hosts": REPORT_LARGE_HOSTS},
+        "asn_table": {"path": table.path, "ranges": table.ranges} if table is not None else None,
     }
 
 
 @app.get("/api/cache/status")
 async def cache_status():
-    return {"size": len(_ANALYSIS_CACHE), "keys": list(_ANALYSIS_CACHE.keys())[:50]}
+    stats = await asyncio.to_thread(_ANALYSIS_CACHE.stats)
+    stats["stages"] = stage_cache.all_stats()
+    stats["rdap_index"] = await asyncio.to_thread(RDAP_INDEX.stats)
+    return stats
 
 
 @app.post("/api/cache/clear")
 async def cache_clear():
-    _ANALYSIS_CACHE.clear()
+    await asyncio.to_thread(_ANALYSIS_CACHE.clear)
+    DNS_CACHE.clear()
+    stage_cache.clear_all()
+    await asyncio.to_thread(RDAP_INDEX.clear)
+    REPORT_RENDERER.clear()
     return {"cleared": True}
 
 
 @app.post("/api/report.pdf")
-async def create_report(body: AnalyzeResponse):
-    # Accept the last analysis payload and render to PDF
-    pdf_bytes = generate_pdf_report(body.dict())
-    return StreamingResponse(BytesIO(pdf_bytes), media_type="application/pdf", headers={
-        "Content-Disposition": f"attachment; filename=report_{body.domain}.pdf"
+async def create_report(body: ReportRequest):
+    # Accept the last analysis payload and render to PDF in a worker process (cached by payload hash)
+    report = await REPORT_RENDERER.render(body.dict())
+    headers = {
+        "Content-Disposition": f"attachment; filename=report_{body.domain}.pdf",
+        "Content-Length": str(report.size),
+        "ETag": f'"{report.key}"',
+    }
+    if report.data is not None:
+        return Response(report.data, media_type="application/pdf", headers=headers)
+    # Large reports stream from their file instead of being read into memory
+    return StreamingResponse(report.chunks(), media_type="application/pdf", headers=headers)
+
+
+@app.post("/api/report/appendix.{fmt}")
+async def report_appendix(fmt: str, body: ReportRequest):
+    # Full per-host table for reports too large to list every host in the PDF
+    if fmt not in ("csv", "jsonl"):
+        raise HTTPException(status_code=404, detail="Appendix format must be csv or jsonl")
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(iter_appendix(body.dict(), fmt), media_type=media_type, headers={
+        "Content-Disposition": f"attachment; filename=report_{body.domain}.{fmt}"
     })
 
 
@@ -203,23 +277,215 @@ async def index():
     return FileResponse(str(index_path))
 
 
-@app.post("/api/analyze", response_model=AnalyzeResponse)
-async def analyze(req: AnalyzeRequest):
-    domain = (req.domain or "").splitlines()[0].strip().lower()
+def _normalize_domain(raw: Optional[str]) -> str:
+    domain = ((raw or "").splitlines() or [""])[0].strip().lower()
     if not domain or "." not in domain:
         raise HTTPException(status_code=400, detail="Please provide a valid domain like example.com")
+    return domain
 
-    # Serve from cache if available
-    key = _cache_key(domain, req.options)
-    if key in _ANALYSIS_CACHE:
-        data = _ANALYSIS_CACHE[key]
-        return AnalyzeResponse(**data)
 
-    # Run whois and subdomain enumeration concurrently
-    whois_task = asyncio.to_thread(whois_lookup, domain)
-    subs_task = enumerate_subdomains(domain, req.options.dict() if req.options else None)
+def _resolve_proxies(options: Optional[AnalyzeOptions]) -> Optional[str]:
+    # Build optional proxies (TOR); enforce 'require' before any work starts
+    if not (options and getattr(options, 'proxy', None) and options.proxy.enabled):
+        return None
+    chosen = _choose_tor_socks()
+    if options.proxy.require and not chosen:
+        raise HTTPException(status_code=503, detail="Tor proxy required but not available")
+    return options.proxy.socks_url or chosen or _default_tor_socks()
+
 
-    whois_result, subdata = await asyncio.gather(whois_task, subs_task)
+def _noop_emit(event: str, data: dict) -> None:
+    pass
+
+
+def _nmap_kwargs(nmap_opts: Dict[str, object], default_concurrency: int = 3) -> Dict[str, object]:
+    """Translate the ``nmap`` options dict into ``probe_nmap_many`` keyword arguments."""
+    return {
+        "top_ports": int(nmap_opts.get("top_ports", 100)),
+        "timing": str(nmap_opts.get("timing", "T4")),
+        "skip_host_discovery": bool(nmap_opts.get("skip_host_discovery", True)),
+        "udp": bool(nmap_opts.get("udp", False)),
+        "timeout_per_host": int(nmap_opts.get("timeout_per_host", 60)),
+        "concurrency": int(nmap_opts.get("concurrency", default_concurrency)) or 1,
+        "ports_spec": str(nmap_opts.get("ports_spec")) if nmap_opts.get("ports_spec") else None,
+        # "per_host" = one nmap per IP; "batch" = chunk_size targets per nmap process
+        "mode": str(nmap_opts.get("mode", "per_host")),
+        "chunk_size": int(nmap_opts.get("chunk_size", 64)),
+        "parallel_chunks": int(nmap_opts.get("parallel_chunks", 2)),
+        "min_parallelism": int(nmap_opts["min_parallelism"]) if nmap_opts.get("min_parallelism") else None,
+    }
+
+
+
+async def _probe_ports(ips: List[str], nmap_opts: Dict[str, object], *, use_proxychains: bool, on_result: Optional[Callable[[str, Dict], None]] = None, default_concurrency: int = 3) -> Dict[str, Dict]:
+    """Scan ``ips`` with the engine chosen by ``nmap_opts["engine"]``.
+
+    ``"asyncio"`` uses the built-in TCP connect scanner. It cannot go through
+    proxychains, scan UDP or read every nmap port syntax (``U:53``, service
+    names), so those requests always use nmap.
+    """
+    kwargs = _nmap_kwargs(nmap_opts, default_concurrency)
+    use_cache = bool(nmap_opts.get("use_cache", True))
+    if (str(nmap_opts.get("engine", "nmap")).lower() == "asyncio" and not use_proxychains and not kwargs["udp"]
+            and ports_spec_supported(kwargs["ports_spec"])):
+        return await scan_ports_many(
+            ips,
+            top_ports=kwargs["top_ports"],
+            ports_spec=kwargs["ports_spec"],
+            timeout_per_host=kwargs["timeout_per_host"],
+            # "concurrency" defaults to 3 for nmap processes; connect scans are cheap and have their own knob
+            concurrency=int(nmap_opts.get("scan_concurrency") or PORTSCAN_CONCURRENCY),
+            per_host=int(nmap_opts.get("per_host", PORTSCAN_PER_HOST)),
+            host_rate=float(nmap_opts.get("host_rate", PORTSCAN_HOST_RATE)),
+            banner=bool(nmap_opts.get("banners", False)),
+            use_cache=use_cache,
+            on_result=on_result,
+        )
+    return await probe_nmap_many(ips, use_proxychains=use_proxychains, use_cache=use_cache, on_result=on_result, **kwargs)
+
+
+class _IpFanout:
+    """Per-IP stages (reverse IP, Shodan, Censys, RDAP, nmap) fed by one or more DNS stages.
+
+    Each stage deduplicates what it is given, so when several domains share a
+    fanout (batch analysis) every unique IP is looked up once.
+    """
+
+    def __init__(self, options: Optional[AnalyzeOptions], proxies: Optional[str], emit: Callable[[str, dict], None]):
+        providers = (options.providers if options and options.providers else {})
+        nmap_opts = (options.nmap if options and options.nmap else {})
+        # Co-hosted names per source, merged in a fixed order by reverse_map()
+        self.cohosts: Dict[str, Dict[str, List[str]]] = {"reverse_ip": {}, "shodan": {}, "censys": {}}
+        self.reverse_errors: Dict[str, str] = {}
+        self.ip_info: Dict[str, dict] = {}
+        self.ip_ports: Dict[str, Dict] = {}
+
+        async def reverse_stage(batch: List[str]) -> None:
+            res, errors = await reverse_lookup_many(
+                batch,
+                proxies=proxies,
+                on_result=lambda ip, doms: emit("reverse_ip", {"ip": ip, "domains": doms}),
+                on_error=lambda ip, err: emit("reverse_ip", {"ip": ip, "domains": [], "error": err}),
+            )
+            self.cohosts["reverse_ip"].update(res)
+            self.reverse_errors.update(errors)
+
+        async def shodan_stage(batch: List[str]) -> None:
+            res = await shodan_reverse_enrich(batch, proxies=proxies, on_result=lambda ip, doms: emit("enrich", {"source": "shodan", "ip": ip, "domains": doms}))
+            self.cohosts["shodan"].update(res)
+
+        async def censys_stage(batch: List[str]) -> None:
+            res = await censys_reverse_enrich(batch, proxies=proxies, on_result=lambda ip, doms: emit("enrich", {"source": "censys", "ip": ip, "domains": doms}))
+            self.cohosts["censys"].update(res)
+
+        async def rdap_stage(batch: List[str]) -> None:
+            res = await ip_rdap_many(batch, proxies=proxies, rdap=bool(providers.get("rdap", True)), on_result=lambda ip, info: emit("ip_info", {"ip": ip, "info": info}))
+            self.ip_info.update(res)
+
+        async def nmap_stage(batch: List[str]) -> None:
+            res = await _probe_ports(
+                batch,
+                nmap_opts,
+                use_proxychains=bool(getattr(options, 'proxy', None) and options.proxy.nmap_via_tor),
+                on_result=lambda ip, data: emit("ports", {"ip": ip, "result": data}),
+            )
+            self.ip_ports.update(res)
+
+        self.stages: List[BatchStage] = [
+            BatchStage("reverse_ip", reverse_stage, max_batch=_IP_STAGE_BATCH, maxsize=_IP_STAGE_QUEUE),
+            BatchStage("rdap", rdap_stage, max_batch=_IP_STAGE_BATCH, maxsize=_IP_STAGE_QUEUE),
+        ]
+        if providers.get('shodan'):
+            self.stages.append(BatchStage("shodan", shodan_stage, max_batch=_IP_STAGE_BATCH, maxsize=_IP_STAGE_QUEUE))
+        if providers.get('censys'):
+            self.stages.append(BatchStage("censys", censys_stage, max_batch=_IP_STAGE_BATCH, maxsize=_IP_STAGE_QUEUE))
+        if nmap_opts and nmap_opts.get("enabled"):
+            self.stages.append(BatchStage("nmap", nmap_stage, max_batch=_IP_STAGE_BATCH, maxsize=_IP_STAGE_QUEUE))
+
+    async def put(self, ip: str) -> None:
+        # Blocks while a stage is saturated (backpressure on DNS)
+        for stage in self.stages:
+            await stage.put(ip)
+
+    @property
+    def unique_ips(self) -> int:
+        return len(self.stages[0].seen)
+
+    async def close(self) -> None:
+        await asyncio.gather(*(stage.close() for stage in self.stages))
+
+    def cancel(self) -> None:
+        for stage in self.stages:
+            stage.cancel()
+
+    def reverse_map(self, ips: Iterable[str]) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {}
+        for ip in ips:
+            merged: List[str] = []
+            for source in ("reverse_ip", "shodan", "censys"):
+                for d in self.cohosts[source].get(ip, []):
+                    if d not in merged:
+                        merged.append(d)
+            out[ip] = merged
+        return out
+
+
+async def _discover_and_resolve(domain: str, options: Optional[AnalyzeOptions], fanout: _IpFanout, emit: Callable[[str, dict], None]) -> tuple:
+    """WHOIS, subdomain enumeration and DNS for one domain, feeding IPs into ``fanout``.
+
+    Returns (whois_result, subdomains, subs_by_source, records).
+    """
+    dns_opts = (options.dns if options and options.dns else {})
+    record_types = [str(t) for t in (dns_opts.get("record_types") or DEFAULT_RECORD_TYPES)]
+    records = RecordStore()
+
+    # Several DNS batches may be in flight; split the configured window between them
+    dns_workers = _DNS_STAGE_WORKERS
+    max_in_flight = max(1, int(dns_opts.get("max_in_flight", 200)) // dns_workers)
+    per_nameserver = max(1, int(dns_opts.get("per_nameserver", 50)) // dns_workers)
+
+    async def dns_stage(batch: List[str]) -> None:
+        ips: List[str] = []
+
+        def on_result(host: str, recs: Dict[str, List[str]]) -> None:
+            records.add(host, recs)
+            ips.extend(recs.get("A", []))
+            emit("dns", {"host": host, "records": recs})
+        await resolve_records_async(batch, record_types=record_types, max_in_flight=max_in_flight, per_nameserver=per_nameserver, on_result=on_result)
+        for ip in ips:
+            await fanout.put(ip)
+
+    # Fed from synchronous enumerator callbacks, so this queue is unbounded
+    dns_stage_ = BatchStage("dns", dns_stage, workers=dns_workers, max_batch=256, maxsize=0)
+    dns_stage_.put_nowait(domain)
+
+    def on_source(source: str, subs: List[str]) -> None:
+        subs = [s for s in subs if s.endswith(domain)]
+        emit("subdomains", {"source": source, "subdomains": subs})
+        for sd in subs:
+            dns_stage_.put_nowait(sd)
+
+    def on_partial(source: str, subs: List[str]) -> None:
+        # amass/subfinder names as they are printed; DNS starts on them before the tool exits
+        subs = [s for s in subs if s.endswith(domain)]
+        if subs:
+            emit("subdomains", {"source": source, "subdomains": subs, "partial": True})
+        for sd in subs:
+            dns_stage_.put_nowait(sd)
+
+    async def whois_stage() -> dict:
+        result = await whois_lookup_async(domain) or {}
+        emit("whois", {"whois": result})
+        return result
+
+    try:
+        whois_result, subdata = await asyncio.gather(
+            whois_stage(),
+            enumerate_subdomains(domain, options.dict() if options else None, on_source=on_source, on_partial=on_partial),
+        )
+        await dns_stage_.close()
+    finally:
+        dns_stage_.cancel()
 
     # Normalize subdomain results to a flat set of strings and capture by-source
     subs_by_source: Dict[str, List[str]] = {}
@@ -240,89 +506,337 @@ async def analyze(req: AnalyzeRequest):
         flat_subs.add(raw_subs)
 
     subdomains = sorted({sd for sd in flat_subs if isinstance(sd, str) and sd.endswith(domain)})
+    return whois_result, subdomains, subs_by_source, records
 
-    # Resolve records for root domain + subdomains
-    hosts: Set[str] = {domain, *subdomains}
-    all_records = await asyncio.to_thread(resolve_records, list(hosts))
-
-    # Collect IPv4 set from A records
-    ips: Set[str] = set()
-    for recs in all_records.values():
-        for ip in recs.get("A", []):
-            ips.add(ip)
-
-    # Reverse IP lookup (co-hosted domains)
-    # Build optional proxies (TOR)
-    proxies = None
-    if req.options and getattr(req.options, 'proxy', None) and req.options.proxy.enabled:
-        # Enforce 'require' if requested and TOR not available
-        chosen = _choose_tor_socks()
-        if req.options.proxy.require and not chosen:
-            raise HTTPException(status_code=503, detail="Tor proxy required but not available")
-        proxies = (req.options.proxy.socks_url or chosen or _default_tor_socks())
-
-    reverse_map = await reverse_lookup_many(sorted(ips), proxies=proxies)
-    # Optional Shodan enrichment
-    if req.options and getattr(req.options, 'providers', None):
-        if req.options.providers.get('shodan'):
-            extra = await shodan_reverse_enrich(sorted(ips), proxies=proxies)
-            for ip, doms in extra.items():
-                reverse_map.setdefault(ip, [])
-                for d in doms:
-                    if d not in reverse_map[ip]:
-                        reverse_map[ip].append(d)
-        if req.options.providers.get('censys'):
-            extra = await censys_reverse_enrich(sorted(ips), proxies=proxies)
-            for ip, doms in extra.items():
-                reverse_map.setdefault(ip, [])
-                for d in doms:
-                    if d not in reverse_map[ip]:
-                        reverse_map[ip].append(d)
-
-    # RDAP IP info
-    ip_info = await ip_rdap_many(sorted(ips), proxies=proxies)
-
-    # Optional Nmap probing
-    nmap_opts = (req.options.nmap if req.options and req.options.nmap else {})
-    ip_ports: Dict[str, Dict] = {}
-    if nmap_opts and nmap_opts.get("enabled") and ips:
-        ip_ports = await probe_nmap_many(
-            sorted(ips),
-            top_ports=int(nmap_opts.get("top_ports", 100)),
-            timing=str(nmap_opts.get("timing", "T4")),
-            skip_host_discovery=bool(nmap_opts.get("skip_host_discovery", True)),
-            udp=bool(nmap_opts.get("udp", False)),
-            timeout_per_host=int(nmap_opts.get("timeout_per_host", 60)),
-            concurrency=int(nmap_opts.get("concurrency", 3)),
-            use_proxychains=bool(getattr(req.options, 'proxy', None) and req.options.proxy.nmap_via_tor),
-            ports_spec=str(nmap_opts.get("ports_spec")) if nmap_opts.get("ports_spec") else None,
-        )
 
-    # Split per type
-    dns_a = {h: recs.get("A", []) for h, recs in all_records.items()}
-    dns_aaaa = {h: recs.get("AAAA", []) for h, recs in all_records.items()}
-    dns_cname = {h: recs.get("CNAME", []) for h, recs in all_records.items()}
-    dns_mx = {h: recs.get("MX", []) for h, recs in all_records.items()}
-    dns_ns = {h: recs.get("NS", []) for h, recs in all_records.items()}
-    dns_txt = {h: recs.get("TXT", []) for h, recs in all_records.items()}
+def _build_payload(domain: str, whois_result: dict, subdomains: List[str], subs_by_source: Dict[str, List[str]], records: RecordStore, fanout: _IpFanout) -> dict:
+    """The compact analysis payload: DNS records as a columnar RecordStore dict under ``dns``.
+
+    This is what gets cached; ``expand_payload`` turns it into the AnalyzeResponse schema.
+    """
+    ordered_ips = sorted(records.values_of("A"))
 
-    payload = dict(
+    return dict(
         domain=domain,
         whois=whois_result or {},
         subdomains=subdomains,
         subdomains_by_source={k: list(v) for k, v in subs_by_source.items()},
-        dns_a_records=dns_a,
-        dns_aaaa_records=dns_aaaa,
-        dns_cname_records=dns_cname,
-        dns_mx_records=dns_mx,
-        dns_ns_records=dns_ns,
-        dns_txt_records=dns_txt,
-        reverse_ip=reverse_map,
-        ip_info=ip_info,
-        ip_ports=ip_ports,
+        dns=records.to_dict(),
+        reverse_ip=fanout.reverse_map(ordered_ips),
+        reverse_ip_errors={ip: fanout.reverse_errors[ip] for ip in ordered_ips if ip in fanout.reverse_errors},
+        ip_info={ip: fanout.ip_info[ip] for ip in ordered_ips if ip in fanout.ip_info},
+        ip_ports={ip: fanout.ip_ports[ip] for ip in ordered_ips if ip in fanout.ip_ports},
     )
-    _ANALYSIS_CACHE[key] = payload
-    return AnalyzeResponse(**payload)
+
+
+async def _run_analysis(domain: str, options: Optional[AnalyzeOptions], proxies: Optional[str] = None, emit: Callable[[str, dict], None] = _noop_emit) -> dict:
+    """Run every analysis stage for ``domain`` and return its compact payload.
+
+    DNS records come back as a RecordStore dict under ``dns`` instead of the
+    six per-type maps; this is also what is cached and stored as a job result.
+    Callers that answer with the AnalyzeResponse schema pass it through
+    ``expand_payload`` (``_payload_response``, the batch results, job results).
+
+    Stages form a dataflow: hosts stream from each enumerator into a DNS stage
+    as soon as that source reports, and every newly resolved IPv4 address fans
+    out to the per-IP stages (reverse IP, Shodan, Censys, RDAP, nmap), which run
+    concurrently with bounded queues between them.
+
+    ``emit(event, data)`` is called as each stage or item completes; see
+    ``/api/analyze/stream`` for the event types.
+    """
+    # Serve from cache if available
+    key = _cache_key(domain, options)
+    cached = await asyncio.to_thread(_ANALYSIS_CACHE.get, key)
+    if cached is not None:
+        # Entries written before the compact format hold the full schema
+        cached = compact_payload(cached)
+        if emit is not _noop_emit:
+            emit("result", expand_payload(cached))
+        return cached
+
+    fanout = _IpFanout(options, proxies, emit)
+    try:
+        parts = await _discover_and_resolve(domain, options, fanout, emit)
+        await fanout.close()
+    finally:
+        fanout.cancel()
+    payload = _build_payload(domain, *parts, fanout)
+    await asyncio.to_thread(_ANALYSIS_CACHE.set, key, payload)
+    return payload
+
+
+_NODE_RANK = {"cohost": 0, "ip": 1, "subdomain": 2, "domain": 3}
+
+
+def _merged_graph(results: Dict[str, dict]) -> dict:
+    """Union graph over several analyses (same node/edge types as the frontend)."""
+    nodes: Dict[str, dict] = {}
+    edges: Dict[str, dict] = {}
+
+    def node(node_id: str, node_type: str) -> None:
+        cur = nodes.get(node_id)
+        if cur is None or _NODE_RANK[node_type] > _NODE_RANK[cur["type"]]:
+            nodes[node_id] = {"id": node_id, "type": node_type}
+
+    def edge(source: str, target: str, edge_type: str) -> None:
+        edge_id = f"{source}->{target}"
+        if edge_id not in edges:
+            edges[edge_id] = {"id": edge_id, "source": source, "target": target, "type": edge_type}
+
+    for domain, data in results.items():
+        node(domain, "domain")
+        for sd in data.get("subdomains") or []:
+            node(sd, "subdomain")
+            edge(domain, sd, "subdomain-of")
+        for host, cnames in (data.get("dns_cname_records") or {}).items():
+            for cname in cnames:
+                node(cname, "domain")
+                edge(host, cname, "cname")
+        for field, edge_type in (("dns_a_records", "a-record"), ("dns_aaaa_records", "aaaa-record")):
+            for host, ips in (data.get(field) or {}).items():
+                for ip in ips:
+                    node(ip, "ip")
+                    edge(host, ip, edge_type)
+        for ip, doms in (data.get("reverse_ip") or {}).items():
+            for d in doms:
+                node(d, "cohost")
+                edge(ip, d, "cohost")
+    return {"nodes": list(nodes.values()), "edges": list(edges.values())}
+
+
+async def _run_batch(domains: List[str], options: Optional[AnalyzeOptions], proxies: Optional[str] = None, concurrency: int = 4, emit: Callable[[str, dict], None] = _noop_emit) -> dict:
+    """Analyze several domains with one shared per-IP fanout.
+
+    Enumeration and DNS run for at most ``concurrency`` domains at once; the
+    union of their IPs goes through reverse IP, RDAP, Shodan, Censys and nmap
+    once per unique address.
+    """
+    fanout = _IpFanout(options, proxies, emit)
+    sem = asyncio.Semaphore(max(1, concurrency))
+    cached: Dict[str, dict] = {}
+    resolved: Dict[str, tuple] = {}
+    errors: Dict[str, str] = {}
+
+    async def one(domain: str) -> None:
+        hit = await asyncio.to_thread(_ANALYSIS_CACHE.get, _cache_key(domain, options))
+        if hit is not None:
+            cached[domain] = hit
+            emit("domain_done", {"domain": domain, "cached": True})
+            return
+        try:
+            async with sem:
+                resolved[domain] = await _discover_and_resolve(domain, options, fanout, emit)
+        except Exception as e:
+            errors[domain] = str(e)
+            emit("domain_error", {"domain": domain, "detail": str(e)})
+            return
+        emit("domain_done", {"domain": domain, "cached": False})
+
+    try:
+        await asyncio.gather(*(one(d) for d in domains))
+        await fanout.close()
+    finally:
+        fanout.cancel()
+
+    results: Dict[str, dict] = {}
+    for domain in domains:
+        if domain in cached:
+            results[domain] = expand_payload(cached[domain])
+        elif domain in resolved:
+            payload = _build_payload(domain, *resolved[domain], fanout)
+            await asyncio.to_thread(_ANALYSIS_CACHE.set, _cache_key(domain, options), payload)
+            results[domain] = expand_payload(payload)
+    return {
+        "results": results,
+        "errors": errors,
+        "graph": _merged_graph(results),
+        "stats": {
+            "domains": len(domains),
+            "cached": len(cached),
+            "analyzed": len(resolved),
+            "unique_ips_looked_up": fanout.unique_ips,
+        },
+    }
+
+
+def _queue_job(key: str, label: str, runner) -> JSONResponse:
+    job, deduplicated = _JOBS.submit(key, label, runner)
+    body = job.snapshot()
+    body["job_id"] = job.id
+    body["deduplicated"] = deduplicated
+    return JSONResponse(body, status_code=202)
+
+
+def _submit_job(req: AnalyzeRequest) -> JSONResponse:
+    domain = _normalize_domain(req.domain)
+    proxies = _resolve_proxies(req.options)
+    return _queue_job(_cache_key(domain, req.options), domain, lambda emit: _run_analysis(domain, req.options, proxies=proxies, emit=emit))
+
+
+async def _payload_response(request: Request, payload: dict, fmt: str, envelope: Optional[dict] = None):
+    """Analysis payload as an AnalyzeResponse, or compact when ``fmt`` is "compact" (under ``result`` of ``envelope`` if given)."""
+    if fmt != "compact":
+        return AnalyzeResponse(**expand_payload(payload))
+    # Older cache entries hold the full schema; clients asking for compact always get ``dns``
+    body = compact_payload(payload)
+    if envelope is not None:
+        body = {**envelope, "result": body}
+    # Skips the per-host maps and Pydantic validation entirely
+    body, media_type, headers = await asyncio.to_thread(
+        encode_compact, body, request.headers.get("accept", ""), request.headers.get("accept-encoding", ""))
+    return Response(body, media_type=media_type, headers=headers)
+
+
+@app.post("/api/analyze", response_model=AnalyzeResponse)
+async def analyze(req: AnalyzeRequest, request: Request):
+    if req.background:
+        return _submit_job(req)
+    domain = _normalize_domain(req.domain)
+    proxies = _resolve_proxies(req.options)
+    payload = await _run_analysis(domain, req.options, proxies=proxies)
+    return await _payload_response(request, payload, req.format)
+
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(req: BatchAnalyzeRequest):
+    domains = list(dict.fromkeys(_normalize_domain(d) for d in req.domains if (d or "").strip()))
+    if not domains:
+        raise HTTPException(status_code=400, detail="Please provide at least one domain")
+    proxies = _resolve_proxies(req.options)
+    if req.background:
+        key = _cache_key("batch:" + ",".join(sorted(domains)), req.options)
+        return _queue_job(key, f"{len(domains)} domains", lambda emit: _run_batch(domains, req.options, proxies=proxies, concurrency=req.concurrency, emit=emit))
+    return await _run_batch(domains, req.options, proxies=proxies, concurrency=req.concurrency)
+
+
+@app.post("/api/jobs")
+async def create_job(req: AnalyzeRequest):
+    return _submit_job(req)
+
+
+@app.get("/api/jobs")
+async def list_jobs():
+    return {**_JOBS.stats(), "items": [job.snapshot() for job in _JOBS.list()]}
+
+
+def _get_job(job_id: str):
+    job = _JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/jobs/{job_id}")
+async def job_status(job_id: str):
+    return _get_job(job_id).snapshot()
+
+
+@app.get("/api/jobs/{job_id}/result")
+async def job_result(job_id: str, request: Request, format: str = "full"):
+    job = _get_job(job_id)
+    if job.status == "done" and job.result is not None:
+        # Single-domain analyses only; batch results keep their own shape
+        if format == "compact" and "domain" in job.result:
+            return await _payload_response(request, job.result, format, envelope={"status": job.status, "partial": False})
+        return {"status": job.status, "partial": False, "result": expand_payload(job.result)}
+    # Still running, cancelled or failed: hand back whatever has been gathered
+    return {"status": job.status, "partial": True, "error": job.error, "result": job.partial}
+
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    job = _JOBS.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+@app.post("/api/analyze/stream")
+async def analyze_stream(req: AnalyzeRequest):
+    """Server-Sent Events variant of /api/analyze.
+
+    Events: ``whois``, ``subdomains`` (per source), ``dns`` (per host),
+    ``reverse_ip`` / ``enrich`` / ``ip_info`` / ``ports`` (per IP), ``result``
+    (full payload, only on a cache hit), ``error`` and finally ``done``.
+    """
+    domain = _normalize_domain(req.domain)
+    proxies = _resolve_proxies(req.options)
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def runner() -> None:
+        try:
+            await _run_analysis(domain, req.options, proxies=proxies, emit=lambda ev, data: queue.put_nowait((ev, data)))
+            queue.put_nowait(("done", {"domain": domain}))
+        except asyncio.CancelledError:
+            raise
+        except HTTPException as e:
+            queue.put_nowait(("error", {"detail": e.detail}))
+        except Exception as e:
+            queue.put_nowait(("error", {"detail": str(e)}))
+
+    async def events():
+        task = asyncio.create_task(runner())
+        try:
+            yield _sse("start", {"domain": domain})
+            while True:
+                try:
+                    ev, data = await asyncio.wait_for(queue.get(), timeout=_SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from timing out idle streams
+                    yield b": keepalive\n\n"
+                    continue
+                yield _sse(ev, data)
+                if ev in ("done", "error"):
+                    break
+        finally:
+            # Client went away or we are done: stop any remaining stage work
+            task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+@app.post("/api/monitor/ct")
+async def ct_monitor_poll(req: CtMonitorRequest):
+    domains = list(dict.fromkeys(_normalize_domain(d) for d in req.domains if (d or "").strip()))
+    if not domains:
+        raise HTTPException(status_code=400, detail="Please provide at least one domain")
+    proxies = _resolve_proxies(AnalyzeOptions(proxy=req.proxy))
+    sem = asyncio.Semaphore(req.concurrency)
+
+    async def poll(domain: str) -> dict:
+        async with sem:
+            return await CT_MONITOR.poll(domain, proxies=proxies, timeout_secs=req.timeout, full=req.full)
+
+    results = await asyncio.gather(*(poll(d) for d in domains))
+    return {"results": {r["domain"]: r for r in results}}
+
+
+@app.get("/api/monitor/ct")
+async def ct_monitor_list():
+    return {"items": await asyncio.to_thread(CT_MONITOR.summary)}
+
+
+@app.get("/api/monitor/ct/{domain}")
+async def ct_monitor_get(domain: str):
+    state = await asyncio.to_thread(CT_MONITOR.get, _normalize_domain(domain))
+    if state is None:
+        raise HTTPException(status_code=404, detail="Domain is not monitored")
+    return {"domain": domain, **state}
+
+
+@app.delete("/api/monitor/ct/{domain}")
+async def ct_monitor_forget(domain: str):
+    if not await asyncio.to_thread(CT_MONITOR.forget, _normalize_domain(domain)):
+        raise HTTPException(status_code=404, detail="Domain is not monitored")
+    return {"domain": domain, "removed": True}
 
 
 @app.post("/api/probe_ip", response_model=ProbeIpResponse)
@@ -335,16 +849,11 @@ async def probe_ip(req: ProbeIpRequest):
     if not bool(nmap_opts.get("enabled", True)):
         return ProbeIpResponse(results={ip: {"ports": []}})
     try:
-        results = await probe_nmap_many(
+        results = await _probe_ports(
             [ip],
-            top_ports=int(nmap_opts.get("top_ports", 100)),
-            timing=str(nmap_opts.get("timing", "T4")),
-            skip_host_discovery=bool(nmap_opts.get("skip_host_discovery", True)),
-            udp=bool(nmap_opts.get("udp", False)),
-            timeout_per_host=int(nmap_opts.get("timeout_per_host", 60)),
-            concurrency=int(nmap_opts.get("concurrency", 1)) or 1,
+            nmap_opts,
             use_proxychains=bool(getattr(req, 'nmap', None) and isinstance(req.nmap, dict) and req.nmap.get('use_proxychains') or (getattr(req, 'proxy', None) and req.proxy and getattr(req.proxy, 'nmap_via_tor', False))),
-            ports_spec=str(nmap_opts.get("ports_spec")) if nmap_opts.get("ports_spec") else None,
+            default_concurrency=1,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -361,16 +870,11 @@ async def probe_ips(req: ProbeIpsRequest):
     if not bool(nmap_opts.get("enabled", True)):
         return ProbeIpsResponse(results={ip: {"ports": []} for ip in ips})
     try:
-        results = await probe_nmap_many(
+        results = await _probe_ports(
             ips,
-            top_ports=int(nmap_opts.get("top_ports", 100)),
-            timing=str(nmap_opts.get("timing", "T4")),
-            skip_host_discovery=bool(nmap_opts.get("skip_host_discovery", True)),
-            udp=bool(nmap_opts.get("udp", False)),
-            timeout_per_host=int(nmap_opts.get("timeout_per_host", 60)),
-            concurrency=int(nmap_opts.get("concurrency", 3)) or 1,
+            nmap_opts,
             use_proxychains=bool(getattr(req, 'nmap', None) and isinstance(req.nmap, dict) and req.nmap.get('use_proxychains') or (getattr(req, 'proxy', None) and req.proxy and getattr(req.proxy, 'nmap_via_tor', False))),
-            ports_spec=str(nmap_opts.get("ports_spec")) if nmap_opts.get("ports_spec") else None,
+            default_concurrency=3,
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Backend selection and limits (see make_analysis_cache)
+ANALYSIS_CACHE_BACKEND = os.getenv("ANALYSIS_CACHE_BACKEND", "memory")
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", str(Path(__file__).resolve().parents[2] / "data" / "analysis_cache.sqlite3"))
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", str(6 * 3600)))
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+_AGE_BUCKETS: List[Tuple[str, float]] = [
+    ("<5m", 300),
+    ("5m-1h", 3600),
+    ("1h-6h", 6 * 3600),
+    ("6h-1d", 86400),
+    (">1d", float("inf")),
+]
+
+
+def _encode(payload: dict) -> bytes:
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def _decode(blob: bytes) -> dict:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def _age_histogram(ages: Iterable[float]) -> Dict[str, int]:
+    hist = {name: 0 for name, _ in _AGE_BUCKETS}
+    for age in ages:
+        for name, upper in _AGE_BUCKETS:
+            if age < upper:
+                hist[name] += 1
+                break
+    return hist
+
+
+class AnalysisCache(ABC):
+    """Interface for analysis payload caches keyed by ``_cache_key``.
+
+    Payloads are stored as zlib-compressed JSON; ``ttl`` and ``max_bytes``
+    (compressed size) bound what is kept.
+    """
+
+    backend = "base"
+
+    def __init__(self, ttl: int = ANALYSIS_CACHE_TTL, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES):
+        self.ttl = int(ttl)
+        self.max_bytes = int(max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, payload: dict) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        """(key, created_at, size) for every live entry."""
+
+    def _count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def stats(self) -> Dict[str, object]:
+        now = time.time()
+        entries = self._entries()
+        ages = [now - created for _, created, _ in entries]
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "size": len(entries),
+            "bytes": sum(size for _, _, size in entries),
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "age_seconds": {
+                "min": round(min(ages), 1) if ages else None,
+                "max": round(max(ages), 1) if ages else None,
+                "buckets": _age_histogram(ages),
+            },
+            "keys": [k for k, _, _ in entries][:50],
+        }
+
+
+class MemoryAnalysisCache(AnalysisCache):
+    """In-process LRU bounded by compressed bytes and TTL."""
+
+    backend = "memory"
+
+    def __init__(self, ttl: int = ANALYSIS_CACHE_TTL, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES):
+        super().__init__(ttl=ttl, max_bytes=max_bytes)
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+
+    def _drop(self, key: str) -> None:
+        _, blob = self._data.pop(key)
+        self._bytes -= len(blob)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                self._drop(key)
+                entry = None
+            self._count(entry is not None)
+            if entry is None:
+                return None
+            self._data.move_to_end(key)
+            blob = entry[1]
+        return _decode(blob)
+
+    def set(self, key: str, payload: dict) -> None:
+        blob = _encode(payload)
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.time(), blob)
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes and self._data:
+                self._drop(next(iter(self._data)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (created, _) in self._data.items() if now - created > self.ttl]:
+                self._drop(key)
+            return [(k, created, len(blob)) for k, (created, blob) in self._data.items()]
+
+
+class SqliteAnalysisCache(AnalysisCache):
+    """On-disk cache that survives restarts and is shared by workers on one host.
+
+    Uses WAL mode so several uvicorn workers can read while one writes. Hit/miss
+    counters are per process.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = ANALYSIS_CACHE_PATH, ttl: int = ANALYSIS_CACHE_TTL, max_bytes: int = ANALYSIS_CACHE_MAX_BYTES):
+        super().__init__(ttl=ttl, max_bytes=max_bytes)
+        self.path = path
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_cache ("
+            " key TEXT PRIMARY KEY, created_at REAL NOT NULL, accessed_at REAL NOT NULL,"
+            " size INTEGER NOT NULL, payload BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS analysis_cache_accessed ON analysis_cache(accessed_at)")
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM analysis_cache WHERE key = ? AND created_at >= ?", (key, now - self.ttl)
+            ).fetchone()
+            self._count(row is not None)
+            if row is None:
+                return None
+            self._conn.execute("UPDATE analysis_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return _decode(row[0])
+
+    def set(self, key: str, payload: dict) -> None:
+        blob = _encode(payload)
+        if len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO analysis_cache(key, created_at, accessed_at, size, payload) VALUES (?, ?, ?, ?, ?)",
+                    (key, now, now, len(blob), blob),
+                )
+                self._conn.execute("DELETE FROM analysis_cache WHERE created_at < ?", (now - self.ttl,))
+                # Evict least recently used rows until we are back under the byte budget
+                total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()[0]
+                if total > self.max_bytes:
+                    for old_key, size in self._conn.execute(
+                        "SELECT key, size FROM analysis_cache WHERE key != ? ORDER BY accessed_at", (key,)
+                    ).fetchall():
+                        self._conn.execute("DELETE FROM analysis_cache WHERE key = ?", (old_key,))
+                        total -= size
+                        if total <= self.max_bytes:
+                            break
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM analysis_cache")
+
+    def _entries(self) -> List[Tuple[str, float, int]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, created_at, size FROM analysis_cache WHERE created_at >= ? ORDER BY accessed_at",
+                (time.time() - self.ttl,),
+            ).fetchall()
+        return [(k, float(c), int(s)) for k, c, s in rows]
+
+
+def make_analysis_cache(backend: Optional[str] = None) -> AnalysisCache:
+    backend = (backend or ANALYSIS_CACHE_BACKEND or "memory").strip().lower()
+    if backend == "sqlite":
+        return SqliteAnalysisCache()
+    return MemoryAnalysisCache()
@@ -0,0 +1,237 @@
+from __future__ import annotations
+
+import gzip
+import ipaddress
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Compiled table layout (native byte order, built on the host that reads it):
+#   header: magic, n4, n6, records offset, records length
+#   v4:     starts[n4] u32, ends[n4] u32, record[n4] u32
+#   v6:     start_hi[n6] u64, start_lo[n6] u64, end_hi[n6] u64, end_lo[n6] u64, record[n6] u32
+#   records: JSON list of [asn, country, org]
+_MAGIC = b"ASNTBL1" + (b"L" if sys.byteorder == "little" else b"B")
+_HEADER = struct.Struct("=8sQQQQ")
+_MASK64 = (1 << 64) - 1
+
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def compile_tsv(tsv_path: str, out_path: str) -> None:
+    """Compile an iptoasn-style TSV (start, end, asn, country, org) into the mmap format.
+
+    Rows with AS 0 ("Not routed") are dropped; v4 and v6 rows may be mixed.
+    """
+    rows4: List[Tuple[int, int, int]] = []
+    rows6: List[Tuple[int, int, int]] = []
+    records: List[list] = []
+    record_ids: Dict[Tuple[int, str, str], int] = {}
+    with _open_text(tsv_path) as fh:
+        for line in fh:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) < 3:
+                continue
+            try:
+                start = ipaddress.ip_address(parts[0].strip())
+                end = ipaddress.ip_address(parts[1].strip())
+                asn = int(parts[2])
+            except ValueError:
+                continue
+            if asn == 0 or start.version != end.version:
+                continue
+            country = parts[3].strip() if len(parts) > 3 else ""
+            org = parts[4].strip() if len(parts) > 4 else ""
+            key = (asn, country, org)
+            rid = record_ids.get(key)
+            if rid is None:
+                rid = record_ids[key] = len(records)
+                records.append([asn, country, org])
+            (rows4 if start.version == 4 else rows6).append((int(start), int(end), rid))
+    rows4.sort()
+    rows6.sort()
+    blob = json.dumps(records, separators=(",", ":")).encode("utf-8")
+
+    sections = [
+        array("I", (r[0] for r in rows4)), array("I", (r[1] for r in rows4)), array("I", (r[2] for r in rows4)),
+        array("Q", (r[0] >> 64 for r in rows6)), array("Q", (r[0] & _MASK64 for r in rows6)),
+        array("Q", (r[1] >> 64 for r in rows6)), array("Q", (r[1] & _MASK64 for r in rows6)),
+        array("I", (r[2] for r in rows6)),
+    ]
+    # Pad so the u64 arrays and the records blob stay 8-byte aligned
+    offsets = _section_offsets(len(rows4), len(rows6))
+    records_offset = offsets["records"]
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as out:
+        out.write(_HEADER.pack(_MAGIC, len(rows4), len(rows6), records_offset, len(blob)))
+        pos = _HEADER.size
+        for name, a in zip(_SECTION_NAMES, sections):
+            pad = offsets[name] - pos
+            out.write(b"\0" * pad)
+            out.write(a.tobytes())
+            pos = offsets[name] + len(a) * a.itemsize
+        out.write(b"\0" * (records_offset - pos))
+        out.write(blob)
+    os.replace(tmp, out_path)
+
+
+_SECTION_NAMES = ("v4_start", "v4_end", "v4_rec", "v6_start_hi", "v6_start_lo", "v6_end_hi", "v6_end_lo", "v6_rec")
+
+
+def _section_offsets(n4: int, n6: int) -> Dict[str, int]:
+    sizes = {
+        "v4_start": 4 * n4, "v4_end": 4 * n4, "v4_rec": 4 * n4,
+        "v6_start_hi": 8 * n6, "v6_start_lo": 8 * n6, "v6_end_hi": 8 * n6, "v6_end_lo": 8 * n6, "v6_rec": 4 * n6,
+    }
+    offsets: Dict[str, int] = {}
+    pos = _HEADER.size
+    for name in _SECTION_NAMES + ("records",):
+        pos = (pos + 7) & ~7
+        offsets[name] = pos
+        pos += sizes.get(name, 0)
+    return offsets
+
+
+def _prefix(version: int, start: int, end: int, addr: int) -> str:
+    """The CIDR block of ``start``-``end`` (split into aligned blocks) that contains ``addr``."""
+    bits = 32 if version == 4 else 128
+    cur = start
+    while True:
+        # Largest aligned block at cur that stays within the range
+        size = (cur & -cur) if cur else 1 << bits
+        while cur + size - 1 > end:
+            size >>= 1
+        if addr < cur + size:
+            plen = bits - size.bit_length() + 1
+            net = ipaddress.IPv4Address(cur) if version == 4 else ipaddress.IPv6Address(cur)
+            return f"{net}/{plen}"
+        cur += size
+
+
+class _U128:
+    """Sequence view joining hi/lo u64 arrays into ints, so ``bisect`` works on IPv6 starts."""
+
+    def __init__(self, hi: memoryview, lo: memoryview):
+        self.hi, self.lo = hi, lo
+
+    def __len__(self) -> int:
+        return len(self.hi)
+
+    def __getitem__(self, i: int) -> int:
+        return (self.hi[i] << 64) | self.lo[i]
+
+
+class AsnTable:
+    """Read-only, memory-mapped IP range -> (ASN, country, org) table.
+
+    Ranges are non-overlapping and sorted by start, so a lookup is one
+    ``bisect`` over the mapped start array plus an end check.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = open(path, "rb")
+        self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n4, n6, rec_off, rec_len = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not a compiled ASN table for this platform")
+        off = _section_offsets(n4, n6)
+        view = memoryview(self._mm)
+
+        def section(name: str, fmt: str, n: int) -> memoryview:
+            size = struct.calcsize(fmt)
+            return view[off[name]:off[name] + size * n].cast(fmt)
+
+        self.v4_start, self.v4_end, self.v4_rec = section("v4_start", "I", n4), section("v4_end", "I", n4), section("v4_rec", "I", n4)
+        self.v6_start = _U128(section("v6_start_hi", "Q", n6), section("v6_start_lo", "Q", n6))
+        self.v6_end = _U128(section("v6_end_hi", "Q", n6), section("v6_end_lo", "Q", n6))
+        self.v6_rec = section("v6_rec", "I", n6)
+        self.records = json.loads(bytes(view[rec_off:rec_off + rec_len]))
+        self.ranges = n4 + n6
+
+    @classmethod
+    def load(cls, path: str) -> "AsnTable":
+        """Open a compiled table, compiling ``path`` first when it is a (newer) TSV."""
+        if path.endswith((".tsv", ".tsv.gz", ".txt", ".txt.gz")):
+            compiled = path + ".bin"
+            if not os.path.exists(compiled) or os.path.getmtime(compiled) < os.path.getmtime(path):
+                compile_tsv(path, compiled)
+            path = compiled
+        return cls(path)
+
+    def close(self) -> None:
+        # Views must be released before the map can close
+        for name in ("v4_start", "v4_end", "v4_rec", "v6_rec"):
+            v = self.__dict__.pop(name, None)
+            if v is not None:
+                v.release()
+        for name in ("v6_start", "v6_end"):
+            v = self.__dict__.pop(name, None)
+            if v is not None:
+                v.hi.release()
+                v.lo.release()
+        self._mm.close()
+        self._fh.close()
+
+    def _range(self, version: int, i: int) -> Tuple[int, int, int]:
+        if version == 4:
+            return self.v4_start[i], self.v4_end[i], self.v4_rec[i]
+        return self.v6_start[i], self.v6_end[i], self.v6_rec[i]
+
+    def _entry(self, version: int, start: int, end: int, rid: int, addr: int) -> dict:
+        asn, country, org = self.records[rid]
+        cls = ipaddress.IPv4Address if version == 4 else ipaddress.IPv6Address
+        first, last = cls(start), cls(end)
+        return {"asn": asn, "asn_country": country or None, "asn_org": org or None, "prefix": _prefix(version, start, end, addr), "asn_range": f"{first} - {last}"}
+
+    def lookup(self, ip: str) -> Optional[dict]:
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        n = int(addr)
+        starts, ends = (self.v4_start, self.v4_end) if addr.version == 4 else (self.v6_start, self.v6_end)
+        i = bisect_right(starts, n) - 1
+        if i < 0 or ends[i] < n:
+            return None
+        start, end, rid = self._range(addr.version, i)
+        return self._entry(addr.version, start, end, rid, n)
+
+    def lookup_many(self, ips: Iterable[str]) -> Dict[str, dict]:
+        """Bulk lookup: sort the queries once and sweep them against the table.
+
+        Consecutive queries in the same range skip the bisect entirely, and the
+        rest only search the part of the table after the previous hit.
+        """
+        parsed: Dict[int, List[Tuple[int, str]]] = {4: [], 6: []}
+        for ip in ips:
+            try:
+                addr = ipaddress.ip_address(ip)
+            except ValueError:
+                continue
+            parsed[addr.version].append((int(addr), ip))
+        out: Dict[str, dict] = {}
+        for version, queries in parsed.items():
+            starts, ends = (self.v4_start, self.v4_end) if version == 4 else (self.v6_start, self.v6_end)
+            queries.sort()
+            i = -1
+            start = end = rid = -1
+            for n, ip in queries:
+                if not (start <= n <= end):
+                    # Queries are sorted, so the previous position is a valid lower bound
+                    i = bisect_right(starts, n, max(i, 0)) - 1
+                    if i < 0 or ends[i] < n:
+                        continue
+                    start, end, rid = self._range(version, i)
+                out[ip] = self._entry(version, start, end, rid, n)
+        return out
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import codecs
+import gzip
+import json
+import re
+from typing import AsyncIterable, Iterable, Optional, Set
+
+# Largest single certificate row we wait for before treating the buffer as garbage
+_MAX_OBJECT = 1 << 20
+_SPLIT = re.compile(r"\s+")
+_DECODER = json.JSONDecoder()
+
+
+def _truncated(err: json.JSONDecodeError, end: int) -> bool:
+    # An error at the end of the buffer (or an open string/literal running into it) means the row is cut off
+    return err.msg.startswith("Unterminated string") or end - err.pos <= 8
+
+
+class CrtshStreamParser:
+    """Incremental parser for crt.sh JSON output.
+
+    Accepts the body in arbitrary chunks (a JSON array, or objects that are
+    concatenated / one per line) and keeps only the deduplicated names under
+    ``domain``. Each certificate row is decoded on its own and dropped, so
+    memory is bounded by the name set plus one chunk, not the document size.
+
+    Rows with a crt.sh ``id`` at or below ``min_id`` are counted but skipped;
+    ``max_id`` / ``max_entry`` track the newest row seen (the watermark).
+    """
+
+    def __init__(self, domain: str, min_id: int = 0):
+        self.domain = domain.strip().lower()
+        self.min_id = int(min_id)
+        self.names: Set[str] = set()
+        self.entries = 0
+        self.skipped = 0
+        self.max_id = self.min_id
+        self.max_entry: Optional[str] = None
+        self.bytes = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buf = ""
+
+    def feed(self, chunk: bytes) -> None:
+        self.bytes += len(chunk)
+        self._buf += self._decoder.decode(chunk)
+        self._drain(final=False)
+
+    def close(self) -> Set[str]:
+        self._buf += self._decoder.decode(b"", final=True)
+        self._drain(final=True)
+        self._buf = ""
+        return self.names
+
+    def _drain(self, final: bool) -> None:
+        buf = self._buf
+        pos, end = 0, len(buf)
+        while True:
+            # Skip array brackets, separators and anything else between rows
+            pos = buf.find("{", pos)
+            if pos < 0:
+                pos = end
+                break
+            try:
+                obj, nxt = _DECODER.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                if final or end - pos > _MAX_OBJECT or not _truncated(e, end):
+                    # Malformed row: resync on the next object
+                    pos += 1
+                    continue
+                break  # incomplete row, wait for more input
+            pos = nxt
+            if isinstance(obj, dict):
+                self._add(obj)
+        self._buf = buf[pos:]
+
+    def _add(self, obj: dict) -> None:
+        self.entries += 1
+        row_id = obj.get("id")
+        if isinstance(row_id, int):
+            if row_id <= self.min_id:
+                self.skipped += 1
+                return
+            self.max_id = max(self.max_id, row_id)
+        entry = obj.get("entry_timestamp")
+        if isinstance(entry, str) and (self.max_entry is None or entry > self.max_entry):
+            self.max_entry = entry
+        name_value = obj.get("name_value") or obj.get("common_name") or ""
+        for part in _SPLIT.split(str(name_value)):
+            d = part.strip().lower().lstrip("*.")
+            if d and d.endswith(self.domain):
+                self.names.add(d)
+
+
+async def parse_crtsh_stream(chunks: AsyncIterable[bytes], domain: str, parser: Optional[CrtshStreamParser] = None) -> Set[str]:
+    """Names from an async byte stream (e.g. ``httpx.Response.aiter_bytes()``)."""
+    parser = parser or CrtshStreamParser(domain)
+    async for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def parse_crtsh_chunks(chunks: Iterable[bytes], domain: str) -> Set[str]:
+    parser = CrtshStreamParser(domain)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
+
+
+def parse_crtsh_file(path: str, domain: str, chunk_size: int = 1 << 16) -> Set[str]:
+    """Names from a saved crt.sh JSON dump (``.gz`` is decompressed on the fly)."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as fh:
+        return parse_crtsh_chunks(iter(lambda: fh.read(chunk_size), b""), domain)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+from .crtsh_stream import CrtshStreamParser, parse_crtsh_stream
+from .http_client import http_client
+from .stage_cache import stage_cache
+
+# Persisted per-domain watermarks and subdomain sets (see CtMonitor)
+CT_MONITOR_PATH = os.getenv("CT_MONITOR_PATH", str(Path(__file__).resolve().parents[2] / "data" / "ct_monitor.json"))
+# Delta polls ask crt.sh for unexpired certificates only; after a gap this long, fetch the full history again
+CT_MONITOR_FULL_AFTER = int(os.getenv("CT_MONITOR_FULL_AFTER", str(30 * 86400)))
+
+
+class CtMonitor:
+    """Watermarked crt.sh polling for domains that are re-scanned regularly.
+
+    crt.sh has no "newer than id N" filter, so a delta poll requests
+    ``exclude=expired`` (new certificates are never expired yet), which is a
+    fraction of the full history, and drops rows at or below the stored
+    max certificate id while streaming. New names are merged into the
+    persisted set and returned as a diff.
+    """
+
+    def __init__(self, path: Optional[str] = CT_MONITOR_PATH, full_after: int = CT_MONITOR_FULL_AFTER):
+        self.path = path
+        self.full_after = int(full_after)
+        self._state: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._loaded = False
+        self._domain_locks: Dict[str, asyncio.Lock] = {}
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                state = json.load(fh)
+        except (OSError, ValueError):
+            return
+        if isinstance(state, dict):
+            self._state = {d: s for d, s in state.items() if isinstance(s, dict)}
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        # Concurrent polls save from several threads; they share the tmp file, so one writer at a time
+        with self._save_lock:
+            with self._lock:
+                data = json.dumps(self._state, separators=(",", ":"))
+            path = Path(self.path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_text(data, encoding="utf-8")
+            os.replace(tmp, path)
+
+    def get(self, domain: str) -> Optional[dict]:
+        with self._lock:
+            self._ensure_loaded()
+            state = self._state.get(domain)
+            return dict(state) if state is not None else None
+
+    def forget(self, domain: str) -> bool:
+        with self._lock:
+            self._ensure_loaded()
+            found = self._state.pop(domain, None) is not None
+        if found:
+            self._save()
+        return found
+
+    def summary(self) -> List[dict]:
+        with self._lock:
+            self._ensure_loaded()
+            return [
+                {"domain": d, **{k: v for k, v in s.items() if k != "subdomains"}, "subdomains": len(s.get("subdomains") or [])}
+                for d, s in sorted(self._state.items())
+            ]
+
+    async def poll(self, domain: str, proxies: Optional[str] = None, timeout_secs: int = 60, full: bool = False) -> dict:
+        """Fetch certificates newer than the domain's watermark and return the new subdomains."""
+        lock = self._domain_locks.setdefault(domain, asyncio.Lock())
+        async with lock:
+            return await self._poll(domain, proxies, timeout_secs, full)
+
+    async def _poll(self, domain: str, proxies: Optional[str], timeout_secs: int, full: bool) -> dict:
+        prev = await asyncio.to_thread(self.get, domain) or {}
+        now = time.time()
+        delta = bool(prev) and not full and now - float(prev.get("last_run") or 0) < self.full_after
+        url = f"https://crt.sh/?q=%25.{domain}&output=json" + ("&exclude=expired" if delta else "")
+        parser = CrtshStreamParser(domain, min_id=int(prev.get("max_id") or 0) if delta else 0)
+        timeout = httpx.Timeout(timeout_secs, connect=min(10.0, timeout_secs))
+        t0 = time.monotonic()
+        try:
+            async with http_client("crtsh", proxies) as client:
+                async with client.stream("GET", url, timeout=timeout) as r:
+                    if r.status_code != 200:
+                        return {"domain": domain, "error": f"crt.sh returned HTTP {r.status_code}"}
+                    await parse_crtsh_stream(r.aiter_bytes(), domain, parser)
+        except Exception as e:
+            # A partial download can't move the watermark: rows are not guaranteed to arrive in id order
+            return {"domain": domain, "error": str(e) or type(e).__name__}
+
+        known = set(prev.get("subdomains") or [])
+        new = sorted(parser.names - known)
+        merged = sorted(known | parser.names)
+        state = {
+            "max_id": max(parser.max_id, int(prev.get("max_id") or 0)),
+            "max_entry": max(filter(None, [parser.max_entry, prev.get("max_entry")]), default=None),
+            "first_run": prev.get("first_run") or now,
+            "last_run": now,
+            "runs": int(prev.get("runs") or 0) + 1,
+            "last_new": new,
+            "subdomains": merged,
+        }
+        with self._lock:
+            self._ensure_loaded()
+            self._state[domain] = state
+        await asyncio.to_thread(self._save)
+        # The merged set is a superset of a full crt.sh answer, so analyses can reuse it
+        stage_cache("crtsh").set(domain, merged)
+        return {
+            "domain": domain,
+            "mode": "delta" if delta else "full",
+            "since": prev.get("last_run"),
+            "new": new,
+            "total": len(merged),
+            "max_id": state["max_id"],
+            "max_entry": state["max_entry"],
+            "rows": parser.entries,
+            "rows_skipped": parser.skipped,
+            "bytes": parser.bytes,
+            "seconds": round(time.monotonic() - t0, 3),
+        }
+
+
+CT_MONITOR = CtMonitor()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Process-wide DNS answer cache shared by every analysis
+DNS_CACHE_MAX_ENTRIES = int(os.getenv("DNS_CACHE_MAX_ENTRIES", "200000"))
+DNS_CACHE_NEGATIVE_TTL = int(os.getenv("DNS_CACHE_NEGATIVE_TTL", "300"))
+DNS_CACHE_MAX_TTL = int(os.getenv("DNS_CACHE_MAX_TTL", "86400"))
+
+
+class DnsCache:
+    """LRU cache of formatted answers keyed by (name, rdtype).
+
+    Positive answers live for the record TTL (capped at ``max_ttl``);
+    NXDOMAIN/NoAnswer results are stored as an empty answer for ``negative_ttl``.
+    """
+
+    def __init__(self, max_entries: int = DNS_CACHE_MAX_ENTRIES, negative_ttl: int = DNS_CACHE_NEGATIVE_TTL, max_ttl: int = DNS_CACHE_MAX_TTL):
+        self.max_entries = max(1, int(max_entries))
+        self.negative_ttl = max(0, int(negative_ttl))
+        self.max_ttl = max(0, int(max_ttl))
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, Tuple[str, ...]]]" = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(name: str, rdtype: str) -> Tuple[str, str]:
+        return name.rstrip('.').lower(), rdtype.upper()
+
+    def get(self, name: str, rdtype: str) -> Optional[List[str]]:
+        key = self._key(name, rdtype)
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, values = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        if not values:
+            self.negative_hits += 1
+        return list(values)
+
+    def put(self, name: str, rdtype: str, values: List[str], ttl: int) -> None:
+        ttl = min(int(ttl), self.max_ttl)
+        if ttl <= 0:
+            return
+        key = self._key(name, rdtype)
+        self._data[key] = (time.monotonic() + ttl, tuple(values))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def put_negative(self, name: str, rdtype: str) -> None:
+        self.put(name, rdtype, [], self.negative_ttl)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "negative_ttl": self.negative_ttl,
+        }
+
+
+DNS_CACHE = DnsCache()
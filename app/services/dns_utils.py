@@ -1,61 +1,143 @@
 from __future__ import annotations
 
-from typing import Dict, Iterable, List
+import asyncio
+import itertools
+import os
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
 
+import dns.asyncresolver
 import dns.resolver
 
+from .dns_cache import DNS_CACHE, DnsCache
 
-def resolve_records(hosts: Iterable[str]) -> Dict[str, Dict[str, List[str]]]:  # noqa: C901
-    resolver = dns.resolver.Resolver(configure=True)
+DEFAULT_RECORD_TYPES = ("A", "AAAA", "CNAME", "MX", "NS", "TXT")
+
+# Bounds for the async engine; overridable per call or through the environment
+DNS_MAX_IN_FLIGHT = int(os.getenv("DNS_MAX_IN_FLIGHT", "200"))
+DNS_PER_NAMESERVER = int(os.getenv("DNS_PER_NAMESERVER", "50"))
+
+
+def _format_rdata(rdtype: str, rdata) -> str:
+    if rdtype in ("A", "AAAA"):
+        return rdata.address
+    if rdtype in ("CNAME", "NS"):
+        return str(rdata.target).rstrip('.')
+    if rdtype == "MX":
+        exch = str(rdata.exchange).rstrip('.')
+        pref = int(getattr(rdata, 'preference', 0))
+        return f"{pref} {exch}"
+    if rdtype == "TXT":
+        return ''.join([t.decode() if isinstance(t, bytes) else str(t) for t in rdata.strings])
+    return rdata.to_text()
+
+
+def _empty_records(rdtypes: Iterable[str]) -> Dict[str, List[str]]:
+    # Always carry the six legacy keys so callers can index them unconditionally
+    recs: Dict[str, List[str]] = {t: [] for t in DEFAULT_RECORD_TYPES}
+    for t in rdtypes:
+        recs.setdefault(t, [])
+    return recs
+
+
+def resolve_records(hosts: Iterable[str], nameservers: Optional[Sequence[str]] = None, port: int = 53) -> Dict[str, Dict[str, List[str]]]:
+    resolver = dns.resolver.Resolver(configure=not nameservers)
+    if nameservers:
+        resolver.nameservers = list(nameservers)
+        resolver.port = port
     resolver.lifetime = 4.0
     resolver.timeout = 2.0
 
     result: Dict[str, Dict[str, List[str]]] = {}
     for host in hosts:
-        recs = {"A": [], "AAAA": [], "CNAME": [], "MX": [], "NS": [], "TXT": []}
-        try:
-            for rdata in resolver.resolve(host, "A"):
-                ip = rdata.address
-                if ip not in recs["A"]:
-                    recs["A"].append(ip)
-        except Exception:
-            pass
-        try:
-            for rdata in resolver.resolve(host, "AAAA"):
-                ip6 = rdata.address
-                if ip6 not in recs["AAAA"]:
-                    recs["AAAA"].append(ip6)
-        except Exception:
-            pass
-        try:
-            for rdata in resolver.resolve(host, "CNAME"):
-                cname = str(rdata.target).rstrip('.')
-                if cname not in recs["CNAME"]:
-                    recs["CNAME"].append(cname)
-        except Exception:
-            pass
-        try:
-            for rdata in resolver.resolve(host, "MX"):
-                exch = str(rdata.exchange).rstrip('.')
-                pref = int(getattr(rdata, 'preference', 0))
-                entry = f"{pref} {exch}"
-                if entry not in recs["MX"]:
-                    recs["MX"].append(entry)
-        except Exception:
-            pass
-        try:
-            for rdata in resolver.resolve(host, "NS"):
-                ns = str(rdata.target).rstrip('.')
-                if ns not in recs["NS"]:
-                    recs["NS"].append(ns)
-        except Exception:
-            pass
-        try:
-            for rdata in resolver.resolve(host, "TXT"):
-                txt = ''.join([t.decode() if isinstance(t, bytes) else str(t) for t in rdata.strings])
-                if txt not in recs["TXT"]:
-                    recs["TXT"].append(txt)
-        except Exception:
-            pass
+        recs = _empty_records(DEFAULT_RECORD_TYPES)
+        for rdtype in DEFAULT_RECORD_TYPES:
+            try:
+                for rdata in resolver.resolve(host, rdtype):
+                    value = _format_rdata(rdtype, rdata)
+                    if value not in recs[rdtype]:
+                        recs[rdtype].append(value)
+            except Exception:
+                pass
         result[host] = recs
     return result
+
+
+async def resolve_records_async(
+    hosts: Iterable[str],
+    *,
+    record_types: Sequence[str] = DEFAULT_RECORD_TYPES,
+    max_in_flight: int = DNS_MAX_IN_FLIGHT,
+    per_nameserver: int = DNS_PER_NAMESERVER,
+    nameservers: Optional[Sequence[str]] = None,
+    port: int = 53,
+    timeout: float = 2.0,
+    lifetime: float = 4.0,
+    on_result: Optional[Callable[[str, Dict[str, List[str]]], None]] = None,
+    cache: Optional[DnsCache] = DNS_CACHE,
+) -> Dict[str, Dict[str, List[str]]]:
+    """Resolve ``record_types`` for every host with a bounded number of queries in flight.
+
+    Returns the same ``{host: {A, AAAA, CNAME, MX, NS, TXT}}`` shape as
+    :func:`resolve_records`. ``on_result`` is called once per host as soon as all
+    of its queries have finished. Answers are served from and stored in ``cache``
+    (the process-wide :data:`DNS_CACHE` by default; pass ``None`` to bypass it).
+    """
+    host_list = list(dict.fromkeys(h for h in hosts if h))
+    rdtypes = [t.upper() for t in record_types] or list(DEFAULT_RECORD_TYPES)
+    result: Dict[str, Dict[str, List[str]]] = {h: _empty_records(rdtypes) for h in host_list}
+    if not host_list:
+        return result
+
+    if not nameservers:
+        nameservers = dns.resolver.Resolver(configure=True).nameservers
+    nameservers = list(nameservers)
+
+    # One resolver per nameserver, each preferring "its" server first but keeping
+    # the others for failover; a semaphore per server caps what we send to it.
+    resolvers: List[dns.asyncresolver.Resolver] = []
+    for i in range(len(nameservers)):
+        r = dns.asyncresolver.Resolver(configure=False)
+        r.nameservers = nameservers[i:] + nameservers[:i]
+        r.port = port
+        r.timeout = timeout
+        r.lifetime = lifetime
+        resolvers.append(r)
+    ns_sems = [asyncio.Semaphore(max(1, per_nameserver)) for _ in resolvers]
+    ns_cycle = itertools.cycle(range(len(resolvers)))
+
+    pending = {h: len(rdtypes) for h in host_list}
+    jobs = iter([(h, t) for h in host_list for t in rdtypes])
+
+    async def query(host: str, rdtype: str) -> None:
+        idx = next(ns_cycle)
+        recs = result[host][rdtype]
+        cached = cache.get(host, rdtype) if cache is not None else None
+        if cached is not None:
+            recs.extend(cached)
+        else:
+            try:
+                async with ns_sems[idx]:
+                    answer = await resolvers[idx].resolve(host, rdtype)
+                for rdata in answer:
+                    value = _format_rdata(rdtype, rdata)
+                    if value not in recs:
+                        recs.append(value)
+                if cache is not None:
+                    cache.put(host, rdtype, recs, answer.rrset.ttl if answer.rrset is not None else 0)
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+                if cache is not None:
+                    cache.put_negative(host, rdtype)
+            except Exception:
+                pass
+        pending[host] -= 1
+        if pending[host] == 0 and on_result is not None:
+            on_result(host, result[host])
+
+    async def worker() -> None:
+        # Workers pull from a shared iterator so at most max_in_flight queries exist at once
+        for host, rdtype in jobs:
+            await query(host, rdtype)
+
+    n_workers = max(1, min(max_in_flight, len(host_list) * len(rdtypes)))
+    await asyncio.gather(*(worker() for _ in range(n_workers)))
+    return result
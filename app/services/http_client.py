@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import importlib.util
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+# Pool sizing for the shared clients (per provider + proxy)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "1").lower() not in ("0", "false", "no")
+
+_DEFAULT_TIMEOUT = httpx.Timeout(20.0, connect=10.0)
+
+# Per-provider client settings; request-specific auth/params are passed per call
+_PROVIDERS: Dict[str, Dict[str, object]] = {
+    "reverse_ip": {"timeout": httpx.Timeout(20.0, connect=10.0), "user_agent": "WebReconVisualizer/0.1"},
+    # rdap.org answers with a redirect to the responsible RIR
+    "rdap": {"timeout": httpx.Timeout(20.0, connect=10.0), "follow_redirects": True},
+    "crtsh": {"timeout": httpx.Timeout(20.0, connect=10.0), "user_agent": "WebReconVisualizer/0.1"},
+    "shodan": {"timeout": httpx.Timeout(25.0, connect=10.0)},
+    "censys": {"timeout": httpx.Timeout(25.0, connect=10.0)},
+    "securitytrails": {"timeout": httpx.Timeout(25.0, connect=10.0)},
+    "tor_check": {"timeout": httpx.Timeout(8.0)},
+}
+
+
+def _http2_available() -> bool:
+    # httpx only speaks HTTP/2 when the optional h2 package is installed (httpx[http2])
+    return HTTP_HTTP2 and importlib.util.find_spec("h2") is not None
+
+
+class _ReuseStats:
+    """Requests vs. new TCP connections/TLS handshakes seen through httpcore's trace extension."""
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    async def on_request(self, request: httpx.Request) -> None:
+        self.requests += 1
+        request.extensions["trace"] = self.trace
+
+    async def trace(self, event: str, info: dict) -> None:
+        # Event names are prefixed by the pool type (connection., socks_proxy., http_proxy.)
+        if event.endswith("connect_tcp.complete"):
+            self.connections += 1
+        elif event.endswith("start_tls.complete"):
+            self.tls_handshakes += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        reused = max(0, self.requests - self.connections)
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "tls_handshakes": self.tls_handshakes,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+class HttpClientRegistry:
+    """Application-lifetime ``httpx.AsyncClient`` instances keyed by (provider, proxy).
+
+    Opened and closed by the FastAPI lifespan. Outside the app (scripts,
+    benchmarks) :func:`http_client` falls back to a client per call.
+    """
+
+    def __init__(self) -> None:
+        self._clients: Dict[Tuple[str, Optional[str]], httpx.AsyncClient] = {}
+        self._stats: Dict[Tuple[str, Optional[str]], _ReuseStats] = {}
+        self.active = False
+
+    def open(self) -> None:
+        self.active = True
+
+    def _build(self, provider: str, proxy: Optional[str], stats: Optional[_ReuseStats] = None) -> httpx.AsyncClient:
+        conf = _PROVIDERS.get(provider, {})
+        http2 = _http2_available()
+        limits = httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        transport = httpx.AsyncHTTPTransport(proxy=proxy, http2=http2, limits=limits)
+        return httpx.AsyncClient(
+            timeout=conf.get("timeout", _DEFAULT_TIMEOUT),
+            headers={"User-Agent": str(conf.get("user_agent", "WebReconVisualizer/0.2"))},
+            transport=transport,
+            http2=http2,
+            follow_redirects=bool(conf.get("follow_redirects", False)),
+            event_hooks={"request": [stats.on_request]} if stats is not None else None,
+        )
+
+    def get(self, provider: str, proxy: Optional[str] = None) -> httpx.AsyncClient:
+        key = (provider, proxy or None)
+        client = self._clients.get(key)
+        if client is None or client.is_closed:
+            stats = self._stats.setdefault(key, _ReuseStats())
+            client = self._clients[key] = self._build(provider, proxy, stats)
+        return client
+
+    async def aclose(self) -> None:
+        self.active = False
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "http2": _http2_available(),
+            "open_clients": len(self._clients),
+            "clients": {
+                f"{provider}{' via ' + proxy if proxy else ''}": s.snapshot()
+                for (provider, proxy), s in sorted(self._stats.items(), key=lambda kv: (kv[0][0], kv[0][1] or ""))
+            },
+        }
+
+
+HTTP_CLIENTS = HttpClientRegistry()
+
+
+@asynccontextmanager
+async def http_client(provider: str, proxy: Optional[str] = None) -> AsyncIterator[httpx.AsyncClient]:
+    """Yield the shared client for ``provider``/``proxy``, or a throwaway one when the app is not running."""
+    if HTTP_CLIENTS.active:
+        yield HTTP_CLIENTS.get(provider, proxy)
+        return
+    async with HTTP_CLIENTS._build(provider, proxy) as client:
+        yield client
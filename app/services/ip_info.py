@@ -1,18 +1,53 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Dict, Iterable, Optional
+import ipaddress
+import os
+import threading
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set
 
 import httpx
 
+from .asn_table import AsnTable
+from .http_client import http_client
+from .rate_limit import adaptive_limiter, request_with_retries
+from .rdap_index import RDAP_INDEX
+from .stage_cache import MISSING, stage_cache
+
 # Simple RDAP fetcher using rdap.org aggregator. This is best-effort and may vary by RIR.
 RDAP_BASE = "https://rdap.org/ip/"
+# Optional local IP-to-ASN dataset (iptoasn-style TSV, optionally .gz, or a compiled .bin table)
+ASN_DB_PATH = os.getenv("ASN_DB_PATH", "")
+
+_ASN_TABLE: Optional[AsnTable] = None
+_ASN_TABLE_LOADED = False
+_ASN_TABLE_LOCK = threading.Lock()
+
+
+def asn_table() -> Optional[AsnTable]:
+    """The local ASN table, loaded (and compiled from TSV if needed) on first use; None if not configured."""
+    global _ASN_TABLE, _ASN_TABLE_LOADED
+    with _ASN_TABLE_LOCK:
+        if not _ASN_TABLE_LOADED:
+            _ASN_TABLE_LOADED = True
+            if ASN_DB_PATH:
+                try:
+                    _ASN_TABLE = AsnTable.load(ASN_DB_PATH)
+                except (OSError, ValueError):
+                    _ASN_TABLE = None
+        return _ASN_TABLE
+
+
+def asn_lookup_many(ips: Iterable[str]) -> Dict[str, dict]:
+    """ASN, org, country and prefix for every IP covered by the local dataset."""
+    table = asn_table()
+    return table.lookup_many(ips) if table is not None else {}
 
 
 async def _rdap_one(client: httpx.AsyncClient, ip: str) -> dict:
     try:
-        r = await client.get(RDAP_BASE + ip)
-        if r.status_code != 200:
+        r = await request_with_retries(adaptive_limiter("rdap"), lambda: client.get(RDAP_BASE + ip))
+        if r is None or r.status_code != 200:
             return {}
         data = r.json()
         # Extract some common fields to keep payload compact
@@ -47,15 +82,97 @@ async def _rdap_one(client: httpx.AsyncClient, ip: str) -> dict:
         return {}
 
 
-async def ip_rdap_many(ips: Iterable[str], proxies: Optional[str] = None) -> Dict[str, dict]:
-    sem = asyncio.Semaphore(5)
-    timeout = httpx.Timeout(20.0, connect=10.0)
-    headers = {"User-Agent": "WebReconVisualizer/0.2"}
-    transport = httpx.AsyncHTTPTransport(proxy=proxies) if proxies else None
-    async with httpx.AsyncClient(timeout=timeout, headers=headers, transport=transport) as client:
+# Request coalescing blocks: (coarse, fine) prefix lengths per address family
+_BLOCKS = {4: (16, 24), 6: (32, 48)}
+
+
+def _block(ip: str, fine: bool) -> Hashable:
+    try:
+        addr = ipaddress.ip_address(ip)
+    except ValueError:
+        return ip
+    bits = 32 if addr.version == 4 else 128
+    prefix = _BLOCKS[addr.version][1 if fine else 0]
+    return addr.version, prefix, int(addr) >> (bits - prefix)
+
+
+async def ip_rdap_many(ips: Iterable[str], proxies: Optional[str] = None, on_result: Optional[Callable[[str, dict], None]] = None, rdap: bool = True) -> Dict[str, dict]:
+    """IP details from the local ASN table (when configured) merged with RDAP.
+
+    With ``rdap=False`` only the local data is returned and no request is made.
+    """
+    ip_list = list(dict.fromkeys(ips))
+    local = asn_lookup_many(ip_list)
+    if not rdap:
+        for ip in ip_list:
+            if on_result is not None:
+                on_result(ip, local.get(ip, {}))
+        return {ip: local.get(ip, {}) for ip in ip_list}
+    if local:
+        # RDAP fills in what the local table lacks (names, entities, events)
+        emit = on_result
+        on_result = (lambda ip, info: emit(ip, {**local.get(ip, {}), **info})) if emit is not None else None
+    res = await _rdap_many(ip_list, proxies, on_result)
+    return {ip: {**local.get(ip, {}), **res[ip]} for ip in ip_list}
+
+
+async def _rdap_many(ip_list: List[str], proxies: Optional[str], on_result: Optional[Callable[[str, dict], None]]) -> Dict[str, dict]:
+    cache = stage_cache("rdap")
+    out: Dict[str, dict] = {}
+    missing = []
+    for ip in ip_list:
+        cached = cache.get(ip)
+        if cached is MISSING:
+            missing.append(ip)
+        else:
+            out[ip] = cached
+            if on_result is not None:
+                on_result(ip, cached)
+    if not missing:
+        return {ip: out[ip] for ip in ip_list}
+
+    # Concurrency is governed by the adaptive "rdap" limiter, which backs off on 429/503/timeouts.
+    # The first lookup in each /16 (IPv6 /32) goes alone: the range it returns usually answers the
+    # rest of the block from the index. IPs it doesn't cover repeat that per /24 (/48), and once a
+    # /24 has been looked up too, whatever is still uncovered is fetched in parallel.
+    inflight: Dict[Hashable, asyncio.Future] = {}
+    probed: Set[Hashable] = set()
+    await RDAP_INDEX.load()
+    async with http_client("rdap", proxies) as client:
+        async def fetch(ip: str) -> dict:
+            info = await _rdap_one(client, ip)
+            if info:
+                RDAP_INDEX.add(info)
+            return info
+
         async def worker(ip: str):
-            async with sem:
-                return ip, await _rdap_one(client, ip)
-        tasks = [worker(ip) for ip in ips]
+            info = None
+            for fine in (False, True):
+                key = _block(ip, fine=fine)
+                while key in inflight:
+                    await inflight[key]
+                info = RDAP_INDEX.lookup(ip)
+                if info is not None:
+                    break
+                if key not in probed:
+                    probed.add(key)
+                    done = inflight[key] = asyncio.get_running_loop().create_future()
+                    try:
+                        info = await fetch(ip)
+                    finally:
+                        del inflight[key]
+                        done.set_result(None)
+                    break
+            else:
+                info = await fetch(ip)
+            if on_result is not None:
+                on_result(ip, info)
+            return ip, info
+        tasks = [worker(ip) for ip in missing]
         res = await asyncio.gather(*tasks)
-    return {ip: info for ip, info in res}
+    for ip, info in res:
+        # Empty dicts are failures (non-200, parse errors); retry those next time
+        if info:
+            cache.set(ip, info)
+        out[ip] = info
+    return {ip: out[ip] for ip in ip_list}
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from .record_store import RECORD_FIELDS
+
+JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "2"))
+JOBS_MAX_FINISHED = int(os.getenv("JOBS_MAX_FINISHED", "100"))
+
+Emit = Callable[[str, dict], None]
+Runner = Callable[[Emit], Awaitable[dict]]
+
+_ACTIVE = ("queued", "running")
+
+
+def _empty_partial(domain: str) -> dict:
+    return {
+        "domain": domain,
+        "whois": {},
+        "subdomains": [],
+        "subdomains_by_source": {},
+        **{field: {} for _, field in RECORD_FIELDS},
+        "reverse_ip": {},
+        "reverse_ip_errors": {},
+        "ip_info": {},
+        "ip_ports": {},
+    }
+
+
+class Job:
+    """One background analysis: status, per-stage progress and partial results."""
+
+    def __init__(self, key: str, domain: str):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.domain = domain
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.result: Optional[dict] = None
+        self.partial = _empty_partial(domain)
+        self.progress: Dict[str, int] = {}
+        self.sources_done: List[str] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def record(self, event: str, data: dict) -> None:
+        """Fold a pipeline event (see ``_run_analysis``) into progress and partial results."""
+        self.progress[event] = self.progress.get(event, 0) + 1
+        p = self.partial
+        if event == "result":
+            self.partial = dict(data)
+        elif event == "whois":
+            p["whois"] = data.get("whois") or {}
+        elif event == "subdomains":
+            source = data.get("source")
+            subs = data.get("subdomains") or []
+            if data.get("partial"):
+                # Names printed by a tool that is still running
+                p["subdomains_by_source"][source] = p["subdomains_by_source"].get(source, []) + subs
+            else:
+                p["subdomains_by_source"][source] = subs
+                self.sources_done.append(source)
+            p["subdomains"] = sorted(set(p["subdomains"]).union(subs))
+        elif event == "dns":
+            host, recs = data.get("host"), data.get("records") or {}
+            for rdtype, field in RECORD_FIELDS:
+                p[field][host] = recs.get(rdtype, [])
+        elif event in ("reverse_ip", "enrich"):
+            merged = p["reverse_ip"].setdefault(data.get("ip"), [])
+            for d in data.get("domains") or []:
+                if d not in merged:
+                    merged.append(d)
+            if data.get("error"):
+                p["reverse_ip_errors"][data.get("ip")] = data["error"]
+        elif event == "ip_info":
+            p["ip_info"][data.get("ip")] = data.get("info") or {}
+        elif event == "ports":
+            p["ip_ports"][data.get("ip")] = data.get("result") or {}
+
+    def snapshot(self) -> dict:
+        now = time.time()
+        return {
+            "id": self.id,
+            "domain": self.domain,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed": round((self.finished_at or now) - (self.started_at or now), 2),
+            "error": self.error,
+            "progress": {
+                "sources_done": list(self.sources_done),
+                "subdomains": len(self.partial.get("subdomains") or []),
+                "hosts_resolved": self.progress.get("dns", 0),
+                "reverse_ip": self.progress.get("reverse_ip", 0),
+                "ip_info": self.progress.get("ip_info", 0),
+                "ports": self.progress.get("ports", 0),
+                "events": dict(self.progress),
+            },
+        }
+
+
+class JobManager:
+    """In-process analysis queue with a bounded worker pool.
+
+    Jobs with the same key (``_cache_key``) that are still queued or running
+    are shared instead of starting a second analysis.
+    """
+
+    def __init__(self, concurrency: int = JOBS_CONCURRENCY, max_finished: int = JOBS_MAX_FINISHED):
+        self.concurrency = max(1, int(concurrency))
+        self.max_finished = max(0, int(max_finished))
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    def _slots(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.concurrency)
+        return self._sem
+
+    def find_active(self, key: str) -> Optional[Job]:
+        for job in self._jobs.values():
+            if job.key == key and job.status in _ACTIVE:
+                return job
+        return None
+
+    def submit(self, key: str, domain: str, runner: Runner) -> tuple[Job, bool]:
+        """Queue ``runner`` for ``key``; returns (job, deduplicated)."""
+        existing = self.find_active(key)
+        if existing is not None:
+            return existing, True
+        job = Job(key, domain)
+        self._jobs[job.id] = job
+        job.task = asyncio.create_task(self._run(job, runner))
+        self._prune()
+        return job, False
+
+    async def _run(self, job: Job, runner: Runner) -> None:
+        try:
+            async with self._slots():
+                job.status = "running"
+                job.started_at = time.time()
+                job.result = await runner(job.record)
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "error"
+            job.error = getattr(e, "detail", None) or str(e)
+        finally:
+            job.finished_at = time.time()
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is not None and job.task is not None and not job.task.done():
+            # Cancellation reaches the enumerator/nmap subprocess waits, which kill their processes
+            job.task.cancel()
+        return job
+
+    def _prune(self) -> None:
+        finished = [j for j in self._jobs.values() if j.status not in _ACTIVE]
+        for job in finished[: max(0, len(finished) - self.max_finished)]:
+            self._jobs.pop(job.id, None)
+
+    def stats(self) -> dict:
+        counts: Dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"concurrency": self.concurrency, "jobs": counts}
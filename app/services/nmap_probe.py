@@ -2,11 +2,14 @@ from __future__ import annotations
 
 import asyncio
 import xml.etree.ElementTree as ET
-from typing import Dict, Iterable, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
 import shutil
 
+from .stage_cache import MISSING, stage_cache
 
-def _build_nmap_cmd(ip: str, *, top_ports: int = 100, timing: str = "T4", skip_host_discovery: bool = True, udp: bool = False, ports_spec: Optional[str] = None) -> List[str]:
+
+def _build_nmap_cmd(ip: str, *, top_ports: int = 100, timing: str = "T4", skip_host_discovery: bool = True, udp: bool = False, ports_spec: Optional[str] = None, min_hostgroup: Optional[int] = None, min_parallelism: Optional[int] = None, host_timeout: Optional[int] = None) -> List[str]:
+    """Build the nmap argv; pass ``ip="-"`` to read a target list from stdin (``-iL -``)."""
     cmd: List[str] = [
         "nmap",
         "-n",  # no DNS
@@ -22,72 +25,278 @@ def _build_nmap_cmd(ip: str, *, top_ports: int = 100, timing: str = "T4", skip_h
         cmd.append("-Pn")
     if udp:
         cmd.extend(["-sU"])  # UDP scan can be slow; use with care
-    cmd.append(ip)
+    if min_hostgroup:
+        cmd.extend(["--min-hostgroup", str(int(min_hostgroup))])
+    if min_parallelism:
+        cmd.extend(["--min-parallelism", str(int(min_parallelism))])
+    if host_timeout:
+        cmd.extend(["--host-timeout", f"{int(host_timeout)}s"])
+    if ip == "-":
+        cmd.extend(["-iL", "-"])
+    else:
+        cmd.append(ip)
     return cmd
 
 
-async def _run_nmap(ip: str, *, top_ports: int, timing: str, skip_host_discovery: bool, udp: bool, timeout: int, use_proxychains: bool = False, ports_spec: Optional[str] = None) -> Dict:
-    cmd = _build_nmap_cmd(ip, top_ports=top_ports, timing=timing, skip_host_discovery=skip_host_discovery, udp=udp, ports_spec=ports_spec)
+def _wrap_proxychains(cmd: List[str], use_proxychains: bool) -> List[str]:
     if use_proxychains and shutil.which('proxychains4'):
-        cmd = ['proxychains4'] + cmd
-    elif use_proxychains and shutil.which('proxychains'):
-        cmd = ['proxychains'] + cmd
-    try:
-        proc = await asyncio.create_subprocess_exec(
-            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-        )
+        return ['proxychains4'] + cmd
+    if use_proxychains and shutil.which('proxychains'):
+        return ['proxychains'] + cmd
+    return cmd
+
+
+def _parse_host_ports(host: ET.Element) -> List[Dict]:
+    # Extract open ports with service info from one <host> element
+    out: List[Dict] = []
+    ports = host.find("ports")
+    if ports is None:
+        return out
+    for p in ports.findall("port"):
+        proto = p.get("protocol") or "tcp"
+        portid = p.get("portid") or ""
+        state_el = p.find("state")
+        if state_el is None or state_el.get("state") != "open":
+            continue
+        service_el = p.find("service")
+        service = service_el.get("name") if service_el is not None else None
+        product = service_el.get("product") if service_el is not None else None
+        version = service_el.get("version") if service_el is not None else None
+        out.append({
+            "port": int(portid) if portid.isdigit() else portid,
+            "protocol": proto,
+            "service": service,
+            "product": product,
+            "version": version,
+        })
+    return out
+
+
+def _host_address(host: ET.Element) -> Optional[str]:
+    for addr in host.findall("address"):
+        if addr.get("addrtype") in ("ipv4", "ipv6"):
+            return addr.get("addr")
+    return None
+
+
+class _NmapXmlStream:
+    """Incremental parser for nmap's ``-oX -`` output.
+
+    Each ``<host>`` is parsed and dropped from the tree as soon as it closes, so
+    memory stays bounded by the host being read rather than the whole report.
+    """
+
+    def __init__(self, on_host: Optional[Callable[[str, Dict], None]] = None):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root: Optional[ET.Element] = None
+        self._current: Optional[ET.Element] = None
+        self._broken = False
+        self.on_host = on_host
+        self.hosts: Dict[str, List[Dict]] = {}
+        # Hosts nmap gave up on (--host-timeout); their port lists are partial
+        self.timed_out: Set[str] = set()
+
+    def feed(self, data: bytes) -> None:
+        if self._broken:
+            return
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
-        except asyncio.TimeoutError:
-            proc.kill()
-            return {"error": "timeout"}
-        if proc.returncode != 0:
-            return {"error": stderr.decode(errors="ignore")[:500]}
-        xml_text = stdout.decode(errors="ignore")
-        return _parse_nmap_xml(xml_text)
+            self._parser.feed(data)
+            for event, el in self._parser.read_events():
+                if event == "start":
+                    if self._root is None:
+                        self._root = el
+                    elif el.tag == "host":
+                        self._current = el
+                elif el.tag == "host":
+                    self._current = None
+                    self._finish_host(el)
+        except ET.ParseError:
+            # Keep what was parsed so far; ignore the rest of a garbled report
+            self._broken = True
+
+    def _finish_host(self, host: ET.Element) -> None:
+        addr = _host_address(host)
+        ports = _parse_host_ports(host)
+        if self._root is not None and host in self._root:
+            self._root.remove(host)
+        if not addr:
+            return
+        self.hosts.setdefault(addr, []).extend(ports)
+        if host.get("timedout") == "true":
+            self.timed_out.add(addr)
+        if self.on_host is not None:
+            self.on_host(addr, self.result(addr))
+
+    def result(self, addr: str) -> Dict:
+        if addr in self.timed_out:
+            return {"ports": self.hosts.get(addr, []), "error": "timeout"}
+        return {"ports": self.hosts.get(addr, [])}
+
+    def pending(self) -> Tuple[Optional[str], List[Dict]]:
+        """Address and already-closed ports of the host still being written, if any."""
+        if self._current is None:
+            return None, []
+        return _host_address(self._current), _parse_host_ports(self._current)
+
+
+async def _stream_nmap(cmd: List[str], *, timeout: float, stdin_data: Optional[bytes] = None, on_host: Optional[Callable[[str, Dict], None]] = None) -> Tuple[_NmapXmlStream, Optional[str]]:
+    """Run nmap and parse its XML as it is written.
+
+    Returns the parser state and an error (``"timeout"`` or stderr text) or
+    None. Hosts completed before a timeout are kept.
+    """
+    stream = _NmapXmlStream(on_host)
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if stdin_data is not None else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+
+    async def write_stdin() -> None:
+        if stdin_data is not None:
+            proc.stdin.write(stdin_data)
+            await proc.stdin.drain()
+            proc.stdin.close()
+
+    async def read_stdout() -> None:
+        while True:
+            chunk = await proc.stdout.read(65536)
+            if not chunk:
+                return
+            stream.feed(chunk)
+
+    try:
+        _, _, stderr = await asyncio.wait_for(asyncio.gather(write_stdin(), read_stdout(), proc.stderr.read()), timeout=timeout)
+        await proc.wait()
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        return stream, "timeout"
+    except asyncio.CancelledError:
+        proc.kill()
+        raise
+    if proc.returncode != 0:
+        return stream, stderr.decode(errors="ignore")[:500]
+    return stream, None
+
+
+async def _run_nmap(ip: str, *, top_ports: int, timing: str, skip_host_discovery: bool, udp: bool, timeout: int, use_proxychains: bool = False, ports_spec: Optional[str] = None) -> Dict:
+    # Let nmap give up on the host a little before the process is killed, so it still writes the ports found so far
+    host_timeout = max(1, timeout - max(2, timeout // 10))
+    cmd = _build_nmap_cmd(ip, top_ports=top_ports, timing=timing, skip_host_discovery=skip_host_discovery, udp=udp, ports_spec=ports_spec, host_timeout=host_timeout)
+    cmd = _wrap_proxychains(cmd, use_proxychains)
+    try:
+        stream, error = await _stream_nmap(cmd, timeout=timeout)
     except FileNotFoundError:
         return {"error": "nmap-not-found"}
     except Exception as e:
         return {"error": str(e)}
+    ports = [p for host_ports in stream.hosts.values() for p in host_ports]
+    if error == "timeout":
+        # Keep whatever nmap already reported for this host
+        return {"ports": ports + stream.pending()[1], "error": "timeout"}
+    if error is not None:
+        return {"error": error}
+    if stream.timed_out:
+        return {"ports": ports, "error": "timeout"}
+    return {"ports": ports}
+
+
+async def _run_nmap_batch(ips: List[str], *, top_ports: int, timing: str, skip_host_discovery: bool, udp: bool, timeout_per_host: int, use_proxychains: bool = False, ports_spec: Optional[str] = None, min_parallelism: Optional[int] = None, on_host: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Dict]:
+    """Scan several targets with one nmap process (targets fed via ``-iL -``).
 
+    ``on_host`` is called for each target as soon as nmap reports it.
+    """
+    cmd = _build_nmap_cmd(
+        "-", top_ports=top_ports, timing=timing, skip_host_discovery=skip_host_discovery, udp=udp, ports_spec=ports_spec,
+        min_hostgroup=len(ips), min_parallelism=min_parallelism, host_timeout=timeout_per_host,
+    )
+    cmd = _wrap_proxychains(cmd, use_proxychains)
+    wanted = set(ips)
 
-def _parse_nmap_xml(xml_text: str) -> Dict:
-    # Minimal XML parse: extract open ports with service info
-    out: Dict[str, List[Dict]] = {"ports": []}
+    def host_done(addr: str, result: Dict) -> None:
+        if on_host is not None and addr in wanted:
+            on_host(addr, result)
+
+    # All hosts of the chunk form one hostgroup, so they share the per-host budget; leave slack for startup
     try:
-        root = ET.fromstring(xml_text)
-        for host in root.findall("host"):
-            ports = host.find("ports")
-            if ports is None:
-                continue
-            for p in ports.findall("port"):
-                proto = p.get("protocol") or "tcp"
-                portid = p.get("portid") or ""
-                state_el = p.find("state")
-                if state_el is None or state_el.get("state") != "open":
-                    continue
-                service_el = p.find("service")
-                service = service_el.get("name") if service_el is not None else None
-                product = service_el.get("product") if service_el is not None else None
-                version = service_el.get("version") if service_el is not None else None
-                out["ports"].append({
-                    "port": int(portid) if portid.isdigit() else portid,
-                    "protocol": proto,
-                    "service": service,
-                    "product": product,
-                    "version": version,
-                })
-    except Exception:
-        # ignore parse errors
-        pass
-    return out
+        stream, error = await _stream_nmap(cmd, timeout=timeout_per_host + 30, stdin_data=("\n".join(ips) + "\n").encode(), on_host=host_done)
+    except FileNotFoundError:
+        return {ip: {"error": "nmap-not-found"} for ip in ips}
+    except Exception as e:
+        return {ip: {"error": str(e)} for ip in ips}
+    out: Dict[str, Dict] = {ip: stream.result(ip) for ip in ips if ip in stream.hosts}
+    if error == "timeout":
+        pending_ip, pending_ports = stream.pending()
+        for ip in ips:
+            if ip not in out:
+                out[ip] = {"ports": pending_ports if ip == pending_ip else [], "error": "timeout"}
+    elif error is not None:
+        for ip in ips:
+            out.setdefault(ip, {"error": error})
+    # Hosts missing from a complete report were down or skipped: no open ports
+    return {ip: out.get(ip, {"ports": []}) for ip in ips}
+
+
+async def probe_nmap_many(ips: Iterable[str], *, top_ports: int = 100, timing: str = "T4", skip_host_discovery: bool = True, udp: bool = False, timeout_per_host: int = 60, concurrency: int = 3, use_proxychains: bool = False, ports_spec: Optional[str] = None, use_cache: bool = True, on_result: Optional[Callable[[str, Dict], None]] = None, mode: str = "per_host", chunk_size: int = 64, parallel_chunks: int = 2, min_parallelism: Optional[int] = None) -> Dict[str, Dict]:
+    """Probe ``ips`` with nmap.
+
+    ``mode="per_host"`` runs one nmap process per IP (``concurrency`` at a time);
+    ``mode="batch"`` hands ``chunk_size`` targets to each nmap process and runs
+    ``parallel_chunks`` of them at once.
+    """
+    cache = stage_cache("nmap")
+    # Results depend on what was scanned, not on how long we were willing to wait
+    scan_key = (top_ports if not ports_spec else None, ports_spec, timing, skip_host_discovery, udp, use_proxychains)
+    ip_list = list(dict.fromkeys(ips))
+    out: Dict[str, Dict] = {}
+    missing: List[str] = []
+    for ip in ip_list:
+        cached = cache.get((ip, scan_key)) if use_cache else MISSING
+        if cached is MISSING:
+            missing.append(ip)
+        else:
+            out[ip] = cached
+            if on_result is not None:
+                on_result(ip, cached)
+
+    if mode == "batch":
+        chunk_size = max(1, int(chunk_size))
+        chunk_sem = asyncio.Semaphore(max(1, int(parallel_chunks)))
+
+        async def chunk_worker(chunk: List[str]) -> List[tuple]:
+            emitted = set()
+
+            def host_done(ip: str, data: Dict) -> None:
+                emitted.add(ip)
+                if on_result is not None:
+                    on_result(ip, data)
+
+            async with chunk_sem:
+                data = await _run_nmap_batch(chunk, top_ports=top_ports, timing=timing, skip_host_discovery=skip_host_discovery, udp=udp, timeout_per_host=timeout_per_host, use_proxychains=use_proxychains, ports_spec=ports_spec, min_parallelism=min_parallelism, on_host=host_done)
+            # Hosts nmap never reported (down, timed out or failed) are emitted once the chunk ends
+            if on_result is not None:
+                for ip in chunk:
+                    if ip not in emitted:
+                        on_result(ip, data[ip])
+            return [(ip, data[ip]) for ip in chunk]
+
+        chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+        res = [item for part in await asyncio.gather(*(chunk_worker(c) for c in chunks)) for item in part]
+    else:
+        sem = asyncio.Semaphore(concurrency)
 
+        async def worker(ip: str):
+            async with sem:
+                data = await _run_nmap(ip, top_ports=top_ports, timing=timing, skip_host_discovery=skip_host_discovery, udp=udp, timeout=timeout_per_host, use_proxychains=use_proxychains, ports_spec=ports_spec)
+            if on_result is not None:
+                on_result(ip, data)
+            return ip, data
 
-async def probe_nmap_many(ips: Iterable[str], *, top_ports: int = 100, timing: str = "T4", skip_host_discovery: bool = True, udp: bool = False, timeout_per_host: int = 60, concurrency: int = 3, use_proxychains: bool = False, ports_spec: Optional[str] = None) -> Dict[str, Dict]:
-    sem = asyncio.Semaphore(concurrency)
-    async def worker(ip: str):
-        async with sem:
-            return ip, await _run_nmap(ip, top_ports=top_ports, timing=timing, skip_host_discovery=skip_host_discovery, udp=udp, timeout=timeout_per_host, use_proxychains=use_proxychains, ports_spec=ports_spec)
-    tasks = [worker(ip) for ip in ips]
-    res = await asyncio.gather(*tasks)
-    return {ip: data for ip, data in res}
+        res = await asyncio.gather(*(worker(ip) for ip in missing))
+    for ip, data in res:
+        if not data.get("error"):
+            cache.set((ip, scan_key), data)
+        out[ip] = data
+    return {ip: out[ip] for ip in ip_list}
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, List, Optional, Set, TypeVar
+
+T = TypeVar("T", bound=Hashable)
+
+_CLOSE = object()
+
+
+class BatchStage(Generic[T]):
+    """One step of the analysis dataflow.
+
+    Items are deduplicated, buffered in a bounded queue and handed to
+    ``handler`` in micro-batches (up to ``max_batch`` items, waiting at most
+    ``linger`` seconds for a batch to fill). ``put`` blocks while the queue is
+    full, which is what applies backpressure to the upstream stage.
+
+    If ``handler`` raises, the stage stops: the other workers are cancelled
+    and ``put`` / ``close`` raise that first error instead of waiting on a
+    queue nobody drains anymore.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[List[T]], Awaitable[None]],
+        *,
+        workers: int = 1,
+        max_batch: int = 64,
+        linger: float = 0.05,
+        maxsize: int = 1024,
+    ):
+        self.name = name
+        self.handler = handler
+        self.max_batch = max(1, int(max_batch))
+        self.linger = max(0.0, float(linger))
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(0, int(maxsize)))
+        self.seen: Set[T] = set()
+        self.processed = 0
+        self.error: Optional[BaseException] = None
+        self._failed = asyncio.Event()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(max(1, int(workers)))]
+
+    def _raise_if_failed(self) -> None:
+        if self.error is not None:
+            raise self.error
+
+    async def put(self, item: T) -> None:
+        self._raise_if_failed()
+        if item in self.seen:
+            return
+        self.seen.add(item)
+        await self._enqueue(item)
+
+    def put_nowait(self, item: T) -> None:
+        """Enqueue without waiting; only for unbounded stages fed from sync callbacks.
+
+        Items given to a failed stage are dropped; ``close`` reports the error.
+        """
+        if self.error is not None or item in self.seen:
+            return
+        self.seen.add(item)
+        self.queue.put_nowait(item)
+
+    async def _enqueue(self, item) -> None:
+        if not self.queue.full():
+            self.queue.put_nowait(item)
+            return
+        # Full queue: wait for room, unless the stage fails in the meantime
+        putter = asyncio.ensure_future(self.queue.put(item))
+        failed = asyncio.ensure_future(self._failed.wait())
+        try:
+            await asyncio.wait((putter, failed), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            putter.cancel()
+            failed.cancel()
+        self._raise_if_failed()
+
+    async def _next_batch(self) -> List:
+        first = await self.queue.get()
+        batch = [first]
+        if first is _CLOSE:
+            return batch
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.linger
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            try:
+                item = self.queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self.queue.get(), timeout)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            batch.append(item)
+            if item is _CLOSE:
+                break
+        return batch
+
+    async def _work(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            closing = batch[-1] is _CLOSE
+            items = [i for i in batch if i is not _CLOSE]
+            if items:
+                try:
+                    await self.handler(items)
+                except Exception as e:
+                    self._fail(e)
+                    return
+                self.processed += len(items)
+            if closing:
+                # Let sibling workers see the sentinel too; if the stage failed meanwhile close() reports it
+                try:
+                    await self._enqueue(_CLOSE)
+                except Exception:
+                    pass
+                return
+
+    def _fail(self, error: BaseException) -> None:
+        if self.error is None:
+            self.error = error
+            self._failed.set()
+        current = asyncio.current_task()
+        for w in self._workers:
+            if w is not current and not w.done():
+                w.cancel()
+
+    async def close(self) -> None:
+        """Signal end of input and wait until every queued item has been handled.
+
+        Raises the handler's error if the stage failed.
+        """
+        try:
+            await self._enqueue(_CLOSE)
+            await asyncio.wait(self._workers)
+        finally:
+            self.cancel()
+        self._raise_if_failed()
+
+    def cancel(self) -> None:
+        for w in self._workers:
+            if not w.done():
+                w.cancel()
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import asyncio
+import errno
+import ipaddress
+import os
+import socket
+import struct
+import weakref
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .stage_cache import MISSING, stage_cache
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Connect-scan limits; per-request values come from the nmap options dict
+PORTSCAN_MAX_SOCKETS = int(os.getenv("PORTSCAN_MAX_SOCKETS", "512"))
+# Hosts scanned at once by the connect scanner (independent of nmap's process-bound "concurrency")
+PORTSCAN_CONCURRENCY = int(os.getenv("PORTSCAN_CONCURRENCY", "16"))
+PORTSCAN_PER_HOST = int(os.getenv("PORTSCAN_PER_HOST", "64"))
+PORTSCAN_HOST_RATE = float(os.getenv("PORTSCAN_HOST_RATE", "0"))
+PORTSCAN_TIMEOUT_MIN = float(os.getenv("PORTSCAN_TIMEOUT_MIN", "0.1"))
+PORTSCAN_TIMEOUT_MAX = float(os.getenv("PORTSCAN_TIMEOUT_MAX", "3.0"))
+PORTSCAN_TIMEOUT_INITIAL = float(os.getenv("PORTSCAN_TIMEOUT_INITIAL", "1.0"))
+NMAP_SERVICES_PATHS = [
+    p for p in (
+        os.getenv("NMAP_SERVICES"),
+        "/usr/share/nmap/nmap-services",
+        "/usr/local/share/nmap/nmap-services",
+        "/opt/homebrew/share/nmap/nmap-services",
+    ) if p
+]
+
+# nmap's default top 100 TCP ports, most common first (used when nmap-services is not installed)
+_TOP_TCP_PORTS = [
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306, 8080, 1723, 111, 995, 993, 5900,
+    1025, 587, 8888, 199, 1720, 465, 548, 113, 81, 6001, 10000, 514, 5060, 179, 1026, 2000, 8443, 8000, 32768, 554,
+    26, 1433, 49152, 2001, 515, 8008, 49154, 1027, 5666, 646, 5000, 5631, 631, 49153, 8081, 2049, 88, 79, 5800, 106,
+    2121, 1110, 49155, 6000, 513, 990, 5357, 427, 49156, 543, 544, 5101, 144, 7, 389, 8009, 3128, 444, 9999, 5009,
+    7070, 5190, 3000, 5432, 1900, 3986, 13, 1029, 9, 5051, 6646, 49157, 1028, 873, 1755, 2717, 4899, 9100, 119, 37,
+]
+
+_BANNER_BYTES = 256
+# Local resource exhaustion, as opposed to an answer from the target
+_RESOURCE_ERRNOS = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM}
+
+
+@lru_cache(maxsize=1)
+def _nmap_services() -> Tuple[List[int], Dict[int, str]]:
+    """TCP ports ordered by nmap's open-frequency, and their service names."""
+    for path in NMAP_SERVICES_PATHS:
+        try:
+            with open(path, encoding="utf-8", errors="ignore") as fh:
+                rows = []
+                for line in fh:
+                    if not line or line[0] == "#":
+                        continue
+                    fields = line.split()
+                    if len(fields) < 3 or not fields[1].endswith("/tcp"):
+                        continue
+                    try:
+                        rows.append((float(fields[2]), int(fields[1][:-4]), fields[0]))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+        if rows:
+            rows.sort(key=lambda r: (-r[0], r[1]))
+            return [port for _, port, _ in rows], {port: name for _, port, name in rows if name != "unknown"}
+    return list(_TOP_TCP_PORTS), {}
+
+
+def _service_name(port: int) -> Optional[str]:
+    name = _nmap_services()[1].get(port)
+    if name:
+        return name
+    try:
+        return socket.getservbyport(port, "tcp")
+    except OSError:
+        return None
+
+
+def top_tcp_ports(n: int) -> List[int]:
+    ranked = _nmap_services()[0]
+    if n <= len(ranked):
+        return ranked[:n]
+    known = set(ranked)
+    return ranked + [p for p in range(1, 65536) if p not in known][: n - len(ranked)]
+
+
+def parse_ports_spec(spec: str) -> List[int]:
+    """Parse an nmap-style ``-p`` value (``22,80,8000-8100``; ``T:`` prefixes are accepted).
+
+    Raises ValueError for what only nmap understands (``U:``/``S:`` protocols,
+    service names, ``[...]`` ranges) and for specs that select no port.
+    """
+    out: List[int] = []
+    for part in spec.replace(" ", "").split(","):
+        if part[:2].upper() == "T:":
+            part = part[2:]
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            out.extend(range(max(1, int(lo or 1)), min(65535, int(hi or 65535)) + 1))
+        else:
+            out.append(int(part))
+    ports = list(dict.fromkeys(p for p in out if 0 < p < 65536))
+    if not ports:
+        raise ValueError(f"no TCP ports in {spec!r}")
+    return ports
+
+
+def ports_spec_supported(spec: Optional[str]) -> bool:
+    """Whether the connect scanner can handle ``spec`` (otherwise use nmap)."""
+    if not spec:
+        return True
+    try:
+        parse_ports_spec(spec)
+    except ValueError:
+        return False
+    return True
+
+
+def _socket_budget_limit(requested: int) -> int:
+    # Stay well below the process fd limit; the event loop, DNS and HTTP clients need descriptors too
+    if resource is None:
+        return requested
+    try:
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ValueError, OSError):
+        return requested
+    return max(1, min(requested, soft // 2))
+
+
+_BUDGETS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def _socket_budget() -> asyncio.Semaphore:
+    """Process-wide cap on sockets held by connect scans (one semaphore per event loop)."""
+    loop = asyncio.get_running_loop()
+    sem = _BUDGETS.get(loop)
+    if sem is None:
+        sem = _BUDGETS[loop] = asyncio.Semaphore(_socket_budget_limit(PORTSCAN_MAX_SOCKETS))
+    return sem
+
+
+class _RttTimeout:
+    """Per-host connect timeout derived from measured round trips (RFC 6298 style).
+
+    Both accepted and refused connections are samples: a RST comes back after
+    one round trip just like a SYN/ACK.
+    """
+
+    def __init__(self, initial: float = PORTSCAN_TIMEOUT_INITIAL, lo: float = PORTSCAN_TIMEOUT_MIN, hi: float = PORTSCAN_TIMEOUT_MAX):
+        self.lo, self.hi = lo, hi
+        self.srtt: Optional[float] = None
+        self.rttvar = 0.0
+        self.timeout = min(max(initial, lo), hi)
+
+    def sample(self, rtt: float) -> None:
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.timeout = min(max(self.srtt + 4 * self.rttvar, self.lo), self.hi)
+
+
+class _HostPacer:
+    """Spaces connection attempts to one host at ``rate`` per second (0 = unpaced)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+async def _connect(ip: str, port: int, family: int, rtt: _RttTimeout, banner: bool) -> Optional[Dict]:
+    loop = asyncio.get_running_loop()
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    # Close with RST so thousands of probes do not leave sockets in TIME_WAIT
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+    try:
+        start = loop.time()
+        try:
+            await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout=rtt.timeout)
+        except asyncio.TimeoutError:
+            return None  # filtered or dropped
+        except ConnectionRefusedError:
+            rtt.sample(loop.time() - start)
+            return None
+        except OSError as e:
+            if e.errno in _RESOURCE_ERRNOS:
+                # Out of descriptors/buffers locally; saying "closed" would hide open ports
+                raise
+            return None  # unreachable, reset, ...
+        rtt.sample(loop.time() - start)
+        entry: Dict = {"port": port, "protocol": "tcp", "service": _service_name(port), "product": None, "version": None}
+        if banner:
+            # Passive grab: many services (ssh, smtp, ftp, ...) greet first
+            try:
+                data = await asyncio.wait_for(loop.sock_recv(sock, _BANNER_BYTES), timeout=max(rtt.timeout, 1.0))
+            except (asyncio.TimeoutError, OSError):
+                data = b""
+            if data:
+                entry["banner"] = data.decode("utf-8", errors="replace").strip()
+        return entry
+    finally:
+        sock.close()
+
+
+async def scan_host(ip: str, ports: List[int], *, per_host: int = PORTSCAN_PER_HOST, host_rate: float = PORTSCAN_HOST_RATE, banner: bool = False, found: Optional[List[Dict]] = None) -> Dict:
+    """TCP connect scan of ``ports`` on ``ip``; open ports are appended to ``found`` as they are seen."""
+    family = socket.AF_INET6 if ipaddress.ip_address(ip).version == 6 else socket.AF_INET
+    found = [] if found is None else found
+    budget = _socket_budget()
+    host_sem = asyncio.Semaphore(max(1, int(per_host)))
+    pacer = _HostPacer(host_rate)
+    rtt = _RttTimeout()
+    it = iter(ports)
+
+    async def worker() -> None:
+        # Workers pull from a shared iterator so at most per_host tasks exist per host
+        for port in it:
+            async with host_sem:
+                await pacer.wait()
+                async with budget:
+                    entry = await _connect(ip, port, family, rtt, banner)
+            if entry is not None:
+                found.append(entry)
+
+    await asyncio.gather(*(worker() for _ in range(min(max(1, int(per_host)), len(ports)) or 1)))
+    return {"ports": sorted(found, key=lambda p: p["port"])}
+
+
+async def scan_ports_many(ips: Iterable[str], *, top_ports: int = 100, ports_spec: Optional[str] = None, timeout_per_host: int = 60, concurrency: int = PORTSCAN_CONCURRENCY, per_host: int = PORTSCAN_PER_HOST, host_rate: float = PORTSCAN_HOST_RATE, banner: bool = False, use_cache: bool = True, on_result: Optional[Callable[[str, Dict], None]] = None) -> Dict[str, Dict]:
+    """nmap-free counterpart of ``probe_nmap_many`` with the same result shape.
+
+    ``concurrency`` hosts are scanned at once; sockets across all scans are
+    capped by PORTSCAN_MAX_SOCKETS.
+    """
+    cache = stage_cache("port_scan")
+    ip_list = list(dict.fromkeys(ips))
+    try:
+        ports = parse_ports_spec(ports_spec) if ports_spec else top_tcp_ports(int(top_ports))
+    except ValueError:
+        data = {"error": "invalid ports_spec"}
+        if on_result is not None:
+            for ip in ip_list:
+                on_result(ip, data)
+        return {ip: data for ip in ip_list}
+    scan_key = (top_ports if not ports_spec else None, ports_spec, banner)
+    out: Dict[str, Dict] = {}
+    missing: List[str] = []
+    for ip in ip_list:
+        cached = cache.get((ip, scan_key)) if use_cache else MISSING
+        if cached is MISSING:
+            missing.append(ip)
+        else:
+            out[ip] = cached
+            if on_result is not None:
+                on_result(ip, cached)
+
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
+
+    async def worker(ip: str) -> Tuple[str, Dict]:
+        found: List[Dict] = []
+        async with sem:
+            try:
+                data = await asyncio.wait_for(scan_host(ip, ports, per_host=per_host, host_rate=host_rate, banner=banner, found=found), timeout=timeout_per_host)
+            except asyncio.TimeoutError:
+                data = {"ports": sorted(found, key=lambda p: p["port"]), "error": "timeout"}
+            except ValueError:
+                data = {"error": f"invalid ip: {ip}"}
+            except OSError as e:
+                # Resource exhaustion (EMFILE, ENOBUFS, ...): report it, don't cache a short port list
+                data = {"ports": sorted(found, key=lambda p: p["port"]), "error": f"scan aborted: {e.strerror or e}"}
+        if on_result is not None:
+            on_result(ip, data)
+        return ip, data
+
+    for ip, data in await asyncio.gather(*(worker(ip) for ip in missing)):
+        if not data.get("error"):
+            cache.set((ip, scan_key), data)
+        out[ip] = data
+    return {ip: out[ip] for ip in ip_list}
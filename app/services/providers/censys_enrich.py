@@ -1,35 +1,73 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Dict, Iterable, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional
 
 import httpx
 
+from ..http_client import http_client
+from ..rate_limit import RATE_LIMIT_MAX_ATTEMPTS, parse_retry_after, token_bucket
+from ..stage_cache import MISSING, stage_cache
+
 CENSYS_API_ID = os.getenv("CENSYS_API_ID")
 CENSYS_API_SECRET = os.getenv("CENSYS_API_SECRET")
 BASE = "https://search.censys.io/api/v2"
 
-async def reverse_enrich(ips: Iterable[str], proxies: Optional[str] = None) -> Dict[str, List[str]]:
+
+async def _host_names(client: httpx.AsyncClient, ip: str) -> Optional[List[str]]:
+    # None on failure so only real answers (including 404 -> []) get cached
+    bucket = token_bucket("censys")
+    for attempt in range(RATE_LIMIT_MAX_ATTEMPTS):
+        await bucket.acquire()
+        try:
+            r = await client.get(f"{BASE}/hosts/{ip}", auth=(CENSYS_API_ID, CENSYS_API_SECRET))
+            if r.status_code == 429:
+                bucket.pause(parse_retry_after(r.headers.get("Retry-After"), default=2.0 ** attempt))
+                continue
+            if r.status_code == 404:
+                return []
+            if r.status_code != 200:
+                return None
+            data = r.json() or {}
+            result = data.get("result") or {}
+            dns = result.get("dns") or {}
+            names = dns.get("names") or []
+            return sorted({str(d).lower() for d in names if d})
+        except Exception:
+            return None
+    return None
+
+
+async def reverse_enrich(ips: Iterable[str], proxies: Optional[str] = None, on_result: Optional[Callable[[str, List[str]], None]] = None) -> Dict[str, List[str]]:
     if not (CENSYS_API_ID and CENSYS_API_SECRET):
         return {}
-    out: Dict[str, List[str]] = {}
-    timeout = httpx.Timeout(25.0, connect=10.0)
-    auth = (CENSYS_API_ID, CENSYS_API_SECRET)
-    headers = {"User-Agent": "WebReconVisualizer/0.2"}
-    transport = httpx.AsyncHTTPTransport(proxy=proxies) if proxies else None
-    async with httpx.AsyncClient(timeout=timeout, headers=headers, auth=auth, transport=transport) as client:
-        for ip in ips:
-            try:
-                r = await client.get(f"{BASE}/hosts/{ip}")
-                if r.status_code != 200:
-                    continue
-                data = r.json() or {}
-                result = data.get("result") or {}
-                dns = result.get("dns") or {}
-                names = dns.get("names") or []
-                doms = [str(d).lower() for d in names if d]
-                if doms:
-                    out[ip] = sorted(set(doms))
-            except Exception:
-                continue
-    return out
+    cache = stage_cache("censys")
+    ip_list = list(dict.fromkeys(ips))
+    found: Dict[str, List[str]] = {}
+    missing: List[str] = []
+    for ip in ip_list:
+        cached = cache.get(ip)
+        if cached is MISSING:
+            missing.append(ip)
+        elif cached:
+            found[ip] = cached
+            if on_result is not None:
+                on_result(ip, cached)
+    if not missing:
+        return found
+
+    # Requests run concurrently; the "censys" token bucket (CENSYS_QPS) paces them
+    async with http_client("censys", proxies) as client:
+        async def worker(ip: str) -> None:
+            names = await _host_names(client, ip)
+            if names is None:
+                return
+            cache.set(ip, names)
+            if names:
+                found[ip] = names
+                if on_result is not None:
+                    on_result(ip, names)
+
+        await asyncio.gather(*(worker(ip) for ip in missing))
+    return {ip: found[ip] for ip in ip_list if ip in found}
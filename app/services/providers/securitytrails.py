@@ -3,7 +3,7 @@ from __future__ import annotations
 import os
 from typing import Set
 
-import httpx
+from ..http_client import http_client
 
 SECURITYTRAILS_API_KEY = os.getenv("SECURITYTRAILS_API_KEY")
 BASE = "https://api.securitytrails.com/v1"
@@ -14,8 +14,8 @@ async def subdomains(domain: str) -> Set[str]:
     headers = {"APIKEY": SECURITYTRAILS_API_KEY}
     url = f"{BASE}/domain/{domain}/subdomains"
     try:
-        async with httpx.AsyncClient(timeout=httpx.Timeout(25.0, connect=10.0), headers=headers) as client:
-            r = await client.get(url, params={"children_only": "false"})
+        async with http_client("securitytrails") as client:
+            r = await client.get(url, params={"children_only": "false"}, headers=headers)
             if r.status_code != 200:
                 return set()
             data = r.json() or {}
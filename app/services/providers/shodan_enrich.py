@@ -1,33 +1,72 @@
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Dict, Iterable, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional
 
 import httpx
 
+from ..http_client import http_client
+from ..rate_limit import RATE_LIMIT_MAX_ATTEMPTS, parse_retry_after, token_bucket
+from ..stage_cache import MISSING, stage_cache
+
 SHODAN_API_KEY = os.getenv("SHODAN_API_KEY")
 BASE = "https://api.shodan.io"
 
-async def reverse_enrich(ips: Iterable[str], proxies: Optional[str] = None) -> Dict[str, List[str]]:
+
+async def _host_names(client: httpx.AsyncClient, ip: str) -> Optional[List[str]]:
+    # None on failure so only real answers (including 404 -> []) get cached
+    bucket = token_bucket("shodan")
+    for attempt in range(RATE_LIMIT_MAX_ATTEMPTS):
+        await bucket.acquire()
+        try:
+            r = await client.get(f"{BASE}/shodan/host/{ip}", params={"key": SHODAN_API_KEY})
+            if r.status_code == 429:
+                bucket.pause(parse_retry_after(r.headers.get("Retry-After"), default=2.0 ** attempt))
+                continue
+            if r.status_code == 404:
+                return []
+            if r.status_code != 200:
+                return None
+            data = r.json() or {}
+            # Domains field sometimes lists vhost domains
+            doms = data.get("domains") or []
+            hostnames = data.get("hostnames") or []
+            return sorted({str(d).lower() for d in (doms + hostnames) if d})
+        except Exception:
+            return None
+    return None
+
+
+async def reverse_enrich(ips: Iterable[str], proxies: Optional[str] = None, on_result: Optional[Callable[[str, List[str]], None]] = None) -> Dict[str, List[str]]:
     if not SHODAN_API_KEY:
         return {}
-    out: Dict[str, List[str]] = {}
-    timeout = httpx.Timeout(25.0, connect=10.0)
-    headers = {"User-Agent": "WebReconVisualizer/0.2"}
-    transport = httpx.AsyncHTTPTransport(proxy=proxies) if proxies else None
-    async with httpx.AsyncClient(timeout=timeout, headers=headers, transport=transport) as client:
-        for ip in ips:
-            try:
-                r = await client.get(f"{BASE}/shodan/host/{ip}", params={"key": SHODAN_API_KEY})
-                if r.status_code != 200:
-                    continue
-                data = r.json() or {}
-                # Domains field sometimes lists vhost domains
-                doms = data.get("domains") or []
-                hostnames = data.get("hostnames") or []
-                names = {str(d).lower() for d in (doms + hostnames) if d}
-                if names:
-                    out[ip] = sorted(names)
-            except Exception:
-                continue
-    return out
+    cache = stage_cache("shodan")
+    ip_list = list(dict.fromkeys(ips))
+    found: Dict[str, List[str]] = {}
+    missing: List[str] = []
+    for ip in ip_list:
+        cached = cache.get(ip)
+        if cached is MISSING:
+            missing.append(ip)
+        elif cached:
+            found[ip] = cached
+            if on_result is not None:
+                on_result(ip, cached)
+    if not missing:
+        return found
+
+    # Requests run concurrently; the "shodan" token bucket (SHODAN_QPS) paces them
+    async with http_client("shodan", proxies) as client:
+        async def worker(ip: str) -> None:
+            names = await _host_names(client, ip)
+            if names is None:
+                return
+            cache.set(ip, names)
+            if names:
+                found[ip] = names
+                if on_result is not None:
+                    on_result(ip, names)
+
+        await asyncio.gather(*(worker(ip) for ip in missing))
+    return {ip: found[ip] for ip in ip_list if ip in found}
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Deque, Dict, Optional
+
+import httpx
+
+# Requests per second per provider, matched to the API plan; override with <PROVIDER>_QPS
+_DEFAULT_QPS: Dict[str, float] = {
+    "shodan": 1.0,
+    "censys": 0.4,
+}
+# Extra tokens a bucket may hold after an idle period; override with <PROVIDER>_BURST
+_DEFAULT_BURST: Dict[str, float] = {
+    "shodan": 1.0,
+    "censys": 1.0,
+}
+# Attempts per request when the API answers 429
+RATE_LIMIT_MAX_ATTEMPTS = int(os.getenv("RATE_LIMIT_MAX_ATTEMPTS", "4"))
+
+# Adaptive (AIMD) concurrency for public endpoints; override with <PROVIDER>_MIN_CONCURRENCY etc.
+_ADAPTIVE_DEFAULTS: Dict[str, Dict[str, float]] = {
+    "reverse_ip": {"initial": 5, "min": 1, "max": 16, "latency_target": 5.0, "deadline": 60.0},
+    "rdap": {"initial": 5, "min": 1, "max": 32, "latency_target": 3.0, "deadline": 45.0},
+}
+_THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return default
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return default
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, at most ``burst`` saved up.
+
+    ``pause`` stops all callers for a while, which is how a 429 with
+    Retry-After is honored by every request in flight, not just the one that
+    got it.
+    """
+
+    def __init__(self, name: str, rate: float, burst: float = 1.0):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self.acquired = 0
+        self.throttled = 0
+        self.waited = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            self.acquired += 1
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        start = time.monotonic()
+        # One waiter at a time keeps callers in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    break
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+        self.acquired += 1
+        self.waited += time.monotonic() - start
+
+    def pause(self, seconds: float) -> None:
+        self.throttled += 1
+        until = time.monotonic() + max(0.0, seconds)
+        if until > self._paused_until:
+            self._paused_until = until
+            self._tokens = 0.0
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "qps": self.rate,
+            "burst": self.burst,
+            "requests": self.acquired,
+            "throttled": self.throttled,
+            "avg_wait": round(self.waited / self.acquired, 3) if self.acquired else 0.0,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 1),
+        }
+
+
+_BUCKETS: Dict[str, TokenBucket] = {}
+
+
+def token_bucket(name: str) -> TokenBucket:
+    bucket = _BUCKETS.get(name)
+    if bucket is None:
+        rate = float(os.getenv(f"{name.upper()}_QPS", str(_DEFAULT_QPS.get(name, 0))))
+        burst = float(os.getenv(f"{name.upper()}_BURST", str(_DEFAULT_BURST.get(name, 1.0))))
+        bucket = _BUCKETS[name] = TokenBucket(name, rate, burst)
+    return bucket
+
+
+class AdaptiveLimiter:
+    """Concurrency window that grows additively while an endpoint is healthy.
+
+    Every successful response faster than ``latency_target`` adds ``1/limit``
+    (about one slot per window's worth of requests); a 429/503 or timeout
+    halves the window, at most once per observed round trip.
+    """
+
+    def __init__(self, name: str, initial: float = 5, min_limit: float = 1, max_limit: float = 32, latency_target: float = 2.0, deadline: float = 30.0):
+        self.name = name
+        self.min_limit = max(1.0, float(min_limit))
+        self.max_limit = max(self.min_limit, float(max_limit))
+        self.limit = min(max(float(initial), self.min_limit), self.max_limit)
+        self.latency_target = float(latency_target)
+        self.deadline = float(deadline)
+        self.in_flight = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._last_decrease = 0.0
+        self._done: Deque[float] = deque()
+        self.requests = 0
+        self.ok = 0
+        self.throttled = 0
+        self.errors = 0
+        self.retries = 0
+        self.latency_ewma: Optional[float] = None
+
+    def _condition(self) -> asyncio.Condition:
+        # Created lazily so it binds to the running event loop
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def acquire(self) -> None:
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            self.requests += 1
+
+    async def release(self, latency: float, outcome: str) -> None:
+        """``outcome`` is "ok", "throttled" (429/503/timeout) or "error"."""
+        now = time.monotonic()
+        if outcome == "ok":
+            self.ok += 1
+            self._done.append(now)
+            self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+            if latency <= self.latency_target:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        elif outcome == "throttled":
+            self.throttled += 1
+            # One decrease per round trip: failures from the same window are one congestion signal
+            if now - self._last_decrease >= (self.latency_ewma or latency):
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit / 2)
+        else:
+            self.errors += 1
+        cond = self._condition()
+        async with cond:
+            self.in_flight -= 1
+            cond.notify_all()
+
+    def stats(self) -> Dict[str, object]:
+        now = time.monotonic()
+        while self._done and now - self._done[0] > 60:
+            self._done.popleft()
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "ok": self.ok,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "retries": self.retries,
+            "ok_per_sec_1m": round(len(self._done) / 60.0, 3),
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+        }
+
+
+async def request_with_retries(limiter: AdaptiveLimiter, send: Callable[[], Awaitable[httpx.Response]], *, max_attempts: int = RATE_LIMIT_MAX_ATTEMPTS, base_delay: float = 0.5, max_delay: float = 10.0, is_throttled: Optional[Callable[[httpx.Response], bool]] = None) -> Optional[httpx.Response]:
+    """Send through ``limiter`` with full-jitter exponential backoff.
+
+    Retries 429/503/5xx answers and transport errors until ``max_attempts`` or
+    the limiter's deadline is used up. ``is_throttled`` flags other answers as
+    throttling too, for APIs that report an exhausted quota in a 200 body.
+    Returns the last response, or None when no response was received at all.
+    """
+    start = time.monotonic()
+    response: Optional[httpx.Response] = None
+    for attempt in range(max(1, int(max_attempts))):
+        remaining = limiter.deadline - (time.monotonic() - start)
+        if remaining <= 0:
+            break
+        retry_after: Optional[float] = None
+        await limiter.acquire()
+        t0 = time.monotonic()
+        outcome = "error"
+        try:
+            response = await asyncio.wait_for(send(), timeout=remaining)
+            if response.status_code in _THROTTLE_STATUSES:
+                outcome = "throttled"
+                if response.headers.get("Retry-After"):
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            elif response.status_code < 500:
+                outcome = "throttled" if is_throttled is not None and is_throttled(response) else "ok"
+        except (asyncio.TimeoutError, httpx.TimeoutException):
+            outcome = "throttled"
+        except httpx.TransportError:
+            outcome = "error"
+        finally:
+            await limiter.release(time.monotonic() - t0, outcome)
+        if outcome == "ok":
+            return response
+        delay = retry_after if retry_after is not None else random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+        if time.monotonic() - start + delay >= limiter.deadline or attempt + 1 >= max_attempts:
+            break
+        limiter.retries += 1
+        await asyncio.sleep(delay)
+    return response
+
+
+_LIMITERS: Dict[str, AdaptiveLimiter] = {}
+
+
+def adaptive_limiter(name: str) -> AdaptiveLimiter:
+    limiter = _LIMITERS.get(name)
+    if limiter is None:
+        conf = _ADAPTIVE_DEFAULTS.get(name, {})
+
+        def env(key: str, default: float) -> float:
+            return float(os.getenv(f"{name.upper()}_{key}", str(default)))
+
+        limiter = _LIMITERS[name] = AdaptiveLimiter(
+            name,
+            initial=env("INITIAL_CONCURRENCY", conf.get("initial", 5)),
+            min_limit=env("MIN_CONCURRENCY", conf.get("min", 1)),
+            max_limit=env("MAX_CONCURRENCY", conf.get("max", 32)),
+            latency_target=env("LATENCY_TARGET", conf.get("latency_target", 2.0)),
+            deadline=env("DEADLINE", conf.get("deadline", 30.0)),
+        )
+    return limiter
+
+
+def all_stats() -> Dict[str, Dict[str, object]]:
+    stats: Dict[str, Dict[str, object]] = {name: bucket.stats() for name, bucket in sorted(_BUCKETS.items())}
+    stats.update({name: limiter.stats() for name, limiter in sorted(_LIMITERS.items())})
+    return stats
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Persisted index of RDAP network ranges (see RdapRangeIndex)
+RDAP_INDEX_PATH = os.getenv("RDAP_INDEX_PATH", str(Path(__file__).resolve().parents[2] / "data" / "rdap_index.json"))
+RDAP_INDEX_MAX_AGE = int(os.getenv("RDAP_INDEX_MAX_AGE", str(7 * 86400)))
+# New ranges are written to disk at most this often (seconds), and on shutdown
+RDAP_INDEX_FLUSH_INTERVAL = float(os.getenv("RDAP_INDEX_FLUSH_INTERVAL", "60"))
+
+# Ranges wider than this are registry-level blocks (IANA, RIR umbrella objects), not useful answers
+_MAX_SPAN = {4: 2 ** 24, 6: 2 ** 96}
+# How many preceding ranges to inspect for an enclosing parent when the nearest one does not match
+_MAX_NESTING = 16
+
+
+class _Table:
+    """Ranges of one address family sorted by start; parallel arrays for bisect."""
+
+    def __init__(self) -> None:
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.fetched: List[float] = []
+        self.infos: List[dict] = []
+
+    def find(self, n: int, min_fetched: float) -> Optional[int]:
+        i = bisect_right(self.starts, n) - 1
+        # Nested allocations: the closest start that still contains n is the most specific range
+        for j in range(i, max(-1, i - _MAX_NESTING), -1):
+            if self.ends[j] >= n and self.fetched[j] >= min_fetched:
+                return j
+        return None
+
+    def insert(self, start: int, end: int, fetched: float, info: dict) -> None:
+        i = bisect_right(self.starts, start)
+        # Replace an existing entry for the same range instead of duplicating it
+        for j in range(i - 1, -1, -1):
+            if self.starts[j] != start:
+                break
+            if self.ends[j] == end:
+                self.fetched[j], self.infos[j] = fetched, info
+                return
+        self.starts.insert(i, start)
+        self.ends.insert(i, end)
+        self.fetched.insert(i, fetched)
+        self.infos.insert(i, info)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+def network_range(info: dict) -> Optional[Tuple[int, int, int]]:
+    try:
+        start = ipaddress.ip_address(str(info.get("startAddress")))
+        end = ipaddress.ip_address(str(info.get("endAddress")))
+    except ValueError:
+        return None
+    if start.version != end.version or int(end) < int(start):
+        return None
+    if int(end) - int(start) + 1 > _MAX_SPAN[start.version]:
+        return None
+    return start.version, int(start), int(end)
+
+
+class RdapRangeIndex:
+    """Interval index of RDAP networks so IPs in a known block are answered locally.
+
+    Lookups bisect a start-sorted array per address family. Entries older than
+    ``max_age`` are ignored and dropped on load. The index is saved as JSON
+    by a background task every ``flush_interval`` seconds when it changed,
+    and once more on ``stop()``.
+    """
+
+    def __init__(self, path: Optional[str] = RDAP_INDEX_PATH, max_age: int = RDAP_INDEX_MAX_AGE, flush_interval: float = RDAP_INDEX_FLUSH_INTERVAL):
+        self.path = path
+        self.max_age = int(max_age)
+        self.flush_interval = flush_interval
+        self._tables: Dict[int, _Table] = {4: _Table(), 6: _Table()}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _read(self) -> list:
+        if not self.path:
+            return []
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                rows = json.load(fh)
+        except (OSError, ValueError):
+            return []
+        return rows if isinstance(rows, list) else []
+
+    def _ensure_loaded(self, rows: Optional[list] = None) -> None:
+        # Called with self._lock held
+        if self._loaded:
+            return
+        self._loaded = True
+        if rows is None:
+            rows = self._read()
+        cutoff = time.time() - self.max_age
+        for row in rows:
+            try:
+                version, start, end, fetched, info = int(row[0]), int(row[1]), int(row[2]), float(row[3]), row[4]
+            except (TypeError, ValueError, IndexError):
+                continue
+            if fetched >= cutoff and version in self._tables:
+                self._tables[version].insert(start, end, fetched, info)
+
+    async def load(self) -> None:
+        """Read the saved index in a thread; lookup() and add() would otherwise read it on first use."""
+        if self._loaded:
+            return
+        rows = await asyncio.to_thread(self._read)
+        with self._lock:
+            self._ensure_loaded(rows)
+
+    def lookup(self, ip: str) -> Optional[dict]:
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        with self._lock:
+            self._ensure_loaded()
+            table = self._tables[addr.version]
+            j = table.find(int(addr), time.time() - self.max_age)
+            if j is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return table.infos[j]
+
+    def add(self, info: dict) -> bool:
+        """Index the network described by an RDAP answer; False when it has no usable range."""
+        rng = network_range(info)
+        if rng is None:
+            return False
+        version, start, end = rng
+        with self._lock:
+            self._ensure_loaded()
+            self._tables[version].insert(start, end, time.time(), info)
+            self._dirty = True
+        return True
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        # One writer at a time (flusher, clear, shutdown); lookups only wait for the snapshot
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                cutoff = time.time() - self.max_age
+                rows = [
+                    [version, t.starts[i], t.ends[i], t.fetched[i], t.infos[i]]
+                    for version, t in self._tables.items()
+                    for i in range(len(t))
+                    if t.fetched[i] >= cutoff
+                ]
+                self._dirty = False
+            path = Path(self.path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(path.suffix + ".tmp")
+            tmp.write_text(json.dumps(rows, separators=(",", ":")), encoding="utf-8")
+            os.replace(tmp, path)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.save)
+            except OSError:
+                pass
+
+    def start(self) -> None:
+        """Flush new ranges to disk in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.to_thread(self.save)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tables = {4: _Table(), 6: _Table()}
+            self._loaded = True
+            self._dirty = True
+        self.save()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                "ranges_v4": len(self._tables[4]),
+                "ranges_v6": len(self._tables[6]),
+                "max_age": self.max_age,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+RDAP_INDEX = RdapRangeIndex()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import gzip
+import json
+from array import array
+from typing import Dict, Iterator, List, Set, Tuple
+
+try:
+    import msgpack
+except ImportError:  # optional; compact responses fall back to JSON
+    msgpack = None
+
+# Record type -> per-type field of the full AnalyzeResponse schema
+RECORD_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("A", "dns_a_records"), ("AAAA", "dns_aaaa_records"), ("CNAME", "dns_cname_records"),
+    ("MX", "dns_mx_records"), ("NS", "dns_ns_records"), ("TXT", "dns_txt_records"),
+)
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack")
+# Compact bodies smaller than this are sent uncompressed
+_GZIP_MIN = 1024
+
+
+class RecordStore:
+    """DNS results for many hosts in columnar form.
+
+    Host names and record values are interned (stored once, referenced by
+    integer id), and each record type is three flat arrays in CSR layout:
+    ``host`` ids of the hosts that have records of that type, ``offset``
+    (row i's values are ``value[offset[i]:offset[i + 1]]``) and ``value`` ids.
+    A host without records of a type costs nothing in that type's columns.
+    """
+
+    def __init__(self) -> None:
+        self.hosts: List[str] = []
+        self.values: List[str] = []
+        self._host_ids: Dict[str, int] = {}
+        self._value_ids: Dict[str, int] = {}
+        self._columns: Dict[str, Tuple[array, array, array]] = {}
+
+    def __len__(self) -> int:
+        return len(self.hosts)
+
+    def __contains__(self, host: str) -> bool:
+        return host in self._host_ids
+
+    def _intern_host(self, host: str) -> int:
+        hid = self._host_ids.get(host)
+        if hid is None:
+            hid = self._host_ids[host] = len(self.hosts)
+            self.hosts.append(host)
+        return hid
+
+    def _intern_value(self, value: str) -> int:
+        vid = self._value_ids.get(value)
+        if vid is None:
+            vid = self._value_ids[value] = len(self.values)
+            self.values.append(value)
+        return vid
+
+    def _column(self, rtype: str) -> Tuple[array, array, array]:
+        col = self._columns.get(rtype)
+        if col is None:
+            col = self._columns[rtype] = (array("I"), array("I", [0]), array("I"))
+        return col
+
+    def add(self, host: str, records: Dict[str, List[str]]) -> None:
+        """Record one resolver answer; the host is kept even if it has no records."""
+        hid = self._intern_host(host)
+        for rtype, vals in records.items():
+            if not vals:
+                continue
+            hosts, offsets, values = self._column(rtype)
+            hosts.append(hid)
+            values.extend(self._intern_value(v) for v in vals)
+            offsets.append(len(values))
+
+    def types(self) -> List[str]:
+        return list(self._columns)
+
+    def items(self, rtype: str) -> Iterator[Tuple[str, List[str]]]:
+        """(host, values) for every host with records of ``rtype``."""
+        col = self._columns.get(rtype)
+        if col is None:
+            return
+        hosts, offsets, values = col
+        names, vals = self.hosts, self.values
+        for i, hid in enumerate(hosts):
+            yield names[hid], [vals[v] for v in values[offsets[i]:offsets[i + 1]]]
+
+    def values_of(self, rtype: str) -> Set[str]:
+        col = self._columns.get(rtype)
+        return {self.values[v] for v in col[2]} if col is not None else set()
+
+    def to_fields(self) -> Dict[str, Dict[str, List[str]]]:
+        """The six per-type maps of the full schema: every host (sorted), empty lists included."""
+        ordered = sorted(self.hosts)
+        out: Dict[str, Dict[str, List[str]]] = {}
+        for rtype, field in RECORD_FIELDS:
+            found = dict(self.items(rtype))
+            out[field] = {h: found.get(h, []) for h in ordered}
+        return out
+
+    def to_dict(self) -> dict:
+        return {
+            "hosts": list(self.hosts),
+            "values": list(self.values),
+            "records": {
+                rtype: {"host": hosts.tolist(), "offset": offsets.tolist(), "value": values.tolist()}
+                for rtype, (hosts, offsets, values) in self._columns.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RecordStore":
+        store = cls()
+        store.hosts = list(data.get("hosts") or [])
+        store.values = list(data.get("values") or [])
+        store._host_ids = {h: i for i, h in enumerate(store.hosts)}
+        store._value_ids = {v: i for i, v in enumerate(store.values)}
+        for rtype, col in (data.get("records") or {}).items():
+            store._columns[rtype] = (array("I", col["host"]), array("I", col["offset"]), array("I", col["value"]))
+        return store
+
+    @classmethod
+    def from_fields(cls, payload: dict) -> "RecordStore":
+        """Build from the per-type maps of a full-schema payload."""
+        store = cls()
+        per_host: Dict[str, Dict[str, List[str]]] = {}
+        for rtype, field in RECORD_FIELDS:
+            for host, vals in (payload.get(field) or {}).items():
+                per_host.setdefault(host, {})[rtype] = vals
+        for host, recs in per_host.items():
+            store.add(host, recs)
+        return store
+
+
+def compact_payload(payload: dict) -> dict:
+    """Full-schema payload -> compact one (``dns`` holds a RecordStore dict). Compact input is returned as is."""
+    if "dns" in payload:
+        return payload
+    fields = {field for _, field in RECORD_FIELDS}
+    out = {k: v for k, v in payload.items() if k not in fields}
+    out["dns"] = RecordStore.from_fields(payload).to_dict()
+    return out
+
+
+def expand_payload(payload: dict) -> dict:
+    """Compact payload -> the full AnalyzeResponse schema. Full-schema input is returned as is."""
+    if "dns" not in payload:
+        return payload
+    out = {k: v for k, v in payload.items() if k != "dns"}
+    out.update(RecordStore.from_dict(payload["dns"]).to_fields())
+    return out
+
+
+def encode_compact(payload: dict, accept: str = "", accept_encoding: str = "") -> Tuple[bytes, str, Dict[str, str]]:
+    """Body, media type and headers for a compact payload, negotiated from the request headers.
+
+    msgpack when asked for and installed, JSON otherwise; gzip when accepted
+    and the body is worth compressing.
+    """
+    if msgpack is not None and any(t in accept for t in MSGPACK_TYPES):
+        body, media_type = msgpack.packb(payload, use_bin_type=True), "application/msgpack"
+    else:
+        body, media_type = json.dumps(payload, separators=(",", ":")).encode("utf-8"), "application/json"
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(body) >= _GZIP_MIN and "gzip" in accept_encoding:
+        body = gzip.compress(body, 5)
+        headers["Content-Encoding"] = "gzip"
+    return body, media_type, headers
@@ -1,43 +1,93 @@
 from __future__ import annotations
 
 from io import BytesIO
-from typing import Dict, List, Optional
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 import base64
+import csv
+import io
+import json
+import os
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
-from reportlab.pdfgen import canvas
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image as RLImage
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_LEFT
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Preformatted, Spacer, Table, TableStyle, PageBreak, Image as RLImage
 from reportlab.lib.styles import ParagraphStyle
 
+# Hosts above which reports use the large layout (rollups, capped tables, no graph image)
+REPORT_LARGE_HOSTS = int(os.getenv("REPORT_LARGE_HOSTS", "500"))
+# Rows per table section in the large layout; the rest is left to the CSV/JSONL appendix
+REPORT_LARGE_MAX_ROWS = int(os.getenv("REPORT_LARGE_MAX_ROWS", "2000"))
+# Rows per Table flowable: ReportLab re-lays the remainder of a table at every page split,
+# so page-sized pieces keep long tables linear instead of quadratic
+_CHUNK_ROWS = 50
+_SUBDOMAIN_COLUMNS = 3
 
-def _h(text: str, size=14, space=6):
-    style = ParagraphStyle(name='Heading', fontName='Helvetica-Bold', fontSize=size, leading=size+2, spaceAfter=space)
-    return Paragraph(text, style)
+# Styles are built once and shared by every report
+_TITLE = ParagraphStyle(name='Title', fontName='Helvetica-Bold', fontSize=18, leading=20, spaceAfter=12)
+_HEADING = ParagraphStyle(name='Heading', fontName='Helvetica-Bold', fontSize=14, leading=16, spaceAfter=6)
+_BODY = ParagraphStyle(name='Body', fontName='Helvetica', fontSize=10, leading=12)
+_MONO = ParagraphStyle(name='Mono', fontName='Courier', fontSize=7, leading=8.5)
+_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.black),
+    ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0,0), (-1,-1), 9),
+    ('BOTTOMPADDING', (0,0), (-1,0), 6),
+    ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
+])
+_COMPACT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0,0), (-1,-1), 7),
+    ('LEADING', (0,0), (-1,-1), 8),
+    ('TOPPADDING', (0,0), (-1,-1), 1),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 1),
+    ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
+])
+
+_RECORD_FIELDS = (
+    ('a', 'dns_a_records'), ('aaaa', 'dns_aaaa_records'), ('cname', 'dns_cname_records'),
+    ('mx', 'dns_mx_records'), ('ns', 'dns_ns_records'), ('txt', 'dns_txt_records'),
+)
 
 
-def _p(text: str, size=10):
-    style = ParagraphStyle(name='Body', fontName='Helvetica', fontSize=size, leading=size+2)
+def _h(text: str, style: ParagraphStyle = _HEADING):
     return Paragraph(text, style)
 
 
-def _table(data: List[List[str]], colWidths=None):
+def _p(text: str):
+    return Paragraph(text, _BODY)
+
+
+def _table(data: List[List[str]], colWidths=None, style: TableStyle = _TABLE_STYLE):
     t = Table(data, colWidths=colWidths, repeatRows=1)
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.black),
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,-1), 9),
-        ('BOTTOMPADDING', (0,0), (-1,0), 6),
-        ('GRID', (0,0), (-1,-1), 0.25, colors.grey),
-    ]))
+    t.setStyle(style)
     return t
 
 
+def _tables(header: List[str], rows: Sequence[List[str]], colWidths=None, style: TableStyle = _TABLE_STYLE) -> List[Table]:
+    """One table per ``_CHUNK_ROWS`` rows, each repeating the header."""
+    return [_table([header] + list(rows[i:i + _CHUNK_ROWS]), colWidths, style) for i in range(0, len(rows), _CHUNK_ROWS)]
+
+
+def _columns(items: Sequence[str], n: int) -> List[List[str]]:
+    # Column-major within each table chunk, so names read top to bottom on a page
+    rows: List[List[str]] = []
+    per_chunk = _CHUNK_ROWS * n
+    for start in range(0, len(items), per_chunk):
+        block = items[start:start + per_chunk]
+        height = (len(block) + n - 1) // n
+        for r in range(height):
+            rows.append([block[c * height + r] if c * height + r < len(block) else '' for c in range(n)])
+    return rows
+
+
+def _sample(items: Sequence[str], n: int = 3) -> str:
+    shown = ', '.join(items[:n])
+    return shown + (f' (+{len(items) - n})' if len(items) > n else '')
+
+
 def _image_from_dataurl(dataurl: str, max_width=480) -> Optional[RLImage]:
     try:
         if not dataurl.startswith('data:image/png'):
@@ -56,13 +106,38 @@ def _image_from_dataurl(dataurl: str, max_width=480) -> Optional[RLImage]:
         return None
 
 
+def host_count(data: Dict) -> int:
+    return max(len(data.get('subdomains') or []), len(data.get('dns_a_records') or {}))
+
+
+def is_large(data: Dict) -> bool:
+    layout = data.get('layout')
+    if layout in ('standard', 'large'):
+        return layout == 'large'
+    return host_count(data) > REPORT_LARGE_HOSTS
+
+
 def generate_pdf_report(data: Dict) -> bytes:
     buf = BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4, rightMargin=36, leftMargin=36, topMargin=36, bottomMargin=36)
+    _build(data, buf)
+    pdf = buf.getvalue()
+    buf.close()
+    return pdf
+
+
+def write_pdf_report(data: Dict, path: str) -> int:
+    """Render straight to ``path`` (no in-memory copy of the PDF); returns its size."""
+    _build(data, path)
+    return os.path.getsize(path)
+
+
+def _build(data: Dict, target: Union[str, BinaryIO]) -> None:
+    doc = SimpleDocTemplate(target, pagesize=A4, rightMargin=36, leftMargin=36, topMargin=36, bottomMargin=36)
     story: List = []
+    large = is_large(data)
 
     domain = data.get('domain') or ''
-    story.append(_h(f'Reconnaissance Report: {domain}', size=18, space=12))
+    story.append(_h(f'Reconnaissance Report: {domain}', _TITLE))
 
     # Tor status (if provided by client)
     tor = data.get('tor_status') or {}
@@ -98,14 +173,37 @@ def generate_pdf_report(data: Dict) -> bytes:
             story.append(_p('Name Servers: ' + ', '.join(ns)))
     story.append(Spacer(1, 12))
 
+    if large:
+        story.extend(_large_sections(data))
+    else:
+        story.extend(_standard_sections(data))
+
+    # Graph image (if provided); a graph of thousands of nodes is unreadable at page size
+    graph_png_dataurl = data.get('graph_png')
+    img = _image_from_dataurl(graph_png_dataurl) if graph_png_dataurl and not large else None
+    if img:
+        story.append(PageBreak())
+        story.append(_h('Graph Overview'))
+        story.append(img)
+
+    # Raw WHOIS (Optional)
+    if whois and whois.get('raw_text'):
+        story.append(PageBreak())
+        story.append(_h('Raw WHOIS'))
+        # Preformatted splits across pages line by line instead of laying out one huge paragraph
+        story.append(Preformatted(whois.get('raw_text'), _MONO, maxLineLength=110))
+
+    doc.build(story)
+
+
+def _standard_sections(data: Dict) -> List:
+    story: List = []
+
     # Subdomains
     story.append(_h('Subdomains'))
     subs = data.get('subdomains') or []
     if subs:
-        tbl = [['Subdomain']]
-        for s in subs:
-            tbl.append([s])
-        story.append(_table(tbl, colWidths=[480]))
+        story.extend(_tables(['Subdomain'], [[s] for s in subs], colWidths=[480]))
     else:
         story.append(_p('None found'))
     story.append(Spacer(1, 12))
@@ -113,31 +211,21 @@ def generate_pdf_report(data: Dict) -> bytes:
     # DNS Records (A, AAAA, CNAME)
     story.append(_h('DNS Records'))
     a_rec = data.get('dns_a_records') or {}
-    tbl = [['Host','A']]
-    for host, ips in a_rec.items():
-        if ips:
-            tbl.append([host, ', '.join(ips)])
-    if len(tbl) > 1:
-        story.append(_table(tbl, colWidths=[200, 280]))
+    rows = [[host, ', '.join(ips)] for host, ips in a_rec.items() if ips]
+    story.extend(_tables(['Host','A'], rows, colWidths=[200, 280]))
     cname_rec = data.get('dns_cname_records') or {}
-    if cname_rec:
+    rows = [[host, ', '.join(cn)] for host, cn in cname_rec.items() if cn]
+    if rows:
         story.append(Spacer(1, 6))
-        tbl = [['Host','CNAME']]
-        for host, cn in cname_rec.items():
-            if cn:
-                story.append(_table([['Host','CNAME']] + [[host, ', '.join(cn)]], colWidths=[200, 280]))
+        story.extend(_tables(['Host','CNAME'], rows, colWidths=[200, 280]))
     story.append(Spacer(1, 12))
 
     # Reverse IP
     story.append(_h('Reverse IP (co-hosted domains)'))
     rev = data.get('reverse_ip') or {}
     if rev:
-        tbl = [['IP','Domains']]
-        for ip, doms in rev.items():
-            if doms:
-                tbl.append([ip, ', '.join(doms[:50]) + (' ...' if len(doms)>50 else '')])
-        if len(tbl) > 1:
-            story.append(_table(tbl, colWidths=[120, 360]))
+        rows = [[ip, ', '.join(doms[:50]) + (' ...' if len(doms)>50 else '')] for ip, doms in rev.items() if doms]
+        story.extend(_tables(['IP','Domains'], rows, colWidths=[120, 360]))
     else:
         story.append(_p('None'))
     story.append(Spacer(1, 12))
@@ -146,10 +234,8 @@ def generate_pdf_report(data: Dict) -> bytes:
     story.append(_h('IP Info (RDAP)'))
     ip_info = data.get('ip_info') or {}
     if ip_info:
-        tbl = [['IP','Name','Country','Handle']]
-        for ip, info in ip_info.items():
-            tbl.append([ip, str(info.get('name') or ''), str(info.get('country') or ''), str(info.get('handle') or '')])
-        story.append(_table(tbl, colWidths=[120, 220, 60, 80]))
+        rows = [[ip, str(info.get('name') or ''), str(info.get('country') or ''), str(info.get('handle') or '')] for ip, info in ip_info.items()]
+        story.extend(_tables(['IP','Name','Country','Handle'], rows, colWidths=[120, 220, 60, 80]))
     else:
         story.append(_p('None'))
     story.append(Spacer(1, 12))
@@ -164,29 +250,164 @@ def generate_pdf_report(data: Dict) -> bytes:
             continue
         has_ports = True
         story.append(_p(f'{ip}'))
-        tbl = [['Port','Protocol','Service','Product','Version']]
-        for p in ports:
-            tbl.append([str(p.get('port')), str(p.get('protocol')), str(p.get('service') or ''), str(p.get('product') or ''), str(p.get('version') or '')])
-        story.append(_table(tbl, colWidths=[60, 60, 120, 120, 120]))
+        rows = [[str(p.get('port')), str(p.get('protocol')), str(p.get('service') or ''), str(p.get('product') or ''), str(p.get('version') or '')] for p in ports]
+        story.extend(_tables(['Port','Protocol','Service','Product','Version'], rows, colWidths=[60, 60, 120, 120, 120]))
         story.append(Spacer(1, 6))
     if not has_ports:
         story.append(_p('No open ports found or Nmap not run'))
+    return story
 
-    # Graph image (if provided)
-    graph_png_dataurl = data.get('graph_png')
-    img = _image_from_dataurl(graph_png_dataurl) if graph_png_dataurl else None
-    if img:
-        story.append(PageBreak())
-        story.append(_h('Graph Overview'))
-        story.append(img)
 
-    # Raw WHOIS (Optional)
-    if whois and whois.get('raw_text'):
-        story.append(PageBreak())
-        story.append(_h('Raw WHOIS'))
-        story.append(_p('<pre>' + whois.get('raw_text').replace('<','&lt;').replace('>','&gt;') + '</pre>'))
+def ip_rollup(data: Dict) -> List[Tuple[str, List[str]]]:
+    """(ip, hosts) for every A/AAAA address, most shared first."""
+    by_ip: Dict[str, List[str]] = {}
+    for field in ('dns_a_records', 'dns_aaaa_records'):
+        for host, ips in (data.get(field) or {}).items():
+            for ip in ips or ():
+                by_ip.setdefault(ip, []).append(host)
+    return sorted(by_ip.items(), key=lambda kv: (-len(kv[1]), kv[0]))
 
-    doc.build(story)
-    pdf = buf.getvalue()
-    buf.close()
-    return pdf
+
+def asn_rollup(data: Dict, by_ip: Iterable[Tuple[str, List[str]]]) -> List[Tuple[str, str, int, int]]:
+    """(ASN or RDAP network, organisation, IPs, hosts), largest first."""
+    ip_info = data.get('ip_info') or {}
+    groups: Dict[str, List] = {}
+    for ip, hosts in by_ip:
+        info = ip_info.get(ip) or {}
+        if info.get('asn'):
+            key, org = f"AS{info['asn']}", info.get('asn_org') or info.get('name') or ''
+        elif info.get('handle') or info.get('name'):
+            key, org = str(info.get('handle') or info.get('name')), str(info.get('name') or '')
+        else:
+            key, org = 'unknown', ''
+        g = groups.setdefault(key, [org, 0, set()])
+        g[1] += 1
+        g[2].update(hosts)
+    out = [(key, org, n_ips, len(hosts)) for key, (org, n_ips, hosts) in groups.items()]
+    return sorted(out, key=lambda r: (-r[3], r[0]))
+
+
+def _capped(rows: List[List[str]], limit: int, what: str) -> Tuple[List[List[str]], Optional[Paragraph]]:
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], _p(f'{len(rows) - limit} more {what} not shown; see the CSV/JSONL appendix (/api/report/appendix.csv).')
+
+
+def _large_sections(data: Dict) -> List:
+    """Summary, per-IP / per-ASN / per-CNAME-target rollups and capped, multi-column host lists."""
+    story: List = []
+    limit = REPORT_LARGE_MAX_ROWS
+    subs = data.get('subdomains') or []
+    by_ip = ip_rollup(data)
+    asns = asn_rollup(data, by_ip)
+    by_target: Dict[str, List[str]] = {}
+    for host, targets in (data.get('dns_cname_records') or {}).items():
+        for t in targets or ():
+            by_target.setdefault(t, []).append(host)
+    ip_ports = data.get('ip_ports') or {}
+    port_rows = [
+        [ip, str(p.get('port')), str(p.get('protocol')), str(p.get('service') or ''), ' '.join(filter(None, [str(p.get('product') or ''), str(p.get('version') or '')]))]
+        for ip, pdata in ip_ports.items() for p in (pdata.get('ports') or [])
+    ]
+
+    story.append(_h('Summary'))
+    resolved = sum(1 for ips in (data.get('dns_a_records') or {}).values() if ips)
+    story.append(_table([
+        ['Item', 'Count'],
+        ['Subdomains', str(len(subs))],
+        ['Hosts with A records', str(resolved)],
+        ['Unique IP addresses', str(len(by_ip))],
+        ['ASNs / networks', str(len(asns))],
+        ['CNAME targets', str(len(by_target))],
+        ['Open ports', str(len(port_rows))],
+    ], colWidths=[240, 240]))
+    story.append(Spacer(1, 12))
+
+    story.append(_h('Hosting by ASN'))
+    rows = [[key, org[:60], str(n_ips), str(n_hosts)] for key, org, n_ips, n_hosts in asns]
+    rows, more = _capped(rows, limit, 'networks')
+    story.extend(_tables(['ASN / network', 'Organisation', 'IPs', 'Hosts'], rows, colWidths=[90, 270, 50, 70]) or [_p('None')])
+    if more:
+        story.append(more)
+    story.append(Spacer(1, 12))
+
+    story.append(_h('Hosts per IP'))
+    ip_info = data.get('ip_info') or {}
+    rows = []
+    for ip, hosts in by_ip:
+        info = ip_info.get(ip) or {}
+        rows.append([ip, str(info.get('asn_org') or info.get('name') or '')[:30], str(len(hosts)), _sample(hosts, 2)[:70]])
+    rows, more = _capped(rows, limit, 'IP addresses')
+    story.extend(_tables(['IP', 'Network', 'Hosts', 'Examples'], rows, colWidths=[90, 110, 40, 250], style=_COMPACT_TABLE_STYLE) or [_p('None')])
+    if more:
+        story.append(more)
+    story.append(Spacer(1, 12))
+
+    if by_target:
+        story.append(_h('CNAME targets'))
+        rows = [[t[:60], str(len(hosts)), _sample(hosts, 2)[:60]] for t, hosts in sorted(by_target.items(), key=lambda kv: (-len(kv[1]), kv[0]))]
+        rows, more = _capped(rows, limit, 'CNAME targets')
+        story.extend(_tables(['Target', 'Hosts', 'Examples'], rows, colWidths=[200, 40, 250], style=_COMPACT_TABLE_STYLE))
+        if more:
+            story.append(more)
+        story.append(Spacer(1, 12))
+
+    story.append(_h('Open Ports (Nmap)'))
+    if port_rows:
+        rows, more = _capped(port_rows, limit, 'open ports')
+        story.extend(_tables(['IP', 'Port', 'Protocol', 'Service', 'Product'], rows, colWidths=[100, 50, 50, 100, 180], style=_COMPACT_TABLE_STYLE))
+        if more:
+            story.append(more)
+    else:
+        story.append(_p('No open ports found or Nmap not run'))
+    story.append(Spacer(1, 12))
+
+    story.append(PageBreak())
+    story.append(_h('Subdomains'))
+    shown = subs[:limit * _SUBDOMAIN_COLUMNS]
+    if shown:
+        width = 480 / _SUBDOMAIN_COLUMNS
+        story.extend(_tables(['Subdomain'] + [''] * (_SUBDOMAIN_COLUMNS - 1), _columns(shown, _SUBDOMAIN_COLUMNS), colWidths=[width] * _SUBDOMAIN_COLUMNS, style=_COMPACT_TABLE_STYLE))
+        if len(subs) > len(shown):
+            story.append(_p(f'{len(subs) - len(shown)} more subdomains not shown; see the CSV/JSONL appendix (/api/report/appendix.csv).'))
+    else:
+        story.append(_p('None found'))
+    return story
+
+
+def appendix_rows(data: Dict) -> Iterator[Dict[str, object]]:
+    """One row per host with all of its DNS records, plus the IP details of its addresses."""
+    hosts = list(dict.fromkeys(list(data.get('subdomains') or []) + list(data.get('dns_a_records') or {})))
+    records = [(name, data.get(field) or {}) for name, field in _RECORD_FIELDS]
+    ip_info = data.get('ip_info') or {}
+    for host in hosts:
+        row: Dict[str, object] = {'host': host}
+        for name, recs in records:
+            row[name] = list(recs.get(host) or [])
+        asns = []
+        for ip in row['a'] + row['aaaa']:
+            info = ip_info.get(ip) or {}
+            label = f"AS{info['asn']}" if info.get('asn') else (info.get('name') or '')
+            if label and label not in asns:
+                asns.append(label)
+        row['networks'] = asns
+        yield row
+
+
+def iter_appendix(data: Dict, fmt: str = 'csv') -> Iterator[str]:
+    """The full host table as CSV (lists joined by spaces) or JSON Lines, a row at a time."""
+    if fmt == 'jsonl':
+        for row in appendix_rows(data):
+            yield json.dumps(row, separators=(',', ':')) + '\n'
+        return
+    columns = ['host'] + [name for name, _ in _RECORD_FIELDS] + ['networks']
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for i, row in enumerate(appendix_rows(data), 1):
+        writer.writerow([row['host']] + [' '.join(str(v) for v in row[c]) for c in columns[1:]])
+        if i % 500 == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
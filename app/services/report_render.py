@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, Optional, Tuple
+
+from .singleflight import SingleFlight
+
+# Worker processes for PDF rendering; also the number of reports rendered at the same time
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+# Rendered reports kept by payload hash
+REPORT_CACHE_ENTRIES = int(os.getenv("REPORT_CACHE_ENTRIES", "16"))
+# Reports up to this size are kept in memory; larger ones stay on disk and are streamed from the file
+REPORT_SPOOL_BYTES = int(os.getenv("REPORT_SPOOL_BYTES", str(4 * 1024 * 1024)))
+# Where rendered files go (default: a temporary directory removed on shutdown)
+REPORT_DIR = os.getenv("REPORT_DIR")
+_CHUNK = 1 << 16
+
+
+def _render(payload_json: str, path: str) -> int:
+    # Runs in a worker process; the payload crosses the process boundary as one JSON string
+    from .report import write_pdf_report
+
+    return write_pdf_report(json.loads(payload_json), path)
+
+
+def _read_and_unlink(path: str) -> bytes:
+    with open(path, "rb") as fh:
+        data = fh.read()
+    os.unlink(path)
+    return data
+
+
+def _unlink(path: Optional[str]) -> None:
+    if path:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def payload_key(payload: dict) -> Tuple[str, str]:
+    """Content hash of a report payload, plus the canonical JSON it was computed from."""
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest(), text
+
+
+class RenderedReport:
+    """A rendered PDF: ``data`` when it is small enough to keep in memory, else ``path``."""
+
+    __slots__ = ("key", "size", "data", "path")
+
+    def __init__(self, key: str, size: int, data: Optional[bytes] = None, path: Optional[str] = None):
+        self.key = key
+        self.size = size
+        self.data = data
+        self.path = path
+
+    def available(self) -> bool:
+        return self.data is not None or (self.path is not None and os.path.exists(self.path))
+
+    def chunks(self) -> Iterator[bytes]:
+        """Body iterator; a file-backed report is opened right away so a later eviction can't remove it mid-stream."""
+        if self.data is not None:
+            return iter((self.data,))
+        fh = open(self.path, "rb")
+
+        def read() -> Iterator[bytes]:
+            with fh:
+                for block in iter(lambda: fh.read(_CHUNK), b""):
+                    yield block
+
+        return read()
+
+
+class ReportRenderer:
+    """PDF rendering off the event loop, in a process pool, cached by payload hash.
+
+    ReportLab layout is CPU bound and holds the GIL, so a thread would still
+    stall the server; workers are separate processes (spawned, not forked
+    from the running server). At most ``workers`` reports render at once,
+    identical concurrent requests share one render, and the last
+    ``max_entries`` results are kept: in memory up to ``spool_bytes``, on
+    disk above that.
+    """
+
+    def __init__(self, workers: int = REPORT_WORKERS, max_entries: int = REPORT_CACHE_ENTRIES, spool_bytes: int = REPORT_SPOOL_BYTES, directory: Optional[str] = REPORT_DIR):
+        self.workers = max(1, workers)
+        self.max_entries = max(1, max_entries)
+        self.spool_bytes = spool_bytes
+        self._directory = directory
+        self._own_directory = False
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._cache: "OrderedDict[str, RenderedReport]" = OrderedDict()
+        self._inflight: "SingleFlight[RenderedReport]" = SingleFlight()
+        self.renders = 0
+        self.hits = 0
+        self.errors = 0
+        self.render_seconds = 0.0
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _dir(self) -> str:
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix="recon-reports-")
+            self._own_directory = True
+        else:
+            os.makedirs(self._directory, exist_ok=True)
+        return self._directory
+
+    async def render(self, payload: dict) -> RenderedReport:
+        # Hashing a large payload is real work too; keep it off the loop
+        key, text = await asyncio.to_thread(payload_key, payload)
+        cached = self._cache.get(key)
+        if cached is not None and cached.available():
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return cached
+        return await self._inflight.run(key, lambda: self._render_and_store(key, text))
+
+    async def _render_and_store(self, key: str, text: str) -> RenderedReport:
+        report = await self._render(key, text)
+        self._store(report)
+        return report
+
+    async def _render(self, key: str, text: str) -> RenderedReport:
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.workers)
+        path = os.path.join(self._dir(), key + ".pdf")
+        async with self._sem:
+            t0 = time.monotonic()
+            rendered = False
+            job = self._executor().submit(_render, text, path)
+            try:
+                size = await asyncio.wrap_future(job)
+                rendered = True
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory on a huge report); start a fresh pool next time
+                self._pool = None
+                self.errors += 1
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+            finally:
+                # Also on cancellation: the worker may still be writing, so remove the file once it stops
+                if not rendered:
+                    job.add_done_callback(lambda _: _unlink(path))
+            self.renders += 1
+            self.render_seconds += time.monotonic() - t0
+        if size <= self.spool_bytes:
+            return RenderedReport(key, size, data=await asyncio.to_thread(_read_and_unlink, path))
+        return RenderedReport(key, size, path=path)
+
+    def _store(self, report: RenderedReport) -> None:
+        old = self._cache.pop(report.key, None)
+        if old is not None and old.path != report.path:
+            _unlink(old.path)
+        self._cache[report.key] = report
+        while len(self._cache) > self.max_entries:
+            _, evicted = self._cache.popitem(last=False)
+            _unlink(evicted.path)
+
+    def clear(self) -> None:
+        for report in self._cache.values():
+            _unlink(report.path)
+        self._cache.clear()
+
+    def close(self) -> None:
+        self.clear()
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if self._own_directory and self._directory:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+            self._own_directory = False
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "workers": self.workers,
+            "renders": self.renders,
+            "cache_hits": self.hits,
+            "errors": self.errors,
+            "in_flight": len(self._inflight),
+            "avg_render_seconds": round(self.render_seconds / self.renders, 3) if self.renders else None,
+            "cached": len(self._cache),
+            "cached_memory_bytes": sum(r.size for r in self._cache.values() if r.data is not None),
+            "cached_disk_bytes": sum(r.size for r in self._cache.values() if r.path is not None),
+        }
+
+
+REPORT_RENDERER = ReportRenderer()
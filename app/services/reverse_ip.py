@@ -1,42 +1,87 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Dict, Iterable, List, Optional
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 
 import httpx
 
+from .http_client import http_client
+from .rate_limit import adaptive_limiter, request_with_retries
+from .stage_cache import MISSING, stage_cache
 
 API_URL = "https://api.hackertarget.com/reverseiplookup/"
 
 
-async def _reverse_lookup_one(client: httpx.AsyncClient, ip: str) -> List[str]:
+def _throttled(r: httpx.Response) -> bool:
+    # HackerTarget answers 200 with a message body when the quota is used up or the lookup failed
+    text = r.text.lstrip().lower()
+    return text.startswith("error") or text.startswith("api count exceeded")
+
+
+async def _reverse_lookup_one(client: httpx.AsyncClient, ip: str) -> Tuple[Optional[List[str]], Optional[str]]:
+    # (domains, None) for a real answer, including "no records"; (None, reason) otherwise, which isn't cached
     try:
-        r = await client.get(API_URL, params={"q": ip})
+        r = await request_with_retries(adaptive_limiter("reverse_ip"), lambda: client.get(API_URL, params={"q": ip}), is_throttled=_throttled)
+        if r is None:
+            return None, "no response"
+        if r.status_code != 200:
+            return None, f"HTTP {r.status_code}"
         text = r.text.strip()
-        # Responses are newline-separated domains, or contain error strings
-        if "error" in text.lower() or "no records" in text.lower():
-            return []
+        if _throttled(r):
+            # Still failing after the retries, e.g. "API count exceeded - Increase Quota with Membership"
+            return None, text.splitlines()[0][:200]
+        # Responses are newline-separated domains
+        if "no records" in text.lower():
+            return [], None
         domains = [line.strip().lower() for line in text.splitlines() if line.strip()]
         # Sanity filter: include only lines that look like domains
         domains = [d for d in domains if "." in d and " " not in d]
-        return domains
-    except Exception:
-        return []
+        return domains, None
+    except Exception as e:
+        return None, str(e) or type(e).__name__
+
 
+async def reverse_lookup_many(ips: Iterable[str], proxies: Optional[str] = None, on_result: Optional[Callable[[str, List[str]], None]] = None, on_error: Optional[Callable[[str, str], None]] = None) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+    """Co-hosted domains per IP from HackerTarget, plus the IPs the lookup failed for.
 
-async def reverse_lookup_many(ips: Iterable[str], proxies: Optional[str] = None) -> Dict[str, List[str]]:
-    # Limit concurrency to be respectful to the public endpoint
-    sem = asyncio.Semaphore(5)
-    timeout = httpx.Timeout(20.0, connect=10.0)
-    headers = {"User-Agent": "WebReconVisualizer/0.1"}
+    Returns ``(domains, errors)``: ``domains`` holds the IPs that got an
+    answer (possibly empty), ``errors`` maps every other IP to the reason.
+    ``on_result`` / ``on_error`` are called as each IP finishes.
+    """
+    cache = stage_cache("reverse_ip")
+    ip_list = list(dict.fromkeys(ips))
+    out: Dict[str, List[str]] = {}
+    errors: Dict[str, str] = {}
+    missing: List[str] = []
+    for ip in ip_list:
+        cached = cache.get(ip)
+        if cached is MISSING:
+            missing.append(ip)
+        else:
+            out[ip] = cached
+            if on_result is not None:
+                on_result(ip, cached)
+    if not missing:
+        return out, errors
 
-    transport = httpx.AsyncHTTPTransport(proxy=proxies) if proxies else None
-    async with httpx.AsyncClient(timeout=timeout, headers=headers, transport=transport) as client:
+    # Concurrency is governed by the adaptive "reverse_ip" limiter, which backs off on 429/503/timeouts and quota messages
+    async with http_client("reverse_ip", proxies) as client:
         async def worker(ip: str):
-            async with sem:
-                return ip, await _reverse_lookup_one(client, ip)
+            domains, error = await _reverse_lookup_one(client, ip)
+            if error is not None:
+                if on_error is not None:
+                    on_error(ip, error)
+            elif on_result is not None:
+                on_result(ip, domains)
+            return ip, domains, error
 
-        tasks = [worker(ip) for ip in ips]
+        tasks = [worker(ip) for ip in missing]
         results = await asyncio.gather(*tasks)
 
-    return {ip: domains for ip, domains in results}
+    for ip, domains, error in results:
+        if error is not None:
+            errors[ip] = error
+        else:
+            cache.set(ip, domains)
+            out[ip] = domains
+    return {ip: out[ip] for ip in ip_list if ip in out}, errors
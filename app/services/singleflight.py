@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, TypeVar
+
+R = TypeVar("R")
+
+
+class SingleFlight(Generic[R]):
+    """Concurrent calls for the same key share one piece of work.
+
+    The work runs as its own task and every caller awaits it through
+    ``asyncio.shield``, so a caller that is cancelled (e.g. its client went
+    away) only stops waiting: the work goes on and the other callers still
+    get its result. Only the work's own outcome, success or exception, is
+    passed on.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: Dict[Hashable, "asyncio.Task[R]"] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    async def run(self, key: Hashable, work: Callable[[], Awaitable[R]]) -> R:
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(work())
+            task.add_done_callback(lambda t: self._done(key, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: "asyncio.Task[R]") -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # Mark retrieved so a failure nobody is waiting for anymore isn't logged
+        if not task.cancelled():
+            task.exception()
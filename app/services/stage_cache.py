@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+# Default freshness per pipeline stage in seconds; override with STAGE_TTL_<NAME>
+_DEFAULT_TTLS: Dict[str, int] = {
+    "whois": 6 * 3600,
+    "crtsh": 3600,
+    "amass": 6 * 3600,
+    "sublist3r": 6 * 3600,
+    "subfinder": 6 * 3600,
+    "reverse_ip": 86400,
+    "rdap": 3 * 86400,
+    "shodan": 86400,
+    "censys": 86400,
+    "nmap": 3600,
+    "port_scan": 3600,
+}
+STAGE_CACHE_MAX_ENTRIES = int(os.getenv("STAGE_CACHE_MAX_ENTRIES", "50000"))
+
+MISSING = object()
+
+
+class StageCache:
+    """Process-wide TTL + LRU cache for the results of a single service stage.
+
+    Values are deep-copied on the way in and out so callers can mutate what
+    they get back (``analyze`` merges Shodan/Censys names into reverse-IP lists).
+    """
+
+    def __init__(self, name: str, ttl: int, max_entries: int = STAGE_CACHE_MAX_ENTRIES):
+        self.name = name
+        self.ttl = int(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value or :data:`MISSING`."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        return copy.deepcopy(value)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_CACHES: Dict[str, StageCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def stage_cache(name: str) -> StageCache:
+    with _CACHES_LOCK:
+        cache = _CACHES.get(name)
+        if cache is None:
+            ttl = int(os.getenv(f"STAGE_TTL_{name.upper()}", str(_DEFAULT_TTLS.get(name, 3600))))
+            cache = _CACHES[name] = StageCache(name, ttl)
+        return cache
+
+
+def all_stats() -> Dict[str, Dict[str, object]]:
+    return {name: cache.stats() for name, cache in sorted(_CACHES.items())}
+
+
+def clear_all() -> None:
+    for cache in list(_CACHES.values()):
+        cache.clear()
@@ -1,17 +1,27 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import codecs
 import os
-import re
 import shutil
 import subprocess
-import tempfile
-from typing import Iterable, List, Set, Optional, Dict, Any
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 import httpx
 from typing import Optional
 
+from . import sublist3r_engines
+from .crtsh_stream import CrtshStreamParser, parse_crtsh_stream
+from .http_client import http_client
+from .stage_cache import MISSING, stage_cache
+
+# "inprocess" runs Sublist3r's engines in threads (needs the sublist3r package); "cli" streams the sublist3r command
+SUBLIST3R_MODE = os.getenv("SUBLIST3R_MODE", "inprocess").lower()
+# Comma-separated engine names (see sublist3r -e); empty means all
+SUBLIST3R_ENGINES = [e.strip().lower() for e in os.getenv("SUBLIST3R_ENGINES", "").split(",") if e.strip()]
+# Seconds a tool gets to exit after SIGTERM (timeout or cancel) before it is killed
+SUBPROCESS_TERM_GRACE = float(os.getenv("SUBPROCESS_TERM_GRACE", "5"))
+
 
 def _clean_domain(name: str) -> str:
     name = name.strip().lower()
@@ -20,132 +30,224 @@ def _clean_domain(name: str) -> str:
     return name
 
 
-async def _run_cmd_capture(cmd: List[str], timeout: int = 120) -> str:
-    try:
-        proc = await asyncio.create_subprocess_exec(
-            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
-        )
+class _LineStream:
+    """Run ``cmd`` and iterate over its stdout as batches of lines, as they are printed.
+
+    Stops reading at ``timeout`` (``timed_out`` is set) and, on exit from the
+    ``async with`` block, stops the process with SIGTERM, then SIGKILL after
+    ``grace`` seconds.
+    """
+
+    def __init__(self, cmd: List[str], timeout: float, grace: float = SUBPROCESS_TERM_GRACE):
+        self.cmd = cmd
+        self.timeout = timeout
+        self.grace = grace
+        self.proc: Optional[asyncio.subprocess.Process] = None
+        self.timed_out = False
+        self.returncode: Optional[int] = None
+
+    async def __aenter__(self) -> "_LineStream":
+        self._deadline = asyncio.get_running_loop().time() + self.timeout
+        try:
+            self.proc = await asyncio.create_subprocess_exec(
+                *self.cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+            )
+        except FileNotFoundError:
+            self.proc = None
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._stop()
+
+    def __aiter__(self) -> AsyncIterator[List[str]]:
+        return self._batches()
+
+    def _remaining(self) -> float:
+        return self._deadline - asyncio.get_running_loop().time()
+
+    async def _batches(self) -> AsyncIterator[List[str]]:
+        if self.proc is None or self.proc.stdout is None:
+            return
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        tail = ""
+        while True:
+            remaining = self._remaining()
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                chunk = await asyncio.wait_for(self.proc.stdout.read(1 << 16), timeout=remaining)
+            except asyncio.TimeoutError:
+                # Everything printed so far is kept; only a half-written last line is dropped
+                self.timed_out = True
+                return
+            if not chunk:
+                break
+            lines = (tail + decoder.decode(chunk)).split("\n")
+            tail = lines.pop()
+            if lines:
+                yield lines
+        tail += decoder.decode(b"", final=True)
+        if tail.strip():
+            yield [tail]
         try:
-            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+            await asyncio.wait_for(self.proc.wait(), timeout=max(0.0, self._remaining()))
         except asyncio.TimeoutError:
-            proc.kill()
-            return ""
-        if proc.returncode != 0:
-            return stdout.decode() + "\n" + stderr.decode()
-        return stdout.decode()
-    except FileNotFoundError:
-        return ""
+            self.timed_out = True
+
+    async def _stop(self) -> None:
+        proc = self.proc
+        if proc is None:
+            return
+        if proc.returncode is None:
+            try:
+                proc.terminate()
+                await asyncio.wait_for(proc.wait(), timeout=self.grace)
+            except ProcessLookupError:
+                pass
+            except asyncio.TimeoutError:
+                proc.kill()
+                await proc.wait()
+            except asyncio.CancelledError:
+                # Cancelled again while waiting: don't leave the tool running
+                proc.kill()
+                raise
+        self.returncode = proc.returncode
+
 
+async def _stream_subdomains(cmd: List[str], domain: str, timeout: float, on_names: Optional[Callable[[List[str]], None]] = None, extract: Callable[[str], Iterable[str]] = lambda line: (line,)) -> Tuple[Set[str], bool]:
+    """Collect names under ``domain`` printed by ``cmd``; ``on_names`` gets each batch of new ones.
 
-async def _amass_enum(domain: str, mode: str = "passive", timeout: int = 240, extra_args: Optional[List[str]] = None) -> Set[str]:
+    ``extract`` picks the candidate names out of an output line (default: the whole line).
+    Returns the names and whether the tool finished before the timeout.
+    """
+    subs: Set[str] = set()
+    async with _LineStream(cmd, timeout) as stream:
+        async for lines in stream:
+            fresh = []
+            for line in lines:
+                for name in extract(line):
+                    d = _clean_domain(name)
+                    if d and d.endswith(domain) and d not in subs:
+                        subs.add(d)
+                        fresh.append(d)
+            if fresh and on_names is not None:
+                on_names(fresh)
+    return subs, stream.proc is not None and not stream.timed_out
+
+
+async def _amass_enum(domain: str, mode: str = "passive", timeout: int = 240, extra_args: Optional[List[str]] = None, on_names: Optional[Callable[[List[str]], None]] = None) -> Set[str]:
     if not shutil.which("amass"):
         return set()
+    cache = stage_cache("amass")
+    key = (domain, mode, tuple(extra_args or ()))
+    cached = cache.get(key)
+    if cached is not MISSING:
+        return set(cached)
     # Build command: passive by default; aggressive removes -passive
     cmd = ["amass", "enum", "-d", domain, "-silent"]
     if mode != "aggressive":
         cmd.insert(3, "-passive")
     if extra_args:
         cmd.extend(extra_args)
-    out = await _run_cmd_capture(cmd, timeout=timeout)
-    subs = set()
-    for line in out.splitlines():
-        d = _clean_domain(line)
-        if d.endswith(domain):
-            subs.add(d)
+    subs, complete = await _stream_subdomains(cmd, domain, timeout, on_names)
+    # Partial results from a timeout are used but not pinned in the cache; neither is an empty run
+    if subs and complete:
+        cache.set(key, sorted(subs))
     return subs
 
 
-async def _sublist3r_enum(domain: str, timeout: int = 360, threads: int = 40) -> Set[str]:
-    if not shutil.which("sublist3r"):
+async def _sublist3r_enum(domain: str, timeout: int = 360, threads: int = 40, on_names: Optional[Callable[[List[str]], None]] = None) -> Set[str]:
+    inprocess = SUBLIST3R_MODE != "cli" and sublist3r_engines.available()
+    if not inprocess and not shutil.which("sublist3r"):
         return set()
-    # Sublist3r requires an output file; create a temp file and read it
-    with tempfile.NamedTemporaryFile(prefix="tmp_rovodev_subs_", suffix=".txt", delete=False) as tf:
-        out_path = tf.name
-    try:
-        # Use fewer threads to be nice by default
-        await _run_cmd_capture(["sublist3r", "-d", domain, "-t", str(threads), "-o", out_path], timeout=timeout)
+    cache = stage_cache("sublist3r")
+    key = (domain, tuple(SUBLIST3R_ENGINES))
+    cached = cache.get(key)
+    if cached is not MISSING:
+        return set(cached)
+    if inprocess:
         subs: Set[str] = set()
-        if os.path.exists(out_path):
-            with open(out_path, "r", encoding="utf-8", errors="ignore") as f:
-                for line in f:
-                    d = _clean_domain(line)
-                    if d and d.endswith(domain):
-                        subs.add(d)
-        return subs
-    finally:
-        try:
-            os.remove(out_path)
-        except OSError:
-            pass
+
+        def collect(engine: str, names: List[str]) -> None:
+            fresh = []
+            for name in names:
+                d = _clean_domain(name)
+                if d and d.endswith(domain) and d not in subs:
+                    subs.add(d)
+                    fresh.append(d)
+            if fresh and on_names is not None:
+                on_names(fresh)
+
+        _, complete = await sublist3r_engines.run_engines(domain, SUBLIST3R_ENGINES or list(sublist3r_engines.ENGINES), timeout, collect)
+    else:
+        # Verbose mode prints "<Engine>: <subdomain>" as each engine finds it
+        cmd = ["sublist3r", "-d", domain, "-t", str(threads), "-v", "-n"]
+        if SUBLIST3R_ENGINES:
+            cmd += ["-e", ",".join(SUBLIST3R_ENGINES)]
+        subs, complete = await _stream_subdomains(cmd, domain, timeout, on_names, extract=lambda line: line.split()[-1:])
+    if subs and complete:
+        cache.set(key, sorted(subs))
+    return subs
 
 
 async def _crtsh_enum(domain: str, timeout_secs: int = 20, proxies: Optional[str] = None) -> Set[str]:
+    cache = stage_cache("crtsh")
+    cached = cache.get(domain)
+    if cached is not MISSING:
+        return set(cached)
     url = f"https://crt.sh/?q=%25.{domain}&output=json"
-    subs: Set[str] = set()
     timeout = httpx.Timeout(timeout_secs, connect=min(10.0, timeout_secs))
-    headers = {"User-Agent": "WebReconVisualizer/0.1"}
+    # Large domains return hundreds of MB of certificate rows; parse them as they
+    # arrive and keep only the deduplicated names
+    parser = CrtshStreamParser(domain)
     try:
-        transport = httpx.AsyncHTTPTransport(proxy=proxies) if proxies else None
-        async with httpx.AsyncClient(timeout=timeout, headers=headers, transport=transport) as client:
-            r = await client.get(url)
-            if r.status_code != 200:
-                return set()
-            # crt.sh may return multiple JSON objects concatenated; handle both array and ndjson-ish
-            text = r.text.strip()
-            data: List[dict] = []
-            try:
-                data = r.json()
-                if isinstance(data, dict):
-                    data = [data]
-            except Exception:
-                # Attempt to split lines and parse individually
-                for line in text.splitlines():
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        obj = json.loads(line)
-                        data.append(obj)
-                    except Exception:
-                        continue
-            for obj in data:
-                name_value = obj.get("name_value") or obj.get("common_name") or ""
-                for part in re.split(r"\s+", str(name_value)):
-                    d = _clean_domain(part)
-                    if d and d.endswith(domain):
-                        subs.add(d)
+        async with http_client("crtsh", proxies) as client:
+            async with client.stream("GET", url, timeout=timeout) as r:
+                if r.status_code != 200:
+                    return set()
+                await parse_crtsh_stream(r.aiter_bytes(), domain, parser)
     except Exception:
-        return set()
-    return subs
+        # Keep what was parsed before the connection failed, but don't cache a partial answer
+        return parser.close()
+    cache.set(domain, sorted(parser.names))
+    return parser.names
 
 
 def tooling_status() -> dict:
     import shutil
     return {
         "amass": bool(shutil.which("amass")),
-        "sublist3r": bool(shutil.which("sublist3r")),
+        "sublist3r": bool(shutil.which("sublist3r")) or (SUBLIST3R_MODE != "cli" and sublist3r_engines.available()),
         "subfinder": bool(shutil.which("subfinder")),
     }
 
 
-async def _subfinder_enum(domain: str, timeout: int = 240, extra_args: Optional[List[str]] = None) -> Set[str]:
+async def _subfinder_enum(domain: str, timeout: int = 240, extra_args: Optional[List[str]] = None, on_names: Optional[Callable[[List[str]], None]] = None) -> Set[str]:
     import shutil
     if not shutil.which("subfinder"):
         return set()
+    cache = stage_cache("subfinder")
+    key = (domain, tuple(extra_args or ()))
+    cached = cache.get(key)
+    if cached is not MISSING:
+        return set(cached)
     cmd = ["subfinder", "-d", domain, "-silent"]
     if extra_args:
         cmd.extend(extra_args)
-    out = await _run_cmd_capture(cmd, timeout=timeout)
-    subs = set()
-    for line in out.splitlines():
-        d = _clean_domain(line)
-        if d.endswith(domain):
-            subs.add(d)
+    subs, complete = await _stream_subdomains(cmd, domain, timeout, on_names)
+    if subs and complete:
+        cache.set(key, sorted(subs))
     return subs
 
 
-async def enumerate_subdomains(domain: str, options: Optional[Dict[str, Any]] = None):  # returns (set, by_source)
-    
+async def enumerate_subdomains(domain: str, options: Optional[Dict[str, Any]] = None, on_source: Optional[Callable[[str, List[str]], None]] = None, on_partial: Optional[Callable[[str, List[str]], None]] = None):  # returns (set, by_source)
+    """Run the enabled enumerators concurrently.
+
+    ``on_source(source, subdomains)`` is called as each tool finishes, so callers
+    can use fast sources (crt.sh) without waiting for slow ones (amass).
+    ``on_partial(source, new_subdomains)`` is called while amass, subfinder and
+    sublist3r are still running, with each batch of names they find.
+    """
     opts = options or {}
     providers = opts.get("providers", {"amass": True, "sublist3r": True, "crtsh": True, "subfinder": False, "securitytrails": False})
     mode = opts.get("mode", "passive")
@@ -157,32 +259,40 @@ async def enumerate_subdomains(domain: str, options: Optional[Dict[str, Any]] =
     except Exception:
         proxies = None
 
+    def partial(source: str) -> Optional[Callable[[List[str]], None]]:
+        if on_partial is None:
+            return None
+        return lambda names: on_partial(source, [n for n in names if n != domain])
+
+    async def run(source: str, coro: Awaitable[Set[str]]) -> Set[str]:
+        subs = set(await coro)
+        subs.discard(domain)
+        if on_source is not None:
+            on_source(source, sorted(subs))
+        return subs
+
+    sources: List[str] = []
     tasks = []
     if providers.get("amass"):
-        tasks.append(_amass_enum(domain, mode=mode, timeout=int(timeouts.get("amass", 240))))
+        sources.append("amass")
+        tasks.append(run("amass", _amass_enum(domain, mode=mode, timeout=int(timeouts.get("amass", 240)), on_names=partial("amass"))))
     if providers.get("sublist3r"):
-        tasks.append(_sublist3r_enum(domain, timeout=int(timeouts.get("sublist3r", 360))))
+        sources.append("sublist3r")
+        tasks.append(run("sublist3r", _sublist3r_enum(domain, timeout=int(timeouts.get("sublist3r", 360)), on_names=partial("sublist3r"))))
     if providers.get("crtsh"):
-        tasks.append(_crtsh_enum(domain, timeout_secs=int(timeouts.get("crtsh", 20)), proxies=proxies))
+        sources.append("crtsh")
+        tasks.append(run("crtsh", _crtsh_enum(domain, timeout_secs=int(timeouts.get("crtsh", 20)), proxies=proxies)))
     if providers.get("subfinder", False):
-        tasks.append(_subfinder_enum(domain, timeout=int(timeouts.get("subfinder", 240))))
-    if providers.get("securitytrails", False):
-        # Will be executed in main for API key; keep slot for alignment
-        tasks.append(asyncio.sleep(0, result=set()))
+        sources.append("subfinder")
+        tasks.append(run("subfinder", _subfinder_enum(domain, timeout=int(timeouts.get("subfinder", 240)), on_names=partial("subfinder"))))
+    # securitytrails is executed in main for the API key; nothing to schedule here
 
     results_list = await asyncio.gather(*tasks) if tasks else []
     results: Set[str] = set()
     by_source: Dict[str, Set[str]] = {}
-
-    idx = 0
-    if providers.get("amass"):
-        by_source["amass"] = set(results_list[idx]); results.update(results_list[idx]); idx += 1
-    if providers.get("sublist3r"):
-        by_source["sublist3r"] = set(results_list[idx]); results.update(results_list[idx]); idx += 1
-    if providers.get("crtsh"):
-        by_source["crtsh"] = set(results_list[idx]); results.update(results_list[idx]); idx += 1
-    if providers.get("subfinder", False):
-        by_source["subfinder"] = set(results_list[idx]); results.update(results_list[idx]); idx += 1
+    for source, subs in zip(sources, results_list):
+        by_source[source] = subs
+        results.update(subs)
 
     results.discard(domain)
     return results, {k: sorted(v) for k, v in by_source.items()}
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Sublist3r engine name (as in its -e option) -> class in the sublist3r module
+ENGINES: Dict[str, str] = {
+    "baidu": "BaiduEnum",
+    "yahoo": "YahooEnum",
+    "google": "GoogleEnum",
+    "bing": "BingEnum",
+    "ask": "AskEnum",
+    "netcraft": "NetcraftEnum",
+    "dnsdumpster": "DNSdumpster",
+    "virustotal": "Virustotal",
+    "threatcrowd": "ThreatCrowd",
+    "ssl": "CrtSearch",
+    "passivedns": "PassiveDNS",
+}
+# Engines run in their own pool so slow ones (Google sleeps between pages) don't starve asyncio.to_thread users
+SUBLIST3R_MAX_THREADS = int(os.getenv("SUBLIST3R_MAX_THREADS", "16"))
+_POLL_INTERVAL = 0.5
+
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def available() -> bool:
+    return importlib.util.find_spec("sublist3r") is not None
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=SUBLIST3R_MAX_THREADS, thread_name_prefix="sublist3r")
+    return _EXECUTOR
+
+
+class _Stopped(Exception):
+    pass
+
+
+class _EngineStats:
+    def __init__(self) -> None:
+        self.runs = 0
+        self.seconds = 0.0
+        self.last_seconds: Optional[float] = None
+        self.found = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def record(self, seconds: float, found: int, status: str) -> None:
+        self.runs += 1
+        self.seconds += seconds
+        self.last_seconds = seconds
+        self.found += found
+        if status == "timeout":
+            self.timeouts += 1
+        elif status == "error":
+            self.errors += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "runs": self.runs,
+            "avg_seconds": round(self.seconds / self.runs, 2) if self.runs else None,
+            "last_seconds": round(self.last_seconds, 2) if self.last_seconds is not None else None,
+            "avg_found": round(self.found / self.runs, 1) if self.runs else None,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
+
+
+_STATS: Dict[str, _EngineStats] = {}
+
+
+def stats() -> Dict[str, Dict[str, object]]:
+    """Per-engine run time and yield, to spot engines worth disabling (SUBLIST3R_ENGINES)."""
+    return {name: s.snapshot() for name, s in sorted(_STATS.items())}
+
+
+class _EngineRun:
+    """One sublist3r engine driven in a worker thread; ``engine.subdomains`` grows as it pages."""
+
+    def __init__(self, name: str, domain: str, stop: threading.Event):
+        self.name = name
+        self.domain = domain
+        self.stop = stop
+        self.engine = None
+        self.error: Optional[str] = None
+        self.started = time.monotonic()
+        self.finished: Optional[float] = None
+        self.reported = 0
+
+    def run(self) -> None:
+        import sublist3r
+
+        try:
+            engine = getattr(sublist3r, ENGINES[self.name])("http://" + self.domain, [], q=None, silent=True, verbose=False)
+            request = engine.session.request
+
+            def guarded(*args, **kwargs):
+                # Engines swallow request errors and wind down, which is how a timeout stops them
+                if self.stop.is_set():
+                    raise _Stopped()
+                return request(*args, **kwargs)
+
+            engine.session.request = guarded
+            self.engine = engine
+            engine.enumerate()
+        except Exception as e:
+            if not self.stop.is_set():
+                self.error = str(e) or type(e).__name__
+        finally:
+            self.finished = time.monotonic()
+
+    def take_new(self) -> List[str]:
+        subs = list(self.engine.subdomains) if self.engine is not None else []
+        new, self.reported = subs[self.reported:], len(subs)
+        return new
+
+    def found(self) -> int:
+        return len(self.engine.subdomains) if self.engine is not None else 0
+
+
+async def run_engines(domain: str, engines: List[str], timeout: float, on_names: Callable[[str, List[str]], None]) -> Tuple[Dict[str, Dict[str, object]], bool]:
+    """Run sublist3r's engines for ``domain`` concurrently in threads.
+
+    ``on_names(engine, names)`` receives names as each engine finds them
+    (polled every half second). At ``timeout`` the engines still running are
+    told to stop. Returns per-engine timing and whether all finished in time.
+    """
+    loop = asyncio.get_running_loop()
+    stop = threading.Event()
+    runs = [_EngineRun(name, domain, stop) for name in engines if name in ENGINES]
+    futures = [loop.run_in_executor(_executor(), r.run) for r in runs]
+    deadline = loop.time() + timeout
+    complete = True
+    try:
+        pending = set(futures)
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                complete = False
+                break
+            _, pending = await asyncio.wait(pending, timeout=min(_POLL_INTERVAL, remaining))
+            for r in runs:
+                new = r.take_new()
+                if new:
+                    on_names(r.name, new)
+    finally:
+        stop.set()
+    for r in runs:
+        new = r.take_new()
+        if new:
+            on_names(r.name, new)
+    now = time.monotonic()
+    timings: Dict[str, Dict[str, object]] = {}
+    for r in runs:
+        status = "error" if r.error else ("ok" if r.finished is not None else "timeout")
+        seconds = (r.finished or now) - r.started
+        _STATS.setdefault(r.name, _EngineStats()).record(seconds, r.found(), status)
+        timings[r.name] = {"seconds": round(seconds, 2), "found": r.found(), "status": status}
+        if r.error:
+            timings[r.name]["error"] = r.error
+    return timings, complete
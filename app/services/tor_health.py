@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+from .http_client import http_client
+
+TOR_SOCKS_URL = os.getenv("TOR_SOCKS_URL")
+# Seconds between SOCKS reachability probes, and between exit IP lookups through Tor
+TOR_HEALTH_INTERVAL = float(os.getenv("TOR_HEALTH_INTERVAL", "30"))
+TOR_EXIT_CHECK_INTERVAL = float(os.getenv("TOR_EXIT_CHECK_INTERVAL", "300"))
+TOR_CONNECT_TIMEOUT = float(os.getenv("TOR_CONNECT_TIMEOUT", "2"))
+
+# In order of preference
+_CANDIDATES: List[Optional[str]] = [
+    TOR_SOCKS_URL,
+    "socks5://tor:9050",           # docker-compose service name
+    "socks5://tor:9150",           # alternate Tor port (Tor Browser style)
+    "socks5://127.0.0.1:9050",     # local default
+    "socks5://127.0.0.1:9150",     # local alternate
+]
+
+
+async def _reachable(url: str, timeout: float) -> bool:
+    u = urlparse(url)
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(u.hostname or "127.0.0.1", u.port or 9050), timeout=timeout)
+    except (OSError, asyncio.TimeoutError, ValueError):
+        return False
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+    return True
+
+
+class TorHealthMonitor:
+    """Background Tor probe; request handlers read the cached state instead of probing.
+
+    All candidate SOCKS endpoints are tried concurrently every ``interval``
+    seconds and the most preferred reachable one is kept. The exit IP/country
+    is looked up through it every ``exit_interval`` seconds, or right away
+    when the endpoint changes.
+    """
+
+    def __init__(self, candidates: List[Optional[str]] = _CANDIDATES, interval: float = TOR_HEALTH_INTERVAL, exit_interval: float = TOR_EXIT_CHECK_INTERVAL, connect_timeout: float = TOR_CONNECT_TIMEOUT):
+        self.candidates = list(dict.fromkeys(c for c in candidates if c))
+        self.interval = interval
+        self.exit_interval = exit_interval
+        self.connect_timeout = connect_timeout
+        self.socks_url: Optional[str] = None
+        self.exit_ip: Optional[str] = None
+        self.exit_country: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.exit_checked_at: Optional[float] = None
+        self.probe_seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def available(self) -> bool:
+        return self.socks_url is not None
+
+    async def probe(self) -> None:
+        """Re-check the SOCKS endpoints now (and the exit IP if it is stale)."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            t0 = time.monotonic()
+            ok = await asyncio.gather(*(_reachable(url, self.connect_timeout) for url in self.candidates))
+            chosen = next((url for url, up in zip(self.candidates, ok) if up), None)
+            self.probe_seconds = time.monotonic() - t0
+            self.checked_at = time.time()
+            changed = chosen != self.socks_url
+            self.socks_url = chosen
+            if chosen is None:
+                self.exit_ip = self.exit_country = None
+                self.exit_checked_at = None
+            elif changed or self.exit_checked_at is None or time.time() - self.exit_checked_at >= self.exit_interval:
+                await self._check_exit(chosen)
+
+    async def _check_exit(self, socks: str) -> None:
+        try:
+            async with http_client("tor_check", socks) as client:
+                r = await client.get("https://ipinfo.io/json")
+            r.raise_for_status()
+            j = r.json()
+        except Exception:
+            # SOCKS port open but no circuit (yet); keep the endpoint, retry the lookup next round
+            self.exit_ip = self.exit_country = None
+            self.exit_checked_at = None
+            return
+        self.exit_ip, self.exit_country = j.get("ip"), j.get("country")
+        self.exit_checked_at = time.time()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.probe()
+            except Exception:
+                pass
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start probing in the background; the first probe runs right away without holding up startup."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def snapshot(self) -> Dict[str, object]:
+        now = time.time()
+        return {
+            "available": self.available,
+            "socks_url": self.socks_url,
+            "exit_ip": self.exit_ip,
+            "exit_country": self.exit_country,
+            "checked_at": self.checked_at,
+            "age": round(now - self.checked_at, 1) if self.checked_at else None,
+            "exit_age": round(now - self.exit_checked_at, 1) if self.exit_checked_at else None,
+            "probe_seconds": round(self.probe_seconds, 3) if self.probe_seconds is not None else None,
+        }
+
+
+TOR_HEALTH = TorHealthMonitor()
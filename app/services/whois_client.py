@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Port-43 client settings
+WHOIS_TIMEOUT = float(os.getenv("WHOIS_TIMEOUT", "10"))
+# Queries in flight per WHOIS server; registries throttle or ban bursts from one address
+WHOIS_PER_SERVER = int(os.getenv("WHOIS_PER_SERVER", "2"))
+IANA_WHOIS = "whois.iana.org"
+_MAX_RESPONSE = 1 << 20
+_MAX_REFERRALS = 2
+
+# Some servers need a query prefix to return a single exact match
+_QUERY_FORMATS: Dict[str, str] = {
+    "whois.verisign-grs.com": "domain {}",
+    "whois.denic.de": "-T dn,ace {}",
+    "whois.jprs.jp": "{}/e",
+}
+
+# Second-level labels that are registry suffixes themselves (no public suffix list dependency)
+_MULTI_LABEL_SUFFIXES = {
+    "co", "com", "net", "org", "gov", "edu", "ac", "or", "ne", "go", "gob", "mil", "nic", "ltd", "plc", "sch", "nom",
+}
+
+_NO_MATCH = re.compile(r"no match for|not found|no data found|no entries found|status:\s*free|no object found", re.IGNORECASE)
+_THROTTLED = re.compile(r"limit exceeded|query rate|too many (?:requests|queries)|try again later", re.IGNORECASE)
+
+# Lower-cased response keys -> result field; the first registry spelling found wins
+_SINGLE_FIELDS: Dict[str, str] = {
+    "domain name": "domain_name", "domain": "domain_name",
+    "registrar": "registrar", "sponsoring registrar": "registrar", "registrar name": "registrar",
+    "registrar whois server": "whois_server",
+    "registrar url": "registrar_url",
+    "updated date": "updated_date", "last updated": "updated_date", "changed": "updated_date", "last-update": "updated_date",
+    "creation date": "creation_date", "created": "creation_date", "registered": "creation_date", "registration time": "creation_date",
+    "registry expiry date": "expiry_date", "registrar registration expiration date": "expiry_date", "expiry date": "expiry_date",
+    "expires": "expiry_date", "expiration date": "expiry_date", "paid-till": "expiry_date", "expiration time": "expiry_date",
+    "registrar iana id": "registrar_iana_id",
+}
+_LIST_FIELDS: Dict[str, str] = {
+    "domain status": "status", "status": "status", "state": "status",
+    "name server": "name_servers", "nserver": "name_servers", "name servers": "name_servers", "host name": "name_servers",
+}
+# Keys that point at the next WHOIS server
+_REFERRAL_KEYS = ("refer", "whois", "registrar whois server", "referralserver")
+
+
+def parse_whois(text: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Fields from a WHOIS response in a single scan, plus the referral server if any.
+
+    Each "key: value" line is split once and its key looked up in the field tables,
+    instead of running one regex per field over all lines.
+    """
+    out: Dict[str, Any] = {}
+    lists: Dict[str, List[str]] = {}
+    referral: Dict[str, str] = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition(":")
+        if not sep or len(key) > 60:
+            continue
+        key, value = key.strip().lower(), value.strip()
+        if not value:
+            continue
+        field = _SINGLE_FIELDS.get(key)
+        if field is not None:
+            out.setdefault(field, value)
+        else:
+            field = _LIST_FIELDS.get(key)
+            if field is not None:
+                lists.setdefault(field, []).append(value)
+        if key in _REFERRAL_KEYS:
+            referral.setdefault(key, value)
+    if "status" in lists:
+        out["status"] = lists["status"]
+    if "name_servers" in lists:
+        # "ns1.example.com 192.0.2.1" style lines carry glue after the name
+        out["name_servers"] = sorted({ns.split()[0].strip(".").upper() for ns in lists["name_servers"]})
+    server = next((referral[k] for k in _REFERRAL_KEYS if k in referral), None)
+    return out, _server_host(server) if server else None
+
+
+def no_match(text: str) -> bool:
+    return bool(_NO_MATCH.search(text))
+
+
+def _server_host(value: str) -> Optional[str]:
+    # "whois://whois.arin.net", "rwhois://host:4321", "whois.example.com"
+    value = value.strip().split()[0]
+    value = re.sub(r"^[a-z]+://", "", value, flags=re.IGNORECASE).split("/")[0].split(":")[0]
+    return value.lower() if "." in value and " " not in value else None
+
+
+def registrable_domain(domain: str) -> str:
+    """Best-effort registrable domain (example.co.uk for www.example.co.uk) without a public suffix list."""
+    labels = [l for l in domain.strip().strip(".").lower().split(".") if l]
+    if len(labels) <= 2:
+        return ".".join(labels)
+    if len(labels[-1]) == 2 and labels[-2] in _MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+class WhoisClient:
+    """Asyncio WHOIS over port 43 with IANA bootstrap, referral following and per-server limits."""
+
+    def __init__(self, timeout: float = WHOIS_TIMEOUT, per_server: int = WHOIS_PER_SERVER):
+        self.timeout = timeout
+        self.per_server = max(1, per_server)
+        self._tld_servers: Dict[str, Optional[str]] = {}
+        self._tld_pending: Dict[str, "asyncio.Future[str]"] = {}
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self.queries = 0
+        self.throttled = 0
+        self.errors = 0
+
+    def _limit(self, server: str) -> asyncio.Semaphore:
+        sem = self._limits.get(server)
+        if sem is None:
+            sem = self._limits[server] = asyncio.Semaphore(self.per_server)
+        return sem
+
+    async def query(self, server: str, q: str) -> str:
+        """Raw response from ``server``; raises OSError / asyncio.TimeoutError."""
+        async with self._limit(server):
+            self.queries += 1
+            try:
+                return await asyncio.wait_for(self._query(server, q), timeout=self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                self.errors += 1
+                raise
+
+    async def _query(self, server: str, q: str) -> str:
+        reader, writer = await asyncio.open_connection(server, 43)
+        try:
+            writer.write((_QUERY_FORMATS.get(server, "{}").format(q) + "\r\n").encode("idna" if not q.isascii() else "ascii", errors="ignore"))
+            await writer.drain()
+            data = await reader.read(_MAX_RESPONSE)
+            chunks = [data]
+            size = len(data)
+            while data and size < _MAX_RESPONSE:
+                data = await reader.read(_MAX_RESPONSE - size)
+                chunks.append(data)
+                size += len(data)
+        finally:
+            writer.close()
+        return b"".join(chunks).decode("utf-8", errors="replace")
+
+    async def tld_server(self, tld: str) -> Optional[str]:
+        """Registry WHOIS server for a TLD, learned from IANA once per process."""
+        if tld in self._tld_servers:
+            return self._tld_servers[tld]
+        # A batch starts with many domains under the same new TLD; ask IANA once
+        task = self._tld_pending.get(tld)
+        if task is None:
+            task = self._tld_pending[tld] = asyncio.ensure_future(self.query(IANA_WHOIS, tld))
+        try:
+            text = await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._tld_pending.pop(tld, None)
+        _, server = parse_whois(text)
+        self._tld_servers[tld] = server
+        return server
+
+    async def lookup(self, domain: str) -> Dict[str, Any]:
+        """Registry answer merged with the registrar's (via referral); registry fields win."""
+        server = await self.tld_server(domain.rsplit(".", 1)[-1])
+        if not server:
+            return {"error": f"WHOIS: no server known for {domain}"}
+        result: Dict[str, Any] = {}
+        raw: List[str] = []
+        servers: List[str] = []
+        for _ in range(1 + _MAX_REFERRALS):
+            try:
+                text = await self.query(server, domain)
+            except (OSError, asyncio.TimeoutError) as e:
+                if not servers:
+                    raise
+                # Registrar servers are flaky; keep the registry answer
+                result.setdefault("referral_error", f"{server}: {e or type(e).__name__}")
+                break
+            servers.append(server)
+            if _THROTTLED.search(text[:2000]) and len(text) < 2000:
+                self.throttled += 1
+                if not servers[:-1]:
+                    return {"error": f"WHOIS: rate limited by {server}"}
+                break
+            fields, referral = parse_whois(text)
+            if not fields.get("domain_name") and _NO_MATCH.search(text):
+                if len(servers) == 1:
+                    return {"error": f"WHOIS: no match for {domain}"}
+                break
+            for k, v in fields.items():
+                result.setdefault(k, v)
+            raw.append(text.replace("\r\n", "\n").replace("\r", "\n").strip())
+            if not referral or referral in servers:
+                break
+            server = referral
+        trimmed = "\n\n".join(raw)
+        if len(trimmed) > 6000:
+            trimmed = trimmed[:6000] + "\n... (truncated)"
+        result["raw_text"] = trimmed
+        result["whois_servers"] = servers
+        return result
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "queries": self.queries,
+            "errors": self.errors,
+            "throttled": self.throttled,
+            "tld_servers": len(self._tld_servers),
+            "per_server": self.per_server,
+        }
+
+
+WHOIS_CLIENT = WhoisClient()
@@ -1,11 +1,21 @@
 from __future__ import annotations
 
+import asyncio
+import os
 from datetime import datetime
-from typing import Any, Dict, List
-import re
+from typing import Any, Dict
 
 import whois
 
+from .singleflight import SingleFlight
+from .stage_cache import MISSING, stage_cache
+from .whois_client import WHOIS_CLIENT, no_match, parse_whois, registrable_domain
+
+# "native": asyncio port-43 client with referrals; "library": python-whois in a thread
+WHOIS_MODE = os.getenv("WHOIS_MODE", "native").lower()
+
+_INFLIGHT: "SingleFlight[Dict[str, Any]]" = SingleFlight()
+
 
 def _to_jsonable(obj: Any):
     # Convert whois library output into JSON-serializable
@@ -26,57 +36,63 @@ def _to_jsonable(obj: Any):
 
 
 def _parse_whois_text(text: str, domain: str) -> Dict[str, Any]:
-    norm = text.replace("\r\n", "\n").replace("\r", "\n")
-    lines = [ln.rstrip() for ln in norm.split("\n")]
-    out: Dict[str, Any] = {}
-    # capture key fields
-    def first_match(pattern: str) -> str | None:
-        rx = re.compile(pattern, re.IGNORECASE)
-        for ln in lines:
-            m = rx.search(ln)
-            if m:
-                return (m.group(1) or '').strip()
-        return None
-
-    def all_matches(pattern: str) -> List[str]:
-        rx = re.compile(pattern, re.IGNORECASE)
-        vals: List[str] = []
-        for ln in lines:
-            m = rx.search(ln)
-            if m:
-                v = (m.group(1) or '').strip()
-                if v:
-                    vals.append(v)
-        return vals
-
-    out['domain_name'] = first_match(r"^\s*Domain Name:\s*(.+)$")
-    out['registrar'] = first_match(r"^\s*Registrar:\s*(.+)$")
-    out['whois_server'] = first_match(r"^\s*Registrar WHOIS Server:\s*(.+)$")
-    out['registrar_url'] = first_match(r"^\s*Registrar URL:\s*(.+)$")
-    out['updated_date'] = first_match(r"^\s*Updated Date:\s*(.+)$")
-    out['creation_date'] = first_match(r"^\s*Creation Date:\s*(.+)$")
-    out['expiry_date'] = first_match(r"^\s*Registry Expiry Date:\s*(.+)$")
-    out['registrar_iana_id'] = first_match(r"^\s*Registrar IANA ID:\s*(.+)$")
-    statuses = all_matches(r"^\s*Domain Status:\s*(.+)$")
-    if statuses:
-        out['status'] = statuses
-    nss = all_matches(r"^\s*Name Server:\s*(.+)$")
-    if nss:
-        out['name_servers'] = sorted({ns.strip('.').upper() for ns in nss})
-
+    out, _ = parse_whois(text)
     # Detect 'No match' case
-    if not out.get('domain_name') and any('no match for' in ln.lower() for ln in lines):
+    if not out.get('domain_name') and no_match(text):
         return {'error': f'WHOIS: no match for {domain}'}
 
     # Always include a trimmed raw_text for reference
-    trimmed = '\n'.join(lines)
+    trimmed = text.replace("\r\n", "\n").replace("\r", "\n")
     if len(trimmed) > 6000:
         trimmed = trimmed[:6000] + "\n... (truncated)"
     out['raw_text'] = trimmed
     return out
 
 
+async def whois_lookup_async(domain: str) -> Dict[str, Any]:
+    """WHOIS for the registrable domain of ``domain``, cached per registrable domain.
+
+    Uses the asyncio port-43 client (WHOIS_MODE=native, default), falling back
+    to python-whois in a thread when the registry can't be reached. Concurrent
+    lookups for the same domain share one query.
+    """
+    key = registrable_domain(domain)
+    cache = stage_cache("whois")
+    cached = cache.get(key)
+    if cached is not MISSING:
+        return cached
+    return await _INFLIGHT.run(key, lambda: _lookup_and_cache(key))
+
+
+async def _lookup_and_cache(key: str) -> Dict[str, Any]:
+    result = await _lookup_uncached_async(key)
+    if not result.get("error"):
+        stage_cache("whois").set(key, result)
+    return result
+
+
+async def _lookup_uncached_async(domain: str) -> Dict[str, Any]:
+    if WHOIS_MODE == "native":
+        try:
+            return await WHOIS_CLIENT.lookup(domain)
+        except (OSError, asyncio.TimeoutError):
+            pass
+    return await asyncio.to_thread(_whois_lookup_uncached, domain)
+
+
 def whois_lookup(domain: str) -> Dict[str, Any]:
+    cache = stage_cache("whois")
+    key = registrable_domain(domain)
+    cached = cache.get(key)
+    if cached is not MISSING:
+        return cached
+    result = _whois_lookup_uncached(key)
+    if not result.get("error"):
+        cache.set(key, result)
+    return result
+
+
+def _whois_lookup_uncached(domain: str) -> Dict[str, Any]:
     try:
         data = whois.whois(domain)
         # whois module sometimes returns a dict-like object
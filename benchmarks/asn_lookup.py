@@ -0,0 +1,66 @@
+"""Time the offline ASN table: compile, startup (mmap load) and lookup throughput.
+
+A synthetic iptoasn-style TSV with ``--ranges`` contiguous IPv4 ranges is
+generated in a temporary directory, compiled once, then queried with random
+addresses one at a time and through ``lookup_many``.
+
+    python -m benchmarks.asn_lookup --ranges 500000 --queries 10000 100000
+"""
+from __future__ import annotations
+
+import argparse
+import ipaddress
+import os
+import random
+import tempfile
+import time
+
+from app.services.asn_table import AsnTable
+
+
+def _write_tsv(path: str, ranges: int) -> None:
+    rnd = random.Random(1)
+    start = int(ipaddress.IPv4Address("1.0.0.0"))
+    with open(path, "w", encoding="utf-8") as fh:
+        for i in range(ranges):
+            size = 1 << rnd.randint(8, 12)
+            asn = rnd.randint(1, 60000)
+            fh.write(f"{ipaddress.IPv4Address(start)}\t{ipaddress.IPv4Address(start + size - 1)}\t{asn}\tUS\tAS{asn}-ORG\n")
+            start += size
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ranges", type=int, default=500_000)
+    ap.add_argument("--queries", type=int, nargs="+", default=[10_000, 100_000])
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        tsv = os.path.join(d, "ip2asn-v4.tsv")
+        _write_tsv(tsv, args.ranges)
+        t0 = time.perf_counter()
+        AsnTable.load(tsv).close()
+        print(f"compile {args.ranges} ranges: {time.perf_counter() - t0:.2f}s ({os.path.getsize(tsv + '.bin') / 1e6:.1f} MB)")
+        t0 = time.perf_counter()
+        table = AsnTable.load(tsv)
+        print(f"startup (mmap compiled table): {(time.perf_counter() - t0) * 1000:.1f} ms")
+        try:
+            last = int(table.v4_end[len(table.v4_end) - 1])
+            rnd = random.Random(2)
+            print(f"{'queries':>8} {'mode':>12} {'seconds':>9} {'lookups/s':>11} {'hits':>8}")
+            for n in args.queries:
+                ips = [str(ipaddress.IPv4Address(rnd.randint(int(ipaddress.IPv4Address('1.0.0.0')), last))) for _ in range(n)]
+                t0 = time.perf_counter()
+                hits = sum(1 for ip in ips if table.lookup(ip) is not None)
+                dt = time.perf_counter() - t0
+                print(f"{n:>8} {'lookup':>12} {dt:>9.2f} {n / dt:>11.0f} {hits:>8}")
+                t0 = time.perf_counter()
+                hits = len(table.lookup_many(ips))
+                dt = time.perf_counter() - t0
+                print(f"{n:>8} {'lookup_many':>12} {dt:>9.2f} {n / dt:>11.0f} {hits:>8}")
+        finally:
+            table.close()
+
+
+if __name__ == "__main__":
+    main()
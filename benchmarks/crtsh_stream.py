@@ -0,0 +1,108 @@
+"""Peak RSS and time for crt.sh ingestion: full ``json.loads`` vs. the streaming parser.
+
+A synthetic crt.sh dump with ``--rows`` certificate rows (names drawn from
+``--names`` distinct subdomains) is written to a temporary file. Each mode
+runs in a fresh interpreter so ``ru_maxrss`` is its own peak:
+
+- load:        read the body, ``json.loads`` it, then collect names (the old path)
+- stream-file: ``parse_crtsh_file`` over the dump
+- stream-http: the body served in 64 KiB chunks through an httpx mock transport
+
+    python -m benchmarks.crtsh_stream --rows 200000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+_DOMAIN = "example.com"
+
+
+def _write_dump(path: str, rows: int, names: int) -> None:
+    rnd = random.Random(1)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write("[")
+        for i in range(rows):
+            sans = "\n".join(f"h{rnd.randrange(names)}.{_DOMAIN}" for _ in range(rnd.randint(1, 4)))
+            row = {
+                "issuer_ca_id": 183267, "issuer_name": "C=US, O=Let's Encrypt, CN=R3",
+                "common_name": f"h{rnd.randrange(names)}.{_DOMAIN}", "name_value": sans,
+                "id": 9000000000 + i, "entry_timestamp": "2024-01-01T00:00:00.000",
+                "not_before": "2024-01-01T00:00:00", "not_after": "2024-04-01T00:00:00",
+                "serial_number": f"{rnd.getrandbits(128):032x}", "result_count": 2,
+            }
+            fh.write(("," if i else "") + json.dumps(row))
+        fh.write("]")
+
+
+def _run_mode(mode: str, path: str) -> None:
+    from app.services.crtsh_stream import parse_crtsh_file, parse_crtsh_stream
+
+    t0 = time.perf_counter()
+    if mode == "load":
+        with open(path, encoding="utf-8") as fh:
+            data = json.loads(fh.read())
+        names = set()
+        for obj in data:
+            for part in str(obj.get("name_value") or "").split():
+                d = part.strip().lower().lstrip("*.")
+                if d.endswith(_DOMAIN):
+                    names.add(d)
+    elif mode == "stream-file":
+        names = parse_crtsh_file(path, _DOMAIN)
+    else:
+        import httpx
+
+        async def body():
+            with open(path, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 16), b""):
+                    yield chunk
+
+        async def fetch():
+            transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body()))
+            async with httpx.AsyncClient(transport=transport) as client:
+                async with client.stream("GET", "https://crt.sh/") as r:
+                    return await parse_crtsh_stream(r.aiter_bytes(), _DOMAIN)
+
+        names = asyncio.run(fetch())
+    dt = time.perf_counter() - t0
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+    print(json.dumps({"seconds": dt, "rss_mb": rss, "names": len(names)}))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, nargs="+", default=[200_000, 1_000_000])
+    ap.add_argument("--names", type=int, default=50_000, help="distinct subdomains")
+    ap.add_argument("--mode", help=argparse.SUPPRESS)
+    ap.add_argument("--path", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.mode:
+        _run_mode(args.mode, args.path)
+        return
+
+    print(f"{'rows':>9} {'MB':>7} {'mode':>12} {'seconds':>8} {'peak RSS MB':>12} {'names':>7}")
+    with tempfile.TemporaryDirectory() as d:
+        for rows in args.rows:
+            path = os.path.join(d, f"crtsh-{rows}.json")
+            _write_dump(path, rows, args.names)
+            size = os.path.getsize(path) / 1e6
+            for mode in ("load", "stream-file", "stream-http"):
+                out = subprocess.run([sys.executable, "-m", "benchmarks.crtsh_stream", "--mode", mode, "--path", path],
+                                     capture_output=True, text=True, check=True).stdout
+                r = json.loads(out)
+                print(f"{rows:>9} {size:>7.0f} {mode:>12} {r['seconds']:>8.2f} {r['rss_mb']:>12.0f} {r['names']:>7}")
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
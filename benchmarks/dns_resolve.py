@@ -0,0 +1,106 @@
+"""Benchmark the async DNS engine against a local stub DNS server.
+
+The stub answers every A query with a synthetic address and every other type
+with an empty NOERROR answer, after an optional artificial delay to mimic
+network round trips.
+
+    python -m benchmarks.dns_resolve --sizes 100 1000 10000 --delay 0.005
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import time
+import zlib
+
+import dns.message
+import dns.rdataclass
+import dns.rdatatype
+import dns.rrset
+
+from app.services.dns_utils import DEFAULT_RECORD_TYPES, resolve_records, resolve_records_async
+
+
+class _StubProtocol(asyncio.DatagramProtocol):
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            query = dns.message.from_wire(data)
+        except Exception:
+            return
+        resp = dns.message.make_response(query)
+        q = query.question[0]
+        if q.rdtype == dns.rdatatype.A:
+            h = zlib.crc32(q.name.to_text().encode())
+            ip = f"10.{(h >> 16) & 255}.{(h >> 8) & 255}.{h & 255}"
+            resp.answer.append(dns.rrset.from_text(q.name, 300, dns.rdataclass.IN, dns.rdatatype.A, ip))
+        wire = resp.to_wire()
+        if self.delay:
+            asyncio.get_running_loop().call_later(self.delay, self.transport.sendto, wire, addr)
+        else:
+            self.transport.sendto(wire, addr)
+
+
+def _serve(port: int, delay: float, ready) -> None:
+    async def main():
+        loop = asyncio.get_running_loop()
+        await loop.create_datagram_endpoint(lambda: _StubProtocol(delay), local_addr=("127.0.0.1", port))
+        ready.set()
+        await asyncio.Event().wait()
+    asyncio.run(main())
+
+
+def _free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    ap.add_argument("--delay", type=float, default=0.005, help="stub response delay in seconds")
+    ap.add_argument("--max-in-flight", type=int, default=200)
+    ap.add_argument("--per-nameserver", type=int, default=200)
+    ap.add_argument("--serial", action="store_true", help="also time the serial resolve_records path")
+    args = ap.parse_args()
+
+    port = _free_udp_port()
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(target=_serve, args=(port, args.delay, ready), daemon=True)
+    server.start()
+    ready.wait(10)
+    try:
+        print(f"stub dns on 127.0.0.1:{port}, delay={args.delay * 1000:.1f}ms, record types={len(DEFAULT_RECORD_TYPES)}")
+        print(f"{'hosts':>8} {'mode':>8} {'queries':>9} {'seconds':>9} {'q/s':>10}")
+        for n in args.sizes:
+            hosts = [f"h{i}.bench.test" for i in range(n)]
+            queries = n * len(DEFAULT_RECORD_TYPES)
+            t0 = time.perf_counter()
+            res = asyncio.run(resolve_records_async(
+                hosts, nameservers=["127.0.0.1"], port=port,
+                max_in_flight=args.max_in_flight, per_nameserver=args.per_nameserver,
+                cache=None,
+            ))
+            dt = time.perf_counter() - t0
+            assert sum(1 for r in res.values() if r["A"]) == n, "stub answers missing"
+            print(f"{n:>8} {'async':>8} {queries:>9} {dt:>9.2f} {queries / dt:>10.0f}")
+            if args.serial:
+                t0 = time.perf_counter()
+                resolve_records(hosts, nameservers=["127.0.0.1"], port=port)
+                dt = time.perf_counter() - t0
+                print(f"{n:>8} {'serial':>8} {queries:>9} {dt:>9.2f} {queries / dt:>10.0f}")
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
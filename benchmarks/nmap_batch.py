@@ -0,0 +1,78 @@
+"""Compare per-host and batched nmap modes against a loopback listener farm.
+
+Each target is a distinct 127.0.0.x address with a handful of listening TCP
+ports, so nmap sees N separate hosts without leaving the machine. Requires
+nmap on PATH.
+
+    python -m benchmarks.nmap_batch --hosts 16 64 256 --ports 10
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import shutil
+import socket
+import sys
+import time
+from typing import List
+
+from app.services.nmap_probe import probe_nmap_many
+
+_BASE_PORT = 20000
+
+
+def _listeners(hosts: int, ports: int) -> List[socket.socket]:
+    socks = []
+    for h in range(hosts):
+        # The whole 127/8 block is loopback on Linux
+        addr = f"127.0.{h // 250}.{h % 250 + 1}"
+        for p in range(ports):
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            s.bind((addr, _BASE_PORT + p))
+            s.listen(16)
+            socks.append(s)
+    return socks
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--hosts", type=int, nargs="+", default=[16, 64, 256])
+    ap.add_argument("--ports", type=int, default=10, help="listening ports per host")
+    ap.add_argument("--scan-ports", type=int, default=100, help="ports scanned per host")
+    ap.add_argument("--concurrency", type=int, default=3, help="per-host mode: nmap processes at once")
+    ap.add_argument("--chunk-size", type=int, default=64)
+    ap.add_argument("--parallel-chunks", type=int, default=2)
+    args = ap.parse_args()
+
+    if not shutil.which("nmap"):
+        print("nmap not found on PATH; install it to run this benchmark")
+        sys.exit(1)
+
+    ports_spec = f"{_BASE_PORT}-{_BASE_PORT + args.scan_ports - 1}"
+    print(f"{'hosts':>6} {'mode':>9} {'seconds':>9} {'hosts/s':>9} {'open':>7}")
+    for n in args.hosts:
+        socks = _listeners(n, args.ports)
+        try:
+            ips = sorted({s.getsockname()[0] for s in socks})
+            for mode in ("per_host", "batch"):
+                t0 = time.perf_counter()
+                res = asyncio.run(probe_nmap_many(
+                    ips, ports_spec=ports_spec, timing="T4", concurrency=args.concurrency,
+                    mode=mode, chunk_size=args.chunk_size, parallel_chunks=args.parallel_chunks,
+                    use_cache=False,
+                ))
+                dt = time.perf_counter() - t0
+                errors = [r["error"] for r in res.values() if r.get("error")]
+                if errors:
+                    print(f"{n:>6} {mode:>9} error: {errors[0][:60]}")
+                    continue
+                open_ports = sum(len(r.get("ports") or []) for r in res.values())
+                print(f"{n:>6} {mode:>9} {dt:>9.2f} {len(ips) / dt:>9.1f} {open_ports:>7}")
+        finally:
+            for s in socks:
+                s.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Compare the asyncio connect scanner with nmap against a loopback listener farm.
+
+Every host is a distinct 127.0.x.y address with ``--ports`` listening TCP
+ports inside the scanned range. The nmap rows are skipped when nmap is not
+on PATH.
+
+    python -m benchmarks.port_scan --hosts 16 64 256 --scan-ports 1000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import shutil
+import time
+
+from app.services.nmap_probe import probe_nmap_many
+from app.services.port_scan import scan_ports_many
+
+from .nmap_batch import _BASE_PORT, _listeners
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--hosts", type=int, nargs="+", default=[16, 64, 256])
+    ap.add_argument("--ports", type=int, default=10, help="listening ports per host")
+    ap.add_argument("--scan-ports", type=int, default=1000, help="ports scanned per host")
+    ap.add_argument("--concurrency", type=int, default=16, help="hosts scanned at once")
+    ap.add_argument("--per-host", type=int, default=64, help="asyncio engine: connects in flight per host")
+    args = ap.parse_args()
+
+    ports_spec = f"{_BASE_PORT}-{_BASE_PORT + args.scan_ports - 1}"
+    engines = ["asyncio"] + (["nmap", "nmap-batch"] if shutil.which("nmap") else [])
+    if len(engines) == 1:
+        print("nmap not found on PATH; timing the asyncio engine only")
+    print(f"{'hosts':>6} {'engine':>10} {'seconds':>9} {'ports/s':>10} {'open':>7}")
+    for n in args.hosts:
+        socks = _listeners(n, args.ports)
+        try:
+            ips = sorted({s.getsockname()[0] for s in socks})
+            for engine in engines:
+                t0 = time.perf_counter()
+                if engine == "asyncio":
+                    coro = scan_ports_many(ips, ports_spec=ports_spec, concurrency=args.concurrency, per_host=args.per_host, use_cache=False)
+                else:
+                    coro = probe_nmap_many(ips, ports_spec=ports_spec, concurrency=args.concurrency, use_cache=False,
+                                           mode="batch" if engine == "nmap-batch" else "per_host")
+                res = asyncio.run(coro)
+                dt = time.perf_counter() - t0
+                errors = [r["error"] for r in res.values() if r.get("error")]
+                if errors:
+                    print(f"{n:>6} {engine:>10} error: {errors[0][:60]}")
+                    continue
+                open_ports = sum(len(r.get("ports") or []) for r in res.values())
+                assert open_ports == n * args.ports, f"expected {n * args.ports} open ports, found {open_ports}"
+                print(f"{n:>6} {engine:>10} {dt:>9.2f} {n * args.scan_ports / dt:>10.0f} {open_ports:>7}")
+        finally:
+            for s in socks:
+                s.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Memory and serialization cost of DNS results: six per-type host maps vs. the columnar RecordStore.
+
+Synthetic resolver answers for ``--hosts`` hosts (one A record each, shared
+by ten hosts; CNAMEs for a tenth; AAAA for a twentieth; MX/NS/TXT on a few)
+are held both ways:
+
+- full:    the six ``dns_*_records`` dicts keyed by every host (the AnalyzeResponse schema)
+- compact: ``RecordStore`` (interned hosts/values, flat arrays, non-empty entries only)
+
+Reported per size: retained memory (tracemalloc), build time, JSON encode
+time and size, gzip size, Pydantic validation + JSON for the full schema,
+and msgpack when installed.
+
+    python -m benchmarks.record_store --hosts 1000 20000 100000
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from app.services.record_store import RECORD_FIELDS, RecordStore, msgpack
+
+
+def _answers(hosts: int) -> List[Tuple[str, Dict[str, List[str]]]]:
+    rnd = random.Random(1)
+    n_ips = max(1, hosts // 10)
+    out = []
+    for i in range(hosts):
+        recs: Dict[str, List[str]] = {t: [] for t, _ in RECORD_FIELDS}
+        ip = rnd.randrange(n_ips)
+        recs["A"] = [f"10.{ip >> 16 & 255}.{ip >> 8 & 255}.{ip & 255}"]
+        if rnd.random() < 0.1:
+            recs["CNAME"] = [f"edge{rnd.randrange(50)}.cdn.example.net"]
+        if rnd.random() < 0.05:
+            recs["AAAA"] = [f"2001:db8::{ip:x}"]
+        if i % 500 == 0:
+            recs["MX"] = ["10 mx1.example.com", "20 mx2.example.com"]
+            recs["NS"] = ["ns1.example.com", "ns2.example.com"]
+            recs["TXT"] = ["v=spf1 include:_spf.example.net -all"]
+        # Fresh strings, as they arrive from the resolver
+        out.append((f"h{i}.example.com", {k: [str(v) for v in vals] for k, vals in recs.items()}))
+    return out
+
+
+def _full(answers) -> Dict[str, Dict[str, List[str]]]:
+    # Same shape as the previous _build_payload: every host in every per-type map
+    all_records = {h: recs for h, recs in answers}
+    return {field: {h: recs.get(t, []) for h, recs in all_records.items()} for t, field in RECORD_FIELDS}
+
+
+def _compact(answers) -> RecordStore:
+    store = RecordStore()
+    for h, recs in answers:
+        store.add(h, recs)
+    return store
+
+
+def _held_mb(build: Callable[[], object]) -> float:
+    # Answers are generated inside the trace: the full maps keep the resolver's lists alive, the store does not
+    tracemalloc.start()
+    obj = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return current / 1e6
+
+
+def _timed(fn: Callable[[], object]) -> Tuple[object, float]:
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--hosts", type=int, nargs="+", default=[1_000, 20_000, 100_000])
+    args = ap.parse_args()
+
+    from app.main import AnalyzeResponse
+
+    print(f"{'hosts':>7} {'format':>8} {'MB held':>8} {'build s':>8} {'json s':>7} {'JSON KB':>8} {'gzip KB':>8} {'pydantic s':>10} {'msgpack KB':>10}")
+    for hosts in args.hosts:
+        answers = _answers(hosts)
+        base = {"domain": "example.com", "whois": {}, "subdomains": [], "subdomains_by_source": {}, "reverse_ip": {}, "ip_info": {}, "ip_ports": {}}
+
+        mb = _held_mb(lambda: _full(_answers(hosts)))
+        full, build = _timed(lambda: _full(answers))
+        body, enc = _timed(lambda: json.dumps({**base, **full}, separators=(",", ":")).encode())
+        _, pyd = _timed(lambda: AnalyzeResponse(**base, **full).model_dump_json())
+        print(f"{hosts:>7} {'full':>8} {mb:>8.1f} {build:>8.3f} {enc:>7.3f} {len(body) / 1024:>8.0f} {len(gzip.compress(body, 5)) / 1024:>8.0f} {pyd:>10.3f} {'-':>10}")
+        del full
+
+        mb = _held_mb(lambda: _compact(_answers(hosts)))
+        store, build = _timed(lambda: _compact(answers))
+        body, enc = _timed(lambda: json.dumps({**base, "dns": store.to_dict()}, separators=(",", ":")).encode())
+        packed = f"{len(msgpack.packb({**base, 'dns': store.to_dict()})) / 1024:.0f}" if msgpack is not None else "n/a"
+        print(f"{hosts:>7} {'compact':>8} {mb:>8.1f} {build:>8.3f} {enc:>7.3f} {len(body) / 1024:>8.0f} {len(gzip.compress(body, 5)) / 1024:>8.0f} {'-':>10} {packed:>10}")
+
+
+if __name__ == "__main__":
+    main()
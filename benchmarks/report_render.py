@@ -0,0 +1,85 @@
+"""PDF render time, peak RSS and size for synthetic analyses, standard vs. large layout.
+
+Each payload has ``--hosts`` subdomains sharing one IP per ten hosts, CNAMEs
+for a tenth of the hosts, ASN details for every IP and a few open ports.
+Each (size, layout) pair renders in a fresh interpreter so ``ru_maxrss`` is
+its own peak. The standard layout lists every host, so it is skipped above
+``--standard-max`` hosts.
+
+    python -m benchmarks.report_render --hosts 1000 10000 50000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+_DOMAIN = "example.com"
+
+
+def _payload(hosts: int) -> dict:
+    rnd = random.Random(1)
+    subs = [f"h{i}.{_DOMAIN}" for i in range(hosts)]
+    n_ips = max(1, hosts // 10)
+    ips = [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(n_ips)]
+    a = {h: [ips[rnd.randrange(n_ips)]] for h in subs}
+    cname = {h: ([f"edge{rnd.randrange(50)}.cdn.example.net"] if rnd.random() < 0.1 else []) for h in subs}
+    empty = {h: [] for h in subs}
+    ip_info = {ip: {"asn": 64500 + rnd.randrange(40), "asn_org": f"Org {rnd.randrange(40)}", "name": "NET", "country": "US", "handle": "NET-1"} for ip in ips}
+    ip_ports = {ip: {"ports": [{"port": 443, "protocol": "tcp", "service": "https", "product": "nginx", "version": "1.25"}]} for ip in ips[:: 20]}
+    raw = "\n".join(f"Line {i}: " + "x" * 60 for i in range(120))
+    return {
+        "domain": _DOMAIN, "whois": {"domain_name": _DOMAIN.upper(), "registrar": "Example Registrar", "raw_text": raw},
+        "subdomains": subs, "subdomains_by_source": {"crtsh": subs},
+        "dns_a_records": a, "dns_aaaa_records": empty, "dns_cname_records": cname,
+        "dns_mx_records": empty, "dns_ns_records": empty, "dns_txt_records": empty,
+        "reverse_ip": {}, "ip_info": ip_info, "ip_ports": ip_ports,
+    }
+
+
+def _run(hosts: int, layout: str, path: str) -> None:
+    from app.services.report import write_pdf_report
+
+    data = _payload(hosts)
+    data["layout"] = layout
+    t0 = time.perf_counter()
+    size = write_pdf_report(data, path)
+    dt = time.perf_counter() - t0
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+    print(json.dumps({"seconds": dt, "rss_mb": rss, "size": size}))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--hosts", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    ap.add_argument("--standard-max", type=int, default=10_000, help="largest size rendered with the standard layout")
+    ap.add_argument("--layout", help=argparse.SUPPRESS)
+    ap.add_argument("--path", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.layout:
+        _run(args.hosts[0], args.layout, args.path)
+        return
+
+    print(f"{'hosts':>7} {'layout':>9} {'seconds':>8} {'peak RSS MB':>12} {'PDF KB':>8}")
+    with tempfile.TemporaryDirectory() as d:
+        for hosts in args.hosts:
+            for layout in ("standard", "large"):
+                if layout == "standard" and hosts > args.standard_max:
+                    continue
+                path = os.path.join(d, f"report-{hosts}-{layout}.pdf")
+                out = subprocess.run([sys.executable, "-m", "benchmarks.report_render", "--hosts", str(hosts), "--layout", layout, "--path", path],
+                                     capture_output=True, text=True, check=True).stdout
+                r = json.loads(out)
+                print(f"{hosts:>7} {layout:>9} {r['seconds']:>8.2f} {r['rss_mb']:>12.0f} {r['size'] / 1024:>8.0f}")
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
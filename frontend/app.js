@@ -400,16 +400,69 @@ function hideSettings() {
   document.body.classList.remove('modal-open');
 }
 
+// Parse a text/event-stream response body, calling onEvent(type, data) per frame
+async function readEventStream(res, onEvent) {
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buf = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    let idx;
+    while ((idx = buf.indexOf('\n\n')) >= 0) {
+      const frame = buf.slice(0, idx);
+      buf = buf.slice(idx + 2);
+      let event = 'message';
+      const dataLines = [];
+      for (const line of frame.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+      }
+      if (dataLines.length) onEvent(event, JSON.parse(dataLines.join('\n')));
+    }
+  }
+}
+
+// Incrementally grow the graph while an analysis streams in; buildGraph() redraws it at the end
+function progressiveGraph(root) {
+  clearHighlights();
+  cy.elements().remove();
+  let layoutTimer = null;
+  const g = {
+    node(id, label, type) {
+      if (!cy.getElementById(id).length) cy.add({ data: { id, label, type } });
+    },
+    edge(source, target, type, label) {
+      const id = `${source}->${target}`;
+      if (cy.getElementById(id).length || !cy.getElementById(source).length || !cy.getElementById(target).length) return;
+      cy.add({ data: { id, source, target, type, label } });
+    },
+    relayout() {
+      if (layoutTimer) return;
+      layoutTimer = setTimeout(() => {
+        layoutTimer = null;
+        cy.layout({ name: 'cose', animate: false, nodeOverlap: 4, idealEdgeLength: 80 }).run();
+        applyFilters();
+      }, 750);
+    },
+    stop() { if (layoutTimer) { clearTimeout(layoutTimer); layoutTimer = null; } },
+  };
+  g.node(root, root, 'domain');
+  return g;
+}
+
 async function analyze() {
   const raw = document.getElementById('domain').value || '';
   const domain = raw.split(/\r?\n/)[0].trim();
   if (!domain) { setStatus('Please enter a domain.'); return; }
-  setStatus('Analyzing... this can take a minute.', { spinning: true });
+  setStatus('Analyzing... results will appear as they arrive.', { spinning: true });
   whoisEl.textContent = '';
   detailsEl.textContent = '';
 
+  let g = null;
   try {
-    const res = await fetch('/api/analyze', {
+    const res = await fetch('/api/analyze/stream', {
       method: 'POST',
       headers: { 'Content-Type': 'application/json' },
       body: JSON.stringify({ domain, options: uiCollectSettings() })
@@ -418,11 +471,82 @@ async function analyze() {
       const txt = await res.text();
       throw new Error(txt || 'Request failed');
     }
-    const data = await res.json();
+    let root = domain.toLowerCase();
+    const partial = {
+      domain: root, whois: {}, subdomains: [], subdomains_by_source: {},
+      dns_a_records: {}, dns_aaaa_records: {}, dns_cname_records: {}, dns_mx_records: {}, dns_ns_records: {}, dns_txt_records: {},
+      reverse_ip: {}, ip_info: {}, ip_ports: {},
+    };
+    const subs = new Set();
+    let final = null;
+    let streamError = null;
+    let resolved = 0;
+    const progress = () => setStatus(`Analyzing... ${subs.size} subdomains, ${resolved} hosts resolved, ${Object.keys(partial.ip_info).length} IPs enriched`, { spinning: true });
+
+    await readEventStream(res, (event, data) => {
+      if (event === 'start') {
+        root = data.domain; partial.domain = root; g = progressiveGraph(root);
+      } else if (event === 'whois') {
+        partial.whois = data.whois || {};
+        whoisEl.textContent = pretty(partial.whois);
+      } else if (event === 'subdomains') {
+        if (data.partial) {
+          partial.subdomains_by_source[data.source] = (partial.subdomains_by_source[data.source] || []).concat(data.subdomains || []);
+        } else {
+          partial.subdomains_by_source[data.source] = data.subdomains || [];
+        }
+        for (const sd of data.subdomains || []) {
+          if (sd === root || subs.has(sd)) continue;
+          subs.add(sd);
+          g.node(sd, sd, 'subdomain');
+          g.edge(root, sd, 'subdomain-of', 'subdomain');
+        }
+      } else if (event === 'dns') {
+        const host = data.host, recs = data.records || {};
+        resolved += 1;
+        partial.dns_a_records[host] = recs.A || [];
+        partial.dns_aaaa_records[host] = recs.AAAA || [];
+        partial.dns_cname_records[host] = recs.CNAME || [];
+        partial.dns_mx_records[host] = recs.MX || [];
+        partial.dns_ns_records[host] = recs.NS || [];
+        partial.dns_txt_records[host] = recs.TXT || [];
+        for (const cname of recs.CNAME || []) { g.node(cname, cname, 'domain'); g.edge(host, cname, 'cname', 'CNAME'); }
+        for (const ip of recs.A || []) { g.node(ip, ip, 'ip'); g.edge(host, ip, 'a-record', 'A'); }
+        for (const ip6 of recs.AAAA || []) { g.node(ip6, ip6, 'ip'); g.edge(host, ip6, 'aaaa-record', 'AAAA'); }
+      } else if (event === 'reverse_ip' || event === 'enrich') {
+        const list = partial.reverse_ip[data.ip] = partial.reverse_ip[data.ip] || [];
+        for (const ch of data.domains || []) {
+          if (!list.includes(ch)) list.push(ch);
+          g.node(ch, ch, subs.has(ch) ? 'subdomain' : 'cohost');
+          g.edge(data.ip, ch, 'cohost', 'cohost');
+        }
+      } else if (event === 'ip_info') {
+        partial.ip_info[data.ip] = data.info || {};
+      } else if (event === 'ports') {
+        partial.ip_ports[data.ip] = data.result || { ports: [] };
+        for (const p of (data.result && data.result.ports) || []) {
+          const portId = `${data.ip}:${p.protocol}/${p.port}`;
+          g.node(portId, `${p.protocol}/${p.port} ${p.service || ''}`.trim(), 'port');
+          g.edge(data.ip, portId, 'port', (p.protocol || '').toUpperCase());
+        }
+      } else if (event === 'result') {
+        final = data;
+      } else if (event === 'error') {
+        streamError = data.detail || 'Analysis failed';
+      }
+      if (g && event !== 'start') { g.relayout(); progress(); }
+    });
+    if (g) g.stop();
+    if (streamError) throw new Error(streamError);
+    if (!final) {
+      partial.subdomains = Array.from(subs).filter(sd => sd.endsWith(root)).sort();
+      final = partial;
+    }
     setStatus('Done');
-    whoisEl.textContent = pretty(data.whois);
-    buildGraph(data);
+    whoisEl.textContent = pretty(final.whois);
+    buildGraph(final);
   } catch (e) {
+    if (g) g.stop();
     console.error(e);
     setStatus('Error: ' + e.message);
   }
@@ -547,11 +671,12 @@ if (createReportBtn) createReportBtn.addEventListener('click', async () => {
     if (!last || !last.domain) { setStatus('Run an analysis first to create a report'); return; }
     setStatus('Generating PDF report...', { spinning: true });
     // Build tor status from UI + backend cached indicator
-    let torEnabled = false, exitIp = null, exitCountry = null;
-    try { const st = await (await fetch('/api/status')).json(); torEnabled = !!(getSettings().proxy && getSettings().proxy.enabled); exitIp = st?.tor?.exit_ip || null; exitCountry = st?.tor?.exit_country || null; } catch {}
-    // Render current graph to PNG dataURL
+    let torEnabled = false, exitIp = null, exitCountry = null, largeHosts = null;
+    try { const st = await (await fetch('/api/status')).json(); torEnabled = !!(getSettings().proxy && getSettings().proxy.enabled); exitIp = st?.tor?.exit_ip || null; exitCountry = st?.tor?.exit_country || null; largeHosts = st?.reports?.large_hosts ?? null; } catch {}
+    // Render current graph to PNG dataURL (large reports leave the graph out, so skip the costly render)
     let graphPng = null;
-    try { graphPng = cy.png({ full: true, output: 'base64uri', bg: 'white', scale: 2 }); } catch {}
+    const large = largeHosts != null && (last.subdomains || []).length > largeHosts;
+    if (!large) { try { graphPng = cy.png({ full: true, output: 'base64uri', bg: 'white', scale: 2 }); } catch {} }
     const payload = Object.assign({}, last, { tor_status: { enabled: torEnabled, exit_ip: exitIp, exit_country: exitCountry }, graph_png: graphPng });
     const res = await fetch('/api/report.pdf', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) });
     if (!res.ok) { const t = await res.text(); throw new Error(t || 'Report failed'); }
@@ -683,6 +808,8 @@ cy.on('tap', 'node', (evt) => {
         <li><strong>Handle:</strong> ${info.handle || ''}</li>
         <li><strong>Country:</strong> ${info.country || ''}</li>
         <li><strong>Range:</strong> ${info.startAddress || ''} - ${info.endAddress || ''}</li>
+        ${info.asn ? `<li><strong>ASN:</strong> AS${info.asn} ${info.asn_org || ''} ${info.asn_country ? `(${info.asn_country})` : ''}</li>` : ''}
+        ${info.prefix ? `<li><strong>Prefix:</strong> ${info.prefix}</li>` : ''}
       </ul>
       ${ent ? `<h4>Entities</h4><pre>${ent}</pre>` : ''}
     `;
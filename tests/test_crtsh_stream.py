@@ -0,0 +1,44 @@
+import gzip
+import json
+
+from app.services.crtsh_stream import CrtshStreamParser, parse_crtsh_chunks, parse_crtsh_file
+
+ROWS = [
+    {"id": 10, "entry_timestamp": "2024-01-01T00:00:00", "name_value": "www.example.com\n*.api.example.com"},
+    {"id": 12, "entry_timestamp": "2024-03-01T00:00:00", "name_value": "Mail.Example.com other.org"},
+    {"id": 11, "entry_timestamp": "2024-02-01T00:00:00", "common_name": "ünï.example.com"},
+]
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_names_are_the_same_for_any_chunking():
+    body = json.dumps(ROWS, ensure_ascii=False).encode("utf-8")
+    expected = {"www.example.com", "api.example.com", "mail.example.com", "ünï.example.com"}
+    for size in (1, 2, 7, 64, len(body)):
+        assert parse_crtsh_chunks(_chunks(body, size), "example.com") == expected
+
+
+def test_concatenated_objects_and_garbage_between_rows():
+    body = b'{"id": 1, "name_value": "a.example.com"}\n{"id": 2, "name_value": "b.exam' + b'ple.com"}  xx {broken} {"id": 3, "name_value": "c.example.com"}'
+    assert parse_crtsh_chunks(_chunks(body, 5), "example.com") == {"a.example.com", "b.example.com", "c.example.com"}
+
+
+def test_watermark_skips_old_rows_and_tracks_newest():
+    parser = CrtshStreamParser("example.com", min_id=10)
+    for chunk in _chunks(json.dumps(ROWS).encode(), 9):
+        parser.feed(chunk)
+    names = parser.close()
+    assert "www.example.com" not in names and "mail.example.com" in names
+    assert (parser.entries, parser.skipped) == (3, 1)
+    assert parser.max_id == 12
+    assert parser.max_entry == "2024-03-01T00:00:00"
+
+
+def test_gzip_dump(tmp_path):
+    path = tmp_path / "dump.json.gz"
+    with gzip.open(path, "wb") as fh:
+        fh.write(json.dumps(ROWS).encode())
+    assert "www.example.com" in parse_crtsh_file(str(path), "example.com", chunk_size=3)
@@ -0,0 +1,89 @@
+import asyncio
+import contextlib
+import json
+import threading
+
+from app.services import ct_monitor
+from app.services.ct_monitor import CtMonitor
+
+
+def test_concurrent_saves_leave_a_complete_file(tmp_path):
+    path = tmp_path / "ct.json"
+    monitor = CtMonitor(path=str(path))
+    monitor._loaded = True
+    monitor._state = {f"d{i}.example": {"max_id": i, "subdomains": [f"h{j}.d{i}.example" for j in range(500)]} for i in range(10)}
+    errors = []
+
+    def save_repeatedly():
+        try:
+            for _ in range(20):
+                monitor._save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save_repeatedly) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert errors == []
+    assert not (tmp_path / "ct.json.tmp").exists()
+    assert json.loads(path.read_text(encoding="utf-8")) == monitor._state
+
+
+def test_state_survives_reload(tmp_path):
+    path = str(tmp_path / "ct.json")
+    monitor = CtMonitor(path=path)
+    monitor._loaded = True
+    monitor._state = {"a.example": {"max_id": 7, "subdomains": ["www.a.example"]}, "b.example": {"max_id": 1}}
+    monitor._save()
+    assert monitor.forget("b.example")
+
+    reloaded = CtMonitor(path=path)
+    assert reloaded.get("a.example") == {"max_id": 7, "subdomains": ["www.a.example"]}
+    assert reloaded.get("b.example") is None
+
+
+def _fake_crtsh(monkeypatch, pages):
+    urls = []
+
+    class Response:
+        status_code = 200
+
+        def __init__(self, rows):
+            self._body = json.dumps(rows).encode()
+
+        async def aiter_bytes(self):
+            for i in range(0, len(self._body), 7):
+                yield self._body[i:i + 7]
+
+    class Client:
+        @contextlib.asynccontextmanager
+        async def stream(self, method, url, timeout=None):
+            urls.append(url)
+            yield Response(pages.pop(0))
+
+    @contextlib.asynccontextmanager
+    async def client(name, proxies=None):
+        yield Client()
+
+    monkeypatch.setattr(ct_monitor, "http_client", client)
+    return urls
+
+
+def test_second_poll_is_a_delta(tmp_path, monkeypatch):
+    first = [{"id": 1, "name_value": "a.example.com"}, {"id": 5, "name_value": "b.example.com"}]
+    # The delta answer still contains the old rows; only ids above the watermark count
+    second = first + [{"id": 9, "name_value": "c.example.com"}, {"id": 3, "name_value": "old.example.com"}]
+    urls = _fake_crtsh(monkeypatch, [first, second])
+    monitor = CtMonitor(path=str(tmp_path / "ct.json"))
+
+    r1 = asyncio.run(monitor.poll("example.com"))
+    r2 = asyncio.run(monitor.poll("example.com"))
+
+    assert r1["mode"] == "full" and r1["new"] == ["a.example.com", "b.example.com"]
+    assert "exclude=expired" not in urls[0] and "exclude=expired" in urls[1]
+    assert r2["mode"] == "delta" and r2["new"] == ["c.example.com"]
+    assert r2["max_id"] == 9 and r2["rows_skipped"] == 3
+    assert CtMonitor(path=str(tmp_path / "ct.json")).get("example.com")["subdomains"] == ["a.example.com", "b.example.com", "c.example.com"]
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app.services.pipeline import BatchStage
+
+
+def test_items_are_deduplicated_and_batched():
+    async def run():
+        batches = []
+
+        async def handler(items):
+            batches.append(list(items))
+
+        stage = BatchStage("t", handler, max_batch=3, linger=0.01)
+        for item in [1, 2, 2, 3, 4, 1, 5]:
+            await stage.put(item)
+        await stage.close()
+        return stage, batches
+
+    stage, batches = asyncio.run(run())
+    assert sorted(i for b in batches for i in b) == [1, 2, 3, 4, 5]
+    assert all(len(b) <= 3 for b in batches)
+    assert stage.processed == 5
+
+
+def test_put_blocks_while_queue_is_full():
+    async def run():
+        release = asyncio.Event()
+
+        async def handler(items):
+            await release.wait()
+
+        stage = BatchStage("t", handler, max_batch=1, linger=0, maxsize=2)
+        for item in range(3):
+            await stage.put(item)
+        # One item is held by the worker, two fill the queue; the next put has to wait
+        blocked = asyncio.ensure_future(stage.put(99))
+        await asyncio.sleep(0.05)
+        assert not blocked.done()
+        release.set()
+        await asyncio.wait_for(blocked, 1)
+        await stage.close()
+        return stage.processed
+
+    assert asyncio.run(run()) == 4
+
+
+def test_handler_error_unblocks_producer_and_is_raised():
+    async def run():
+        async def handler(items):
+            raise ValueError("bad batch")
+
+        stage = BatchStage("t", handler, workers=2, max_batch=4, linger=0, maxsize=8)
+        with pytest.raises(ValueError, match="bad batch"):
+            for item in range(1000):
+                await asyncio.wait_for(stage.put(item), 1)
+        with pytest.raises(ValueError, match="bad batch"):
+            await asyncio.wait_for(stage.close(), 1)
+        assert all(w.done() for w in stage._workers)
+
+    asyncio.run(run())
+
+
+def test_close_raises_error_from_last_batch():
+    async def run():
+        async def handler(items):
+            if 3 in items:
+                raise RuntimeError("boom")
+
+        stage = BatchStage("t", handler, max_batch=1, linger=0)
+        for item in range(5):
+            await stage.put(item)
+        with pytest.raises(RuntimeError, match="boom"):
+            await asyncio.wait_for(stage.close(), 1)
+        # Later input is dropped rather than queued for a stage that no longer runs
+        stage.put_nowait(42)
+        assert 42 not in stage.seen
+
+    asyncio.run(run())
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+
+from app.services.rate_limit import AdaptiveLimiter, TokenBucket, parse_retry_after, request_with_retries
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None, default=2.0) == 2.0
+    assert parse_retry_after("soon", default=1.5) == 1.5
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= parse_retry_after(later) <= 31
+
+
+def test_token_bucket_paces_after_burst():
+    async def run():
+        bucket = TokenBucket("t", rate=50, burst=2)
+        t0 = time.monotonic()
+        for _ in range(7):
+            await bucket.acquire()
+        return time.monotonic() - t0, bucket
+
+    elapsed, bucket = asyncio.run(run())
+    # Two from the burst, five paced at 50/s
+    assert 0.08 <= elapsed < 0.5
+    assert bucket.acquired == 7
+
+
+def test_limiter_grows_on_fast_answers_and_halves_once_per_round_trip():
+    async def run():
+        lim = AdaptiveLimiter("t", initial=4, min_limit=1, max_limit=8, latency_target=1.0)
+        for _ in range(8):
+            await lim.acquire()
+            await lim.release(0.01, "ok")
+        grown = lim.limit
+        for _ in range(3):
+            await lim.acquire()
+            await lim.release(0.5, "throttled")
+        return grown, lim
+
+    grown, lim = asyncio.run(run())
+    assert 5 < grown <= 8
+    assert lim.limit == grown / 2
+    assert lim.throttled == 3 and lim.ok == 8 and lim.in_flight == 0
+
+
+def test_limiter_caps_requests_in_flight():
+    async def run():
+        lim = AdaptiveLimiter("t", initial=2, min_limit=1, max_limit=2)
+        await lim.acquire()
+        await lim.acquire()
+        third = asyncio.ensure_future(lim.acquire())
+        await asyncio.sleep(0.02)
+        blocked = not third.done()
+        await lim.release(0.01, "ok")
+        await asyncio.wait_for(third, 1)
+        return blocked
+
+    assert asyncio.run(run())
+
+
+def _responses(*items):
+    it = iter(items)
+
+    async def send():
+        item = next(it)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    return send
+
+
+def test_retries_throttled_answers_until_success():
+    lim = AdaptiveLimiter("t", deadline=5)
+    send = _responses(httpx.Response(429, headers={"Retry-After": "0"}), httpx.Response(503), httpx.Response(200, text="ok"))
+    r = asyncio.run(request_with_retries(lim, send, base_delay=0.001))
+    assert r.status_code == 200
+    assert (lim.throttled, lim.ok, lim.retries) == (2, 1, 2)
+
+
+def test_is_throttled_treats_200_bodies_as_throttling():
+    lim = AdaptiveLimiter("t", deadline=5)
+    send = _responses(httpx.Response(200, text="API count exceeded"), httpx.Response(200, text="a.example.com"))
+    r = asyncio.run(request_with_retries(lim, send, base_delay=0.001, is_throttled=lambda resp: resp.text.startswith("API count")))
+    assert r.text == "a.example.com"
+    assert lim.throttled == 1
+
+
+def test_gives_up_after_max_attempts():
+    lim = AdaptiveLimiter("t", deadline=5)
+    send = _responses(*[httpx.ConnectError("down")] * 3)
+    assert asyncio.run(request_with_retries(lim, send, max_attempts=3, base_delay=0.001)) is None
+    assert lim.errors == 3 and lim.in_flight == 0
@@ -0,0 +1,102 @@
+import asyncio
+import contextlib
+import ipaddress
+import json
+import time
+
+from app.services import ip_info
+from app.services.rdap_index import RdapRangeIndex, network_range
+from app.services.stage_cache import stage_cache
+
+
+def _net(cidr, name):
+    net = ipaddress.ip_network(cidr)
+    return {"name": name, "startAddress": str(net[0]), "endAddress": str(net[-1])}
+
+
+def test_most_specific_range_wins():
+    index = RdapRangeIndex(path=None)
+    assert index.add(_net("10.0.0.0/16", "outer"))
+    assert index.add(_net("10.0.5.0/24", "inner"))
+    assert index.lookup("10.0.5.9")["name"] == "inner"
+    assert index.lookup("10.0.6.1")["name"] == "outer"
+    assert index.lookup("10.1.0.1") is None
+    assert index.add(_net("2001:db8::/48", "v6"))
+    assert index.lookup("2001:db8::1")["name"] == "v6"
+
+
+def test_registry_sized_and_malformed_ranges_are_skipped():
+    assert network_range(_net("10.0.0.0/7", "huge")) is None
+    assert network_range({"startAddress": "10.0.0.9", "endAddress": "10.0.0.1"}) is None
+    assert network_range({"startAddress": "nope"}) is None
+    assert not RdapRangeIndex(path=None).add({"name": "no range"})
+
+
+def test_readding_a_range_replaces_it():
+    index = RdapRangeIndex(path=None)
+    index.add(_net("10.0.0.0/24", "old"))
+    index.add(_net("10.0.0.0/24", "new"))
+    assert index.stats()["ranges_v4"] == 1
+    assert index.lookup("10.0.0.1")["name"] == "new"
+
+
+def test_save_and_load_drop_expired_ranges(tmp_path):
+    path = tmp_path / "rdap.json"
+    index = RdapRangeIndex(path=str(path), max_age=3600)
+    index.add(_net("10.0.0.0/24", "fresh"))
+    index.save()
+    rows = json.loads(path.read_text())
+    rows.append([4, int(ipaddress.ip_address("10.9.0.0")), int(ipaddress.ip_address("10.9.0.255")), time.time() - 7200, {"name": "stale"}])
+    path.write_text(json.dumps(rows))
+
+    loaded = RdapRangeIndex(path=str(path), max_age=3600)
+    asyncio.run(loaded.load())
+    assert loaded.lookup("10.0.0.7")["name"] == "fresh"
+    assert loaded.lookup("10.9.0.7") is None
+
+
+def _fake_rdap(monkeypatch, networks, delay=0.02):
+    index = RdapRangeIndex(path=None)
+    monkeypatch.setattr(ip_info, "RDAP_INDEX", index)
+    stage_cache("rdap").clear()
+    calls = []
+    active = [0, 0]
+
+    @contextlib.asynccontextmanager
+    async def client(name, proxies=None):
+        yield None
+
+    async def rdap_one(_client, ip):
+        calls.append(ip)
+        active[0] += 1
+        active[1] = max(active[1], active[0])
+        await asyncio.sleep(delay)
+        active[0] -= 1
+        addr = ipaddress.ip_address(ip)
+        for cidr, name in networks:
+            if addr in ipaddress.ip_network(cidr):
+                return _net(cidr, name)
+        return {}
+
+    monkeypatch.setattr(ip_info, "http_client", client)
+    monkeypatch.setattr(ip_info, "_rdap_one", rdap_one)
+    return calls, active
+
+
+def test_block_covered_by_first_answer_needs_one_request(monkeypatch):
+    calls, _ = _fake_rdap(monkeypatch, [("10.1.0.0/16", "big")])
+    ips = [f"10.1.{i}.{i}" for i in range(1, 30)]
+    res = asyncio.run(ip_info._rdap_many(ips, None, None))
+    assert len(calls) == 1
+    assert all(res[ip]["name"] == "big" for ip in ips)
+
+
+def test_fragmented_block_is_looked_up_in_parallel(monkeypatch):
+    # Every address is its own /30: after the first lookup per /16 and per /24, the rest run concurrently
+    nets = [(f"10.2.{a}.{b}/30", f"n{a}.{b}") for a in range(2) for b in range(0, 256, 4)]
+    calls, active = _fake_rdap(monkeypatch, nets)
+    ips = [f"10.2.{a}.{b}" for a in range(2) for b in range(1, 256, 16)]
+    res = asyncio.run(ip_info._rdap_many(ips, None, None))
+    assert all(res[ip]["name"] == f"n{ip.split('.')[2]}.{int(ip.split('.')[3]) // 4 * 4}" for ip in ips)
+    assert len(calls) == len(ips)
+    assert active[1] > 2
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+from starlette.requests import Request
+
+from app.services.record_store import RECORD_FIELDS, RecordStore, compact_payload, encode_compact, expand_payload
+
+
+def _full_payload():
+    return {
+        "domain": "example.com",
+        "whois": {},
+        "subdomains": ["a.example.com", "b.example.com"],
+        "subdomains_by_source": {},
+        "dns_a_records": {"a.example.com": ["10.0.0.1"], "b.example.com": ["10.0.0.1", "10.0.0.2"], "example.com": []},
+        "dns_aaaa_records": {"a.example.com": [], "b.example.com": [], "example.com": []},
+        "dns_cname_records": {"a.example.com": [], "b.example.com": ["edge.cdn.example.net"], "example.com": []},
+        "dns_mx_records": {"a.example.com": [], "b.example.com": [], "example.com": ["10 mx.example.com"]},
+        "dns_ns_records": {"a.example.com": [], "b.example.com": [], "example.com": []},
+        "dns_txt_records": {"a.example.com": [], "b.example.com": [], "example.com": []},
+        "reverse_ip": {},
+        "ip_info": {},
+        "ip_ports": {},
+    }
+
+
+def test_store_interns_values_and_keeps_hosts_without_records():
+    store = RecordStore()
+    store.add("a.example.com", {"A": ["10.0.0.1"], "AAAA": []})
+    store.add("b.example.com", {"A": ["10.0.0.1", "10.0.0.2"]})
+    store.add("c.example.com", {})
+
+    assert len(store) == 3 and "c.example.com" in store
+    assert store.values.count("10.0.0.1") == 1
+    assert dict(store.items("A")) == {"a.example.com": ["10.0.0.1"], "b.example.com": ["10.0.0.1", "10.0.0.2"]}
+    assert list(store.items("AAAA")) == []
+    assert store.values_of("A") == {"10.0.0.1", "10.0.0.2"}
+
+
+def test_dict_round_trip_survives_json():
+    store = RecordStore()
+    store.add("a.example.com", {"A": ["10.0.0.1"], "TXT": ["v=spf1 -all"]})
+    store.add("b.example.com", {"CNAME": ["edge.cdn.example.net"]})
+    again = RecordStore.from_dict(json.loads(json.dumps(store.to_dict())))
+    assert again.to_fields() == store.to_fields()
+    again.add("c.example.com", {"A": ["10.0.0.1"]})
+    assert again.values.count("10.0.0.1") == 1
+
+
+def test_compact_and_expand_are_inverse():
+    full = _full_payload()
+    compact = compact_payload(full)
+    assert "dns" in compact
+    assert not any(field in compact for _, field in RECORD_FIELDS)
+    assert expand_payload(compact) == full
+    # Already in the target shape: returned unchanged
+    assert compact_payload(compact) is compact
+    assert expand_payload(full) is full
+
+
+def test_encode_compact_negotiates_gzip():
+    payload = compact_payload(_full_payload())
+    payload["subdomains"] = [f"h{i}.example.com" for i in range(200)]
+    body, media_type, headers = encode_compact(payload, accept="application/json", accept_encoding="gzip")
+    assert media_type == "application/json"
+    assert headers.get("Content-Encoding") == "gzip"
+    body, _, headers = encode_compact(payload)
+    assert "Content-Encoding" not in headers
+    assert json.loads(body) == payload
+
+
+def test_compact_response_converts_full_schema_cache_entries():
+    from app.main import _payload_response
+
+    request = Request({"type": "http", "method": "GET", "path": "/", "headers": []})
+    full = _full_payload()
+
+    resp = asyncio.run(_payload_response(request, full, "compact"))
+    assert json.loads(resp.body) == compact_payload(full)
+
+    resp = asyncio.run(_payload_response(request, full, "compact", envelope={"status": "done", "partial": False}))
+    body = json.loads(resp.body)
+    assert body["status"] == "done" and body["result"]["dns"] == compact_payload(full)["dns"]
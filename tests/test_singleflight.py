@@ -0,0 +1,93 @@
+import asyncio
+import gc
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_run():
+    async def run():
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return calls
+
+        results = await asyncio.gather(*(flight.run("k", work) for _ in range(5)))
+        return results, calls, len(flight)
+
+    assert asyncio.run(run()) == ([1] * 5, 1, 0)
+
+
+def test_cancelled_caller_does_not_fail_the_others():
+    async def run():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(flight.run("k", work))
+        second = asyncio.ensure_future(flight.run("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(run()) == ("done", True)
+
+
+def test_errors_reach_every_caller_and_the_key_is_freed():
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("nope")
+
+        results = await asyncio.gather(flight.run("k", fail), flight.run("k", fail), return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in results)
+
+        async def ok():
+            return 1
+
+        # A later call starts fresh work
+        assert await flight.run("k", ok) == 1
+
+    asyncio.run(run())
+
+
+def test_different_keys_run_separately():
+    async def run():
+        flight = SingleFlight()
+
+        async def work(v):
+            await asyncio.sleep(0.01)
+            return v
+
+        return await asyncio.gather(flight.run("a", lambda: work(1)), flight.run("b", lambda: work(2)))
+
+    assert asyncio.run(run()) == [1, 2]
+
+
+def test_unawaited_failure_is_not_logged(caplog):
+    async def run():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("nope")
+
+        caller = asyncio.ensure_future(flight.run("k", fail))
+        await asyncio.sleep(0)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0.03)
+
+    asyncio.run(run())
+    gc.collect()
+    assert "never retrieved" not in caplog.text